@@ -0,0 +1,136 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Retry-After, in seconds, for keys whose limit is 0 (every request is shed)
+DISABLED_RETRY_AFTER = 60
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request cannot be admitted within its queue-time budget.
+    retry_after is a hint, in whole seconds, for the Retry-After header.
+    """
+
+    def __init__(self, key, reason, retry_after):
+        super().__init__(f"{key} is overloaded ({reason}); retry in {retry_after} s")
+        self.key = key
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Gate:
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self.service_seconds = 0.05  # moving average of how long a slot is held, for Retry-After
+        self.condition = threading.Condition()
+
+
+class AdmissionController:
+    """
+    Caps how many requests per key (disease type) are worked on at once and how long the rest may
+    queue for a slot.
+
+    A request waits at most queue_timeout_ms from the moment it arrived (which may be before it
+    reached the controller, e.g. while queued for a worker thread); past that it is shed with
+    Overloaded instead of being served late, when its client has likely given up and the work
+    would only delay the requests behind it. When max_queue requests are already waiting for a
+    key, a new one is shed at once. Keys without an entry in limits use default_limit; a limit of 0
+    sheds every request for that key.
+    """
+
+    def __init__(self, default_limit, queue_timeout_ms, limits=None, max_queue=8,
+                 on_depth=None, on_shed=None, on_wait=None):
+        self.default_limit = default_limit
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self.limits = dict(limits or {})
+        self.max_queue = max_queue
+        self.on_depth = on_depth  # optional callback(key, waiting), e.g. for a queue-depth gauge
+        self.on_shed = on_shed    # optional callback(key, reason)
+        self.on_wait = on_wait    # optional callback(key, seconds) for admitted requests
+        self._gates = {}
+        self._lock = threading.Lock()
+
+    def _gate(self, key):
+        gate = self._gates.get(key)
+        if gate is None:
+            with self._lock:
+                gate = self._gates.setdefault(key, _Gate(self.limits.get(key, self.default_limit)))
+        return gate
+
+    def _shed(self, key, gate, reason):
+        if gate.limit < 1:
+            retry_after = DISABLED_RETRY_AFTER
+        else:
+            # Time for the requests ahead to drain through the available slots
+            retry_after = max(1, math.ceil((gate.waiting + 1) * gate.service_seconds / gate.limit))
+        if self.on_shed is not None:
+            self.on_shed(key, reason)
+        raise Overloaded(key, reason, retry_after)
+
+    def acquire(self, key, arrived=None):
+        """
+        Takes a slot for key, waiting while the budget allows. Returns the time the slot was taken
+        (pass it to release); raises Overloaded when the request is shed.
+        """
+        gate = self._gate(key)
+        now = time.perf_counter()
+        deadline = (arrived if arrived is not None else now) + self.queue_timeout
+        with gate.condition:
+            if gate.limit < 1:
+                self._shed(key, gate, 'disabled')
+            elif now >= deadline:
+                self._shed(key, gate, 'expired')
+            elif gate.active < gate.limit and not gate.waiting:
+                gate.active += 1
+            elif gate.waiting >= self.max_queue:
+                self._shed(key, gate, 'queue_full')
+            else:
+                gate.waiting += 1
+                if self.on_depth is not None:
+                    self.on_depth(key, gate.waiting)
+                try:
+                    admitted = gate.condition.wait_for(lambda: gate.active < gate.limit,
+                                                       deadline - time.perf_counter())
+                finally:
+                    gate.waiting -= 1
+                    if self.on_depth is not None:
+                        self.on_depth(key, gate.waiting)
+                if not admitted:
+                    self._shed(key, gate, 'timeout')
+                gate.active += 1
+        taken = time.perf_counter()
+        if self.on_wait is not None:
+            self.on_wait(key, taken - (arrived if arrived is not None else now))
+        return taken
+
+    def release(self, key, taken):
+        gate = self._gates[key]
+        with gate.condition:
+            gate.active -= 1
+            gate.service_seconds += 0.1 * (time.perf_counter() - taken - gate.service_seconds)
+            gate.condition.notify()
+
+    @contextmanager
+    def admit(self, keys, arrived=None):
+        """
+        Holds a slot for every key in keys (taken in sorted order, so two requests asking for the
+        same keys cannot each hold one the other is waiting for) for the duration of the block.
+        """
+        held = []
+        try:
+            for key in sorted(set(keys)):
+                held.append((key, self.acquire(key, arrived)))
+            yield
+        finally:
+            for key, taken in reversed(held):
+                self.release(key, taken)
+
+    def stats(self):
+        with self._lock:
+            gates = dict(self._gates)
+        return {key: {'limit': gate.limit, 'active': gate.active, 'waiting': gate.waiting}
+                for key, gate in gates.items()}
@@ -1,52 +1,114 @@
+import atexit
+import json
 import os
-from flask import Flask, request, jsonify, render_template
-import joblib
-import numpy as np
-import pandas as pd
-from flask_cors import CORS # Keep CORS for local development or if still needed on Render
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+import startup
+
+# Only what the routes need up front; joblib and scikit-learn (pulled in by the pickled models) are
+# imported when the first model is loaded. /startup shows where the time went.
+_app_import_start = time.perf_counter()
+with startup.step('flask'):
+    from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
+with startup.step('flask_cors'):
+    from flask_cors import CORS # Keep CORS for local development or if still needed on Render
+with startup.step('app modules (numpy, registry, encoders, metrics)'):
+    import metrics
+    from admission import AdmissionController, Overloaded
+    from audit_log import AuditLog, FirestoreSink, SegmentFileSink
+    from drift_monitor import DriftMonitor, load_reference_stats, reference_from_scaler
+    from history_store import HistoryStore
+    from micro_batcher import MicroBatcher
+    from model_registry import ModelRegistry
+    from prediction_cache import PredictionCache
+    from record_stream import iter_chunks, iter_csv_records, iter_lines, iter_ndjson_records
+
+# Models are fed pre-encoded NumPy rows (see feature_encoder.py), not named DataFrames
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 CORS(app) # Enable CORS for all origins, adjust if needed for production
 
-# Define paths to model artifacts
-DIABETES_MODEL_PATH = 'model_artifacts/diabetes_rf_model_smote.joblib'
-DIABETES_SCALER_PATH = 'model_artifacts/diabetes_scaler.joblib'
-DIABETES_FEATURE_COLUMNS_PATH = 'model_artifacts/feature_columns.joblib'
-
-HEART_MODEL_PATH = 'model_artifacts/heart_disease_model.joblib'
-HEART_SCALER_PATH = 'model_artifacts/heart_disease_scaler.joblib'
-HEART_FEATURE_COLUMNS_PATH = 'model_artifacts/heart_disease_feature_columns.joblib'
-
-# Load the models, scalers, and feature columns
-diabetes_model = None
-diabetes_scaler = None
-diabetes_feature_columns = None
-
-heart_model = None
-heart_scaler = None
-heart_feature_columns = None
-
-try:
-    if os.path.exists(DIABETES_MODEL_PATH) and os.path.exists(DIABETES_SCALER_PATH) and os.path.exists(DIABETES_FEATURE_COLUMNS_PATH):
-        diabetes_model = joblib.load(DIABETES_MODEL_PATH)
-        diabetes_scaler = joblib.load(DIABETES_SCALER_PATH)
-        diabetes_feature_columns = joblib.load(DIABETES_FEATURE_COLUMNS_PATH)
-        print("Diabetes Model, Scaler, and Feature Columns loaded successfully.")
+# Models are loaded lazily, per disease type, the first time a request needs them.
+# Set PRELOAD_MODELS=all (or a comma-separated list of disease types) to load them at startup instead.
+# With PRELOAD_IN_BACKGROUND=1 they are loaded on a thread while the worker already serves / and
+# /healthz; a prediction arriving mid-load waits for that model only. The thread does not survive
+# a fork, so leave it off with gunicorn's preload_app (gunicorn_preload.conf.py loads up front).
+model_registry = ModelRegistry()
+
+PRELOAD_MODELS = os.environ.get("PRELOAD_MODELS", "")
+PRELOAD_IN_BACKGROUND = os.environ.get("PRELOAD_IN_BACKGROUND", "0") == "1"
+if PRELOAD_MODELS:
+    _preload_types = None if PRELOAD_MODELS == 'all' else PRELOAD_MODELS.split(',')
+    if PRELOAD_IN_BACKGROUND:
+        threading.Thread(target=model_registry.preload, args=(_preload_types,), daemon=True,
+                         name="model-preload").start()
     else:
-        print(f"Warning: Diabetes model artifacts not found. Expected at: {DIABETES_MODEL_PATH}, {DIABETES_SCALER_PATH}, {DIABETES_FEATURE_COLUMNS_PATH}")
+        model_registry.preload(_preload_types)
+
+# Repeated identical requests are answered from an in-process LRU cache (0 disables it).
+# PREDICTION_CACHE_TTL (seconds) optionally bounds how long an entry may be served.
+prediction_cache = PredictionCache(
+    max_size=int(os.environ.get("PREDICTION_CACHE_SIZE", 4096)),
+    ttl_seconds=float(os.environ.get("PREDICTION_CACHE_TTL", 0)),
+)
+# Cached probabilities belong to the artifacts that produced them. A first load finds no entries of
+# its disease type, so only a reload drops anything, and only the replaced model's entries.
+model_registry.add_load_listener(lambda disease_type, bundle: prediction_cache.discard(disease_type, bundle.version))
+model_registry.add_load_listener(lambda disease_type, bundle: metrics.MODEL_LOAD_SECONDS.labels(disease_type).set(bundle.load_seconds))
+model_registry.add_load_listener(lambda disease_type, bundle: metrics.MODEL_LOADS.labels(disease_type).inc())
+
+# Shared secret for the /admin routes; they are disabled when it is not set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+PREDICTION_ENDPOINTS = ('predict', 'predict_batch', 'predict_stream')
+
+
+# --- Request Metrics ---
+@app.before_request
+def _start_request_metrics():
+    if request.endpoint in PREDICTION_ENDPOINTS:
+        g.request_start = time.perf_counter()
+        metrics.IN_FLIGHT.labels(request.endpoint).inc()
+
+
+@app.after_request
+def _record_request_metrics(response):
+    if request.endpoint in PREDICTION_ENDPOINTS:
+        disease_type = g.get('disease_type') or request.args.get('disease_type') or 'unknown'
+        metrics.REQUESTS.labels(request.endpoint, disease_type).inc()
+        if response.status_code >= 400:
+            metrics.ERRORS.labels(request.endpoint, disease_type).inc()
+        metrics.REQUEST_LATENCY.labels(request.endpoint).observe(time.perf_counter() - g.request_start)
+    return response
 
-    if os.path.exists(HEART_MODEL_PATH) and os.path.exists(HEART_SCALER_PATH) and os.path.exists(HEART_FEATURE_COLUMNS_PATH):
-        heart_model = joblib.load(HEART_MODEL_PATH)
-        heart_scaler = joblib.load(HEART_SCALER_PATH)
-        heart_feature_columns = joblib.load(HEART_FEATURE_COLUMNS_PATH)
-        print("Heart Disease Model, Scaler, and Feature Columns loaded successfully.")
-    else:
-        print(f"Warning: Heart Disease model artifacts not found. Expected at: {HEART_MODEL_PATH}, {HEART_SCALER_PATH}, {HEART_FEATURE_COLUMNS_PATH}")
 
-except Exception as e:
-    print(f"Error loading model artifacts: {e}")
-    # It's crucial to ensure these models are actually loaded.
-    # For a production app, you might want to exit if models can't be loaded.
+@app.teardown_request
+def _finish_request_metrics(exc):
+    if request.endpoint in PREDICTION_ENDPOINTS and 'request_start' in g:
+        metrics.IN_FLIGHT.labels(request.endpoint).dec()
+
+
+def overloaded_payload(e):
+    """
+    The 503 body for a request shed by admission control (sent with Retry-After: e.retry_after).
+    """
+    disease_type = e.key[len(STREAM_GATE_PREFIX):] if e.key.startswith(STREAM_GATE_PREFIX) else e.key
+    return {"error": f"The server is too busy to score {disease_type} predictions right now. Please retry shortly."}
+
+
+@app.errorhandler(Overloaded)
+def _overloaded(e):
+    response = jsonify(overloaded_payload(e))
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
 
 # --- Frontend Route for Main App ---
 @app.route('/')
@@ -56,139 +118,738 @@ def home():
     """
     return render_template('index.html')
 
+
+# --- Health and Startup Routes ---
+def health_payload():
+    return {
+        "status": "ok",
+        "models": {disease_type: model_registry.current_version(disease_type) for disease_type in RESULT_LABELS},
+    }
+
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """
+    Liveness check: answers as soon as the app is imported and never loads a model. 'models' lists
+    the version loaded in this worker for each disease type (null until its first request).
+    """
+    return jsonify(health_payload())
+
+
+@app.route('/startup', methods=['GET'])
+def startup_report():
+    """
+    Startup timing breakdown for this worker: import phases, per-artifact model load times and the
+    time from process start to the first prediction.
+    """
+    return jsonify(startup.report(model_registry.loaded_bundles()))
+
+# --- Prediction Helpers ---
+RESULT_LABELS = {
+    'diabetes': ('Diabetes', 'No Diabetes'),
+    'heart_disease': ('Heart Disease', 'No Heart Disease'),
+}
+
+# Upper bound on the number of records accepted by /predict/batch in one call
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 10000))
+# Rows scored per vectorized model call by /predict/stream
+STREAM_CHUNK_ROWS = int(os.environ.get("STREAM_CHUNK_ROWS", 1000))
+
+
+def _predict_block(bundle, canonical_inputs):
+    """
+    Encodes canonicalized inputs and scores them with one predict_proba call. The block is fed to
+    the drift monitor before it is scaled, so scored rows are encoded only once.
+    """
+    start = time.perf_counter()
+    input_block = bundle.encoder.encode_canonical_many(canonical_inputs, scale=False)
+    unscaled = time.perf_counter()
+    _observe_drift(bundle, input_block)
+    scaling = time.perf_counter()
+    bundle.encoder.scale_block(input_block)
+    encoded = time.perf_counter()
+    scored = bundle.model.predict_proba(input_block)[:, 1]
+    metrics.STAGE_LATENCY.labels(bundle.disease_type, 'encode').observe((unscaled - start) + (encoded - scaling))
+    metrics.STAGE_LATENCY.labels(bundle.disease_type, 'predict').observe(time.perf_counter() - encoded)
+    startup.mark_first_prediction()
+    return [float(probability) for probability in scored]
+
+
+def _predict_micro_batch(items):
+    """
+    Scores the (bundle, canonical input) pairs collected by a MicroBatcher. Items queued across a
+    hot reload may carry different bundles, so each bundle's rows are scored separately.
+    """
+    probabilities = [None] * len(items)
+    grouped = {}  # id(bundle) -> (bundle, [positions])
+    for position, (bundle, _) in enumerate(items):
+        grouped.setdefault(id(bundle), (bundle, []))[1].append(position)
+    for bundle, positions in grouped.values():
+        for position, probability in zip(positions, _predict_block(bundle, [items[i][1] for i in positions])):
+            probabilities[position] = probability
+    return probabilities
+
+
+# Opt-in: with MICROBATCH=1, concurrent single-row /predict requests for the same disease type are
+# queued and scored together, up to MICROBATCH_MAX_SIZE rows or MICROBATCH_MAX_WAIT_MS after the
+# first one. Only useful when a worker serves requests on several threads (e.g. gthread workers).
+MICROBATCH = os.environ.get("MICROBATCH", "0") == "1"
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", 32))
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get("MICROBATCH_MAX_WAIT_MS", 2))
+
+micro_batchers = {}
+if MICROBATCH:
+    for _disease_type in RESULT_LABELS:
+        micro_batchers[_disease_type] = MicroBatcher(
+            _predict_micro_batch, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS, name=f"micro-batcher-{_disease_type}",
+            on_batch=metrics.MICROBATCH_SIZE.labels(_disease_type).observe)
+
+
+# Admission control: at most ADMISSION_CONCURRENCY predictions per disease type are worked on at
+# once in each worker (ADMISSION_LIMITS overrides it per disease type, e.g. "heart_disease=2"; 0
+# sheds them all), and a request that cannot start within ADMISSION_QUEUE_MS of arriving, or finds
+# ADMISSION_MAX_QUEUE requests already waiting, gets an immediate 503 with Retry-After instead of
+# being served after its client has given up. It only sees requests the worker has accepted, so it
+# matters with threaded workers (gthread, uvicorn); keep the queue short, as every waiting request
+# holds a thread. With MICROBATCH the default limit is a full micro-batch, so the batches still
+# fill up. /predict/stream uploads hold a slot for as long as they are read, so they queue at
+# their own stream:<disease type> gates, STREAM_CONCURRENCY at a time, and never take the slots
+# of /predict and /predict/batch. ADMISSION_CONCURRENCY=0 turns it off.
+ADMISSION_CONCURRENCY = int(os.environ.get("ADMISSION_CONCURRENCY", MICROBATCH_MAX_SIZE if MICROBATCH else 4))
+STREAM_CONCURRENCY = int(os.environ.get("STREAM_CONCURRENCY", 2))
+STREAM_GATE_PREFIX = 'stream:'
+admission = None
+if ADMISSION_CONCURRENCY > 0:
+    _admission_limits = {f"{STREAM_GATE_PREFIX}{disease_type}": STREAM_CONCURRENCY for disease_type in RESULT_LABELS}
+    _admission_limits.update((name, int(limit)) for name, _, limit in
+                             (part.partition('=') for part in os.environ.get("ADMISSION_LIMITS", "").split(',') if part))
+    admission = AdmissionController(
+        ADMISSION_CONCURRENCY,
+        float(os.environ.get("ADMISSION_QUEUE_MS", 250)),
+        limits=_admission_limits,
+        max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", 2 * ADMISSION_CONCURRENCY)),
+        on_depth=lambda gate, waiting: metrics.ADMISSION_QUEUE_DEPTH.labels(gate).set(waiting),
+        on_shed=lambda gate, reason: metrics.ADMISSION_SHED.labels(gate, reason).inc(),
+        on_wait=lambda gate, seconds: metrics.ADMISSION_WAIT_SECONDS.labels(gate).observe(seconds),
+    )
+
+
+def _admit(disease_types, arrived=None):
+    """
+    Context holding an admission slot for each disease type; raises Overloaded when shed.
+    """
+    return admission.admit(disease_types, arrived) if admission is not None else nullcontext()
+
+
+# Every served prediction is added to an audit trail without any I/O on the request path: records
+# are buffered in memory and a background thread appends them in batches to segment files under
+# AUDIT_LOG_DIR, to the queryable history database behind /history (HISTORY_DB), and to Firestore
+# when AUDIT_SINKS includes it (e.g. the emulator at FIRESTORE_EMULATOR_HOST). The buffer
+# (AUDIT_BUFFER_SIZE) holds several of the largest /predict/batch requests by default; when it is
+# full, AUDIT_POLICY picks drop_oldest, drop_newest or block (wait up to AUDIT_BLOCK_MS), and the
+# drops are logged and counted in /metrics. AUDIT_LOG=0 turns it off.
+AUDIT_LOG = os.environ.get("AUDIT_LOG", "1") == "1"
+FIRESTORE_EMULATOR_HOST = os.environ.get("FIRESTORE_EMULATOR_HOST")
+AUDIT_SINKS = os.environ.get("AUDIT_SINKS", "file,history,firestore" if FIRESTORE_EMULATOR_HOST else "file,history").split(',')
+# An empty HISTORY_DB disables the history database and /history. It is opened (and created) on
+# first use, by the audit log's history sink or the first /history request, not on import.
+HISTORY_DB = os.environ.get("HISTORY_DB", "prediction_history.db")
+_history_store = None
+_history_store_lock = threading.Lock()
+# Shared secret for /history; it is disabled when neither this nor ADMIN_TOKEN is set
+HISTORY_TOKEN = os.environ.get("HISTORY_TOKEN")
+
+
+def _audit_flushed(sink_name, records, seconds, error):
+    metrics.AUDIT_RECORDS.labels(sink_name, 'failed' if error is not None else 'written').inc(records)
+    metrics.AUDIT_FLUSH_SECONDS.labels(sink_name).observe(seconds)
+
+
+def history_store():
+    """
+    The HistoryStore at HISTORY_DB, opened on first call, or None when HISTORY_DB is empty.
+    """
+    global _history_store
+    if _history_store is None and HISTORY_DB:
+        with _history_store_lock:
+            if _history_store is None:
+                _history_store = HistoryStore(HISTORY_DB)
+    return _history_store
+
+
+def _build_audit_log():
+    sinks = []
+    if 'file' in AUDIT_SINKS:
+        sinks.append(SegmentFileSink(os.environ.get("AUDIT_LOG_DIR", "audit_log"),
+                                     int(os.environ.get("AUDIT_SEGMENT_MB", 64)) * 1024 * 1024,
+                                     fsync=os.environ.get("AUDIT_FSYNC", "0") == "1"))
+    if 'history' in AUDIT_SINKS and HISTORY_DB:
+        sinks.append(history_store())
+    if 'firestore' in AUDIT_SINKS:
+        if not FIRESTORE_EMULATOR_HOST:
+            raise RuntimeError("AUDIT_SINKS includes firestore but FIRESTORE_EMULATOR_HOST is not set")
+        sinks.append(FirestoreSink(FIRESTORE_EMULATOR_HOST, os.environ.get("FIRESTORE_PROJECT", "demo-health-risk"),
+                                   os.environ.get("AUDIT_FIRESTORE_COLLECTION", "prediction_audit")))
+    return AuditLog(
+        sinks,
+        capacity=int(os.environ.get("AUDIT_BUFFER_SIZE", 4 * MAX_BATCH_SIZE)),
+        batch_size=int(os.environ.get("AUDIT_BATCH_SIZE", 500)),
+        flush_seconds=float(os.environ.get("AUDIT_FLUSH_SECONDS", 1)),
+        policy=os.environ.get("AUDIT_POLICY", "drop_oldest"),
+        block_ms=float(os.environ.get("AUDIT_BLOCK_MS", 5)),
+        on_flush=_audit_flushed,
+        on_drop=metrics.AUDIT_RECORDS.labels('buffer', 'dropped').inc,
+    )
+
+
+audit_log = _build_audit_log() if AUDIT_LOG else None
+if audit_log is not None:
+    atexit.register(audit_log.close)
+
+# Every scored input is also folded into per-feature streaming statistics, compared at /drift with
+# those of the model's training data: its reference stats file (train_heart_disease_model.py
+# writes one next to the pipeline) when it was generated for the model file being served, or else
+# the moments the model's scaler was fit on. DRIFT_WINDOW rows make up one window;
+# DRIFT_MONITOR=0 turns it off. Each worker process monitors the traffic it serves.
+DRIFT_MONITOR = os.environ.get("DRIFT_MONITOR", "1") == "1"
+DRIFT_WINDOW = int(os.environ.get("DRIFT_WINDOW", 10000))
+_drift_monitors = {}  # disease_type -> (model version, DriftMonitor or None)
+_drift_monitors_lock = threading.Lock()
+
+
+def _build_drift_monitor(bundle):
+    reference = None
+    path = model_registry.artifacts[bundle.disease_type].get('reference_stats')
+    if path and os.path.exists(path):
+        from forest_engine import file_sha256
+
+        stats = load_reference_stats(path)
+        # Statistics of another model's encoding (e.g. the pipeline's, while the legacy model
+        # serves) would flag every column that model encodes differently
+        if stats.get('model_sha256') == file_sha256(model_registry.artifact_paths(bundle.disease_type)[0]):
+            reference = stats
+        else:
+            print(f"Warning: {path} was not generated for the {model_registry.label(bundle.disease_type)} model "
+                  f"being served; drift is measured against its scaler's moments instead.")
+    if reference is None:
+        if getattr(bundle.scaler, 'mean_', None) is None or not hasattr(bundle.scaler, 'feature_names_in_'):
+            return None
+        reference = reference_from_scaler(bundle.scaler, bundle.feature_columns)
+    return DriftMonitor(reference, bundle.feature_columns, DRIFT_WINDOW)
+
+
+def _drift_monitor(bundle):
+    """
+    The DriftMonitor for the bundle's model version (a reload starts a new one), or None.
+    """
+    entry = _drift_monitors.get(bundle.disease_type)
+    if entry is None or entry[0] != bundle.version:
+        with _drift_monitors_lock:
+            entry = _drift_monitors.get(bundle.disease_type)
+            if entry is None or entry[0] != bundle.version:
+                entry = (bundle.version, _build_drift_monitor(bundle))
+                _drift_monitors[bundle.disease_type] = entry
+    return entry[1]
+
+
+def _observe_drift(bundle, block):
+    """
+    Folds an unscaled input block into the bundle's drift monitor, when there is one.
+    """
+    if not DRIFT_MONITOR:
+        return
+    start = time.perf_counter()
+    monitor = _drift_monitor(bundle)
+    if monitor is not None:
+        monitor.observe(block)
+        metrics.STAGE_LATENCY.labels(bundle.disease_type, 'drift').observe(time.perf_counter() - start)
+
+
+def _score(bundle, canonical_inputs):
+    """
+    Returns positive-class probabilities for a list of canonicalized inputs, answering what it can
+    from the prediction cache and scoring the rest with a single predict_proba call.
+    A single missing row goes through the disease's micro-batcher when MICROBATCH is enabled.
+    Every returned probability is queued for the audit log, and every input is fed to the drift monitor.
+    """
+    disease_type = bundle.disease_type
+    probabilities = [None] * len(canonical_inputs)
+    cache_keys = None
+    if prediction_cache.enabled:
+        cache_keys = [(disease_type, bundle.version, values) for values in canonical_inputs]
+        probabilities = [prediction_cache.get(key) for key in cache_keys]
+
+    missing = [i for i, probability in enumerate(probabilities) if probability is None]
+    if cache_keys is not None:
+        metrics.CACHE_LOOKUPS.labels(disease_type, 'hit').inc(len(canonical_inputs) - len(missing))
+        metrics.CACHE_LOOKUPS.labels(disease_type, 'miss').inc(len(missing))
+    if missing:
+        batcher = micro_batchers.get(disease_type)
+        if batcher is not None and len(missing) == 1:
+            scored = [batcher.submit((bundle, canonical_inputs[missing[0]])).result()]
+        else:
+            scored = _predict_block(bundle, [canonical_inputs[i] for i in missing])
+        for i, probability in zip(missing, scored):
+            probabilities[i] = probability
+            if cache_keys is not None:
+                prediction_cache.put(cache_keys[i], probabilities[i])
+        if cache_keys is not None:
+            metrics.CACHE_ENTRIES.labels().set(len(prediction_cache))
+    if audit_log is not None:
+        audit_log.record_many(disease_type, bundle.version, probabilities, canonical_inputs, bundle.encoder.input_keys)
+    if DRIFT_MONITOR and len(missing) < len(canonical_inputs):
+        # Scored rows were observed in _predict_block; cache hits were never encoded, so only they are here
+        scored_rows = set(missing)
+        hits = [values for i, values in enumerate(canonical_inputs) if i not in scored_rows]
+        _observe_drift(bundle, bundle.encoder.encode_canonical_many(hits, scale=False))
+    return probabilities
+
+
+def _explain(bundle, canonical_inputs):
+    """
+    Per-field contributions to each input's probability, from the model's ForestExplainer: the
+    base value plus all contributions gives the probability. Largest effects come first.
+    """
+    start = time.perf_counter()
+    explainer = bundle.explainer()
+    contributions = explainer.explain(bundle.encoder.encode_canonical_many(canonical_inputs))
+    explanations = []
+    for row in contributions:
+        order = sorted(range(len(row)), key=lambda j: -abs(row[j]))
+        explanations.append({
+            "base_value": explainer.base_value,
+            "contributions": [{"feature": explainer.group_names[j], "contribution": float(row[j])} for j in order],
+        })
+    metrics.STAGE_LATENCY.labels(bundle.disease_type, 'explain').observe(time.perf_counter() - start)
+    return explanations
+
+
+def _format_prediction(disease_type, prediction_proba):
+    """
+    Builds the JSON payload the frontend expects for one scored record.
+    """
+    positive_label, negative_label = RESULT_LABELS[disease_type]
+    prediction_text = positive_label if prediction_proba >= 0.5 else negative_label
+    return {
+        "prediction_text": f"Prediction: {prediction_text}",
+        "probability": f"Probability of {positive_label}: {prediction_proba:.2%}"
+    }
+
+
+def _predict_one(disease_type, data):
+    """
+    Scores a request body with one disease type's model. Returns (response_dict, status_code).
+    """
+    bundle = model_registry.get(disease_type)
+    if bundle is None:
+        return {"error": f"{model_registry.label(disease_type)} model artifacts not loaded. Cannot make prediction."}, 500
+
+    canonical = bundle.encoder.canonicalize(data)
+    prediction_proba = _score(bundle, [canonical])[0]
+    formatting = time.perf_counter()
+    result = _format_prediction(disease_type, prediction_proba)
+    result["model_version"] = bundle.version
+    if data.get('explain'):
+        result["explanation"] = _explain(bundle, [canonical])[0]
+    metrics.STAGE_LATENCY.labels(disease_type, 'format').observe(time.perf_counter() - formatting)
+    return result, 200
+
+
+def _predict_one_guarded(disease_type, data):
+    try:
+        return _predict_one(disease_type, data)
+    except Exception as e:
+        print(f"Error during {disease_type} prediction: {e}")
+        return {"error": f"An unexpected error occurred during prediction: {str(e)}."}, 400
+
+
+# A request naming several disease types ("disease_types": [...]) runs its models side by side:
+# the first on the request's own thread, the others on this pool, so the response takes about as
+# long as the slowest model. Tree inference and the NumPy encoding release the GIL for most of the
+# work. On a single CPU there is nothing to overlap, so the models then run one after the other
+# (MULTI_PREDICT_THREADS=0). The pool is created per process, as threads do not survive a fork.
+MULTI_PREDICT_THREADS = int(os.environ.get("MULTI_PREDICT_THREADS", len(RESULT_LABELS) - 1 if (os.cpu_count() or 1) > 1 else 0))
+_multi_predict_pool = None
+_multi_predict_pool_pid = None
+_multi_predict_pool_lock = threading.Lock()
+
+
+def _multi_predict_executor():
+    global _multi_predict_pool, _multi_predict_pool_pid
+    if _multi_predict_pool_pid != os.getpid():
+        with _multi_predict_pool_lock:
+            if _multi_predict_pool_pid != os.getpid():
+                _multi_predict_pool = ThreadPoolExecutor(MULTI_PREDICT_THREADS, thread_name_prefix="multi-predict")
+                _multi_predict_pool_pid = os.getpid()
+    return _multi_predict_pool
+
+
+def predict_multi_payload(data, parse_seconds=0.0, arrived=None):
+    """
+    Scores one request body against every model in data['disease_types'], in parallel. Fields the
+    models share are sent once: the heart disease encoder also reads unprefixed keys, so 'age'
+    serves both models. Returns ({"results": {disease_type: response_dict}}, status_code); a
+    failure for one disease type is reported in its entry without failing the others.
+    """
+    disease_types = data.get('disease_types')
+    if (not isinstance(disease_types, list) or not disease_types
+            or any(disease_type not in RESULT_LABELS for disease_type in disease_types)):
+        return {"error": f"disease_types must be a list drawn from: {', '.join(RESULT_LABELS)}."}, 400
+    disease_types = list(dict.fromkeys(disease_types))
+    for disease_type in disease_types:
+        metrics.STAGE_LATENCY.labels(disease_type, 'parse').observe(parse_seconds)
+
+    with _admit(disease_types, arrived):
+        if MULTI_PREDICT_THREADS > 0:
+            futures = [_multi_predict_executor().submit(_predict_one_guarded, disease_type, data)
+                       for disease_type in disease_types[1:]]
+            outcomes = [_predict_one_guarded(disease_types[0], data)] + [future.result() for future in futures]
+        else:
+            outcomes = [_predict_one_guarded(disease_type, data) for disease_type in disease_types]
+    statuses = [status for _, status in outcomes]
+    status = 200 if 200 in statuses else statuses[0]
+    return {"results": {disease_type: result for disease_type, (result, _) in zip(disease_types, outcomes)}}, status
+
+
+def predict_payload(data, parse_seconds=0.0, arrived=None):
+    """
+    Scores one /predict request body. Returns (response_dict, status_code).
+    Shared by the Flask route below and the ASGI entry point in asgi_app.py.
+    arrived (a time.perf_counter() value) starts the admission queue-time budget; raises
+    Overloaded when the request is shed.
+    """
+    try:
+        if 'disease_types' in data:
+            return predict_multi_payload(data, parse_seconds, arrived)
+        disease_type = data.get('disease_type')
+        if disease_type not in RESULT_LABELS:
+            return {"error": "Unknown disease type."}, 400
+        metrics.STAGE_LATENCY.labels(disease_type, 'parse').observe(parse_seconds)
+        with _admit([disease_type], arrived):
+            return _predict_one(disease_type, data)
+
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"Error during prediction: {e}")
+        return {"error": f"An unexpected error occurred during prediction: {str(e)}."}, 400
+
+
+def predict_batch_payload(data, arrived=None):
+    """
+    Scores one /predict/batch request body. Returns (response_dict, status_code).
+    All valid records of the same disease type are scored with a single predict_proba call,
+    and results (or per-record errors) are returned in input order. Holds an admission slot for
+    every disease type in the batch; raises Overloaded when shed.
+    """
+    try:
+        records = data.get('records')
+        if not isinstance(records, list):
+            return {"error": "'records' must be a list of patient records."}, 400
+        if len(records) > MAX_BATCH_SIZE:
+            return {"error": f"Batch too large: at most {MAX_BATCH_SIZE} records per request."}, 413
+
+        default_disease_type = data.get('disease_type')
+        explain = bool(data.get('explain'))
+        results = [None] * len(records)
+        grouped = {}  # disease_type -> ([indices], [records])
+
+        for index, record in enumerate(records):
+            disease_type = record.get('disease_type', default_disease_type) if isinstance(record, dict) else default_disease_type
+            if disease_type not in RESULT_LABELS:
+                results[index] = {"index": index, "error": "Unknown disease type."}
+                continue
+            indices, group = grouped.setdefault(disease_type, ([], []))
+            indices.append(index)
+            group.append(record)
+
+        with _admit(grouped, arrived):
+            for disease_type, (indices, group) in grouped.items():
+                bundle = model_registry.get(disease_type)
+                if bundle is None:
+                    error = f"{model_registry.label(disease_type)} model artifacts not loaded. Cannot make prediction."
+                    for index in indices:
+                        results[index] = {"index": index, "error": error}
+                    continue
+
+                canonical_inputs, valid_positions, errors = bundle.encoder.canonicalize_many(group)
+                for position, message in errors:
+                    results[indices[position]] = {"index": indices[position], "error": message}
+                if not canonical_inputs:
+                    continue
+
+                probabilities = _score(bundle, canonical_inputs)
+                explanations = _explain(bundle, canonical_inputs) if explain else [None] * len(probabilities)
+                for position, prediction_proba, explanation in zip(valid_positions, probabilities, explanations):
+                    index = indices[position]
+                    result = _format_prediction(disease_type, prediction_proba)
+                    result["index"] = index
+                    result["disease_type"] = disease_type
+                    result["probability_value"] = prediction_proba
+                    result["model_version"] = bundle.version
+                    if explanation is not None:
+                        result["explanation"] = explanation
+                    results[index] = result
+
+        return {"results": results}, 200
+
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"Error during batch prediction: {e}")
+        return {"error": f"An unexpected error occurred during batch prediction: {str(e)}."}, 400
+
+
+def request_disease_type(data, batch=False):
+    """
+    The disease_type label used for request metrics: the requested type, or 'mixed' for a batch
+    without a valid default type and for a request naming several disease types.
+    """
+    disease_type = data.get('disease_type') if isinstance(data, dict) else None
+    if disease_type in RESULT_LABELS:
+        return disease_type
+    return 'mixed' if batch or (isinstance(data, dict) and 'disease_types' in data) else None
+
+
 # --- Prediction API Endpoint (Unified for both diseases) ---
 @app.route('/predict', methods=['POST'])
 def predict():
     """
     Handles the prediction request from the web form for either Diabetes or Heart Disease.
     It takes user input, preprocesses it, makes a prediction using the loaded model,
-    and returns the result as a JSON response.
+    and returns the result as a JSON response. With "explain": true the response also carries
+    per-field contributions to the probability. A body with "disease_types": [...] instead of
+    "disease_type" is scored by each of those models at once (see predict_multi_payload).
     """
+    start = time.perf_counter()
     try:
         data = request.get_json(force=True)
-        disease_type = data.get('disease_type')
-
-        if disease_type == 'diabetes':
-            if diabetes_model is None or diabetes_scaler is None or diabetes_feature_columns is None:
-                return jsonify({"error": "Diabetes model artifacts not loaded. Cannot make prediction."}), 500
-
-            # Prepare input data for the diabetes model
-            input_df = pd.DataFrame(0, index=[0], columns=diabetes_feature_columns)
-
-            # Populate with received data
-            numerical_features = ['age', 'bmi', 'HbA1c_level', 'blood_glucose_level']
-            for feature in numerical_features:
-                if feature in data:
-                    input_df[feature] = float(data[feature])
-
-            binary_features = ['hypertension', 'heart_disease']
-            for feature in binary_features:
-                if feature in data:
-                    input_df[feature] = int(data[feature])
-
-            gender_map = {
-                'Female': 'gender_Female',
-                'Male': 'gender_Male',
-                'Other': 'gender_Other'
-            }
-            smoking_history_map = {
-                'never': 'smoking_history_never',
-                'No Info': 'smoking_history_No Info',
-                'current': 'smoking_history_current',
-                'ever': 'smoking_history_ever',
-                'former': 'smoking_history_former',
-                'not current': 'smoking_history_not current'
-            }
-
-            if data.get('gender') and data['gender'] in gender_map and gender_map[data['gender']] in input_df.columns:
-                input_df[gender_map[data['gender']]] = 1
-
-            if data.get('smoking_history') and data['smoking_history'] in smoking_history_map and smoking_history_map[data['smoking_history']] in input_df.columns:
-                input_df[smoking_history_map[data['smoking_history']]] = 1
-            
-            # Ensure the order of columns matches the training data used by the scaler and model
-            input_df = input_df[diabetes_feature_columns]
-
-            # Scale the numerical features
-            numerical_cols_to_scale = [col for col in numerical_features if col in diabetes_feature_columns]
-            if numerical_cols_to_scale: # Only scale if there are numerical columns to scale
-                input_df[numerical_cols_to_scale] = diabetes_scaler.transform(input_df[numerical_cols_to_scale])
-
-            prediction_proba = diabetes_model.predict_proba(input_df)[:, 1][0]
-            prediction_class = (prediction_proba >= 0.5).astype(int)
-
-            prediction_text = "No Diabetes"
-            if prediction_class == 1:
-                prediction_text = "Diabetes"
-
-            return jsonify({
-                "prediction_text": f"Prediction: {prediction_text}",
-                "probability": f"Probability of Diabetes: {prediction_proba:.2%}"
-            })
-
-        elif disease_type == 'heart_disease':
-            if heart_model is None or heart_scaler is None or heart_feature_columns is None:
-                return jsonify({"error": "Heart Disease model artifacts not loaded. Cannot make prediction."}), 500
-
-            # Prepare input data for the heart disease model
-            input_df = pd.DataFrame(0, index=[0], columns=heart_feature_columns)
-
-            # Populate with received data for heart disease
-            hd_numerical_features = ['age', 'trestbps', 'chol', 'thalach', 'oldpeak']
-            for feature_name in hd_numerical_features:
-                # Note: Assuming incoming data keys match expected column names after processing, e.g., 'hd_age' maps to 'age' in model's features
-                # The frontend sends 'hd_age', 'hd_sex' etc., which will be processed to 'age', 'sex_1'
-                if f"hd_{feature_name}" in data and feature_name in input_df.columns:
-                    input_df[feature_name] = float(data[f"hd_{feature_name}"])
-            
-            # Handle categorical features for heart disease (e.g., sex, cp, fbs, restecg, exang, slope, ca, thal)
-            hd_categorical_inputs = {
-                'hd_sex': {0: 'sex_0', 1: 'sex_1'},
-                'hd_cp': {0: 'cp_0', 1: 'cp_1', 2: 'cp_2', 3: 'cp_3'},
-                'hd_fbs': {0: 'fbs_0', 1: 'fbs_1'},
-                'hd_restecg': {0: 'restecg_0', 1: 'restecg_1', 2: 'restecg_2'},
-                'hd_exang': {0: 'exang_0', 1: 'exang_1'},
-                'hd_slope': {0: 'slope_0', 1: 'slope_1', 2: 'slope_2'},
-                'hd_ca': {0: 'ca_0', 1: 'ca_1', 2: 'ca_2', 3: 'ca_3', 4: 'ca_4'},
-                'hd_thal': {0: 'thal_0', 1: 'thal_1', 2: 'thal_2', 3: 'thal_3'}
-            }
-
-            for feature_name_with_prefix, value_map in hd_categorical_inputs.items():
-                if feature_name_with_prefix in data and int(data[feature_name_with_prefix]) in value_map:
-                    col_name_in_model = value_map[int(data[feature_name_with_prefix])]
-                    if col_name_in_model in input_df.columns:
-                        input_df[col_name_in_model] = 1
-
-            # Ensure all columns are in the correct order for the model
-            input_df = input_df[heart_feature_columns]
-
-            # Scale numerical features for heart disease model
-            heart_numerical_cols_to_scale = [col for col in hd_numerical_features if col.replace('hd_', '') in heart_feature_columns]
-            if heart_numerical_cols_to_scale: # Only scale if there are numerical columns to scale
-                # The scaler expects column names as they were during training ('age', 'trestbps', etc.)
-                # not with the 'hd_' prefix.
-                cols_for_scaler = [col.replace('hd_', '') for col in heart_numerical_cols_to_scale]
-                input_df[cols_for_scaler] = heart_scaler.transform(input_df[cols_for_scaler])
-
-            prediction_proba = heart_model.predict_proba(input_df)[:, 1][0]
-            prediction_class = (prediction_proba >= 0.5).astype(int)
-
-            prediction_text = "No Heart Disease"
-            if prediction_class == 1:
-                prediction_text = "Heart Disease"
-
-            return jsonify({
-                "prediction_text": f"Prediction: {prediction_text}",
-                "probability": f"Probability of Heart Disease: {prediction_proba:.2%}"
-            })
-
-        else:
-            return jsonify({"error": "Unknown disease type."}), 400
-
     except Exception as e:
         print(f"Error during prediction: {e}")
         return jsonify({"error": f"An unexpected error occurred during prediction: {str(e)}."}), 400
+    g.disease_type = request_disease_type(data)
+    result, status = predict_payload(data, time.perf_counter() - start, g.request_start)
+    return jsonify(result), status
+
+
+# --- Batch Prediction API Endpoint ---
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Scores many patient records in one request.
+    Expects {"disease_type": ..., "records": [...]}; a record may override disease_type itself.
+    "explain": true adds per-field contributions to every result.
+    """
+    try:
+        data = request.get_json(force=True)
+    except Exception as e:
+        print(f"Error during batch prediction: {e}")
+        return jsonify({"error": f"An unexpected error occurred during batch prediction: {str(e)}."}), 400
+    g.disease_type = request_disease_type(data, batch=True)
+    result, status = predict_batch_payload(data, g.request_start)
+    return jsonify(result), status
+
+
+# --- Streaming Bulk Prediction API Endpoint ---
+@app.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    Scores a large CSV or NDJSON upload for one disease type (?disease_type=...).
+    CSV needs a header row: request field names, or cleveland.csv's positional 0..13 header.
+    The body is read in fixed-size blocks and scored STREAM_CHUNK_ROWS rows at a time, and the
+    results are streamed back as NDJSON while the upload is still being read.
+    """
+    disease_type = request.args.get('disease_type')
+    if disease_type not in RESULT_LABELS:
+        return jsonify({"error": "Unknown disease type."}), 400
+
+    upload_format = request.args.get('format') or ('csv' if 'csv' in (request.mimetype or '') else 'ndjson')
+    if upload_format not in ('csv', 'ndjson'):
+        return jsonify({"error": "Unsupported format: use 'csv' or 'ndjson'."}), 400
+
+    # The whole upload is scored under one slot of the disease type's stream gate, released when
+    # the response is closed
+    gate = f"{STREAM_GATE_PREFIX}{disease_type}"
+    admitted = admission.acquire(gate, g.request_start) if admission is not None else None
+    bundle = model_registry.get(disease_type)
+    if bundle is None:
+        if admitted is not None:
+            admission.release(gate, admitted)
+        return jsonify({"error": f"{model_registry.label(disease_type)} model artifacts not loaded. Cannot make prediction."}), 500
+
+    def generate():
+        lines = iter_lines(request.stream)
+        rows = iter_csv_records(lines) if upload_format == 'csv' else iter_ndjson_records(lines)
+        scored, failed, failure = 0, 0, None
+        try:
+            for chunk in iter_chunks(rows, STREAM_CHUNK_ROWS):
+                results = {}
+                canonical_inputs, row_numbers = [], []
+                for row_number, record, error in chunk:
+                    if error is None:
+                        try:
+                            canonical_inputs.append(bundle.encoder.canonicalize(record))
+                            row_numbers.append(row_number)
+                            continue
+                        except Exception as e:
+                            error = str(e)
+                    results[row_number] = {"row": row_number, "error": error}
+
+                if canonical_inputs:
+                    for row_number, prediction_proba in zip(row_numbers, _score(bundle, canonical_inputs)):
+                        result = _format_prediction(disease_type, prediction_proba)
+                        result["row"] = row_number
+                        result["probability_value"] = prediction_proba
+                        result["model_version"] = bundle.version
+                        results[row_number] = result
+
+                scored += len(canonical_inputs)
+                failed += len(chunk) - len(canonical_inputs)
+                yield ''.join(json.dumps(results[row_number]) + '\n' for row_number, _, _ in chunk)
+        except Exception as e:
+            # The 200 and earlier results are already sent: end the body with the error and the
+            # summary rather than truncating it
+            print(f"Error during streamed prediction: {e}")
+            failure = f"The upload could not be read to the end: {e}"
+
+        summary = {"rows": scored + failed, "scored": scored, "errors": failed, "model_version": bundle.version}
+        if failure is not None:
+            summary["error"] = failure
+        yield json.dumps({"summary": summary}) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    if admitted is not None:
+        response.call_on_close(lambda: admission.release(gate, admitted))
+    return response
+
+
+# --- Input Drift ---
+@app.route('/drift', methods=['GET'])
+def drift():
+    """
+    Input drift scores of this worker's traffic against the training data, per disease type
+    (?disease_type=... for one): per-feature PSI, mean shift and the features that drifted, for
+    the current window and the last complete one. Disease types not scored yet are null.
+    """
+    disease_types = [request.args['disease_type']] if request.args.get('disease_type') else list(RESULT_LABELS)
+    if any(disease_type not in RESULT_LABELS for disease_type in disease_types):
+        return jsonify({"error": "Unknown disease type."}), 400
+    report = {}
+    for disease_type in disease_types:
+        version, monitor = _drift_monitors.get(disease_type, (None, None))
+        report[disease_type] = None if monitor is None else {"model_version": version, **monitor.report()}
+    return jsonify({"pid": os.getpid(), "disease_types": report})
+
+
+# --- Prediction Cache Statistics ---
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Returns prediction cache size and hit/miss counters, for sizing PREDICTION_CACHE_SIZE.
+    """
+    return jsonify(prediction_cache.stats())
+
+
+# --- Prediction History ---
+def _parse_time(value):
+    """
+    Epoch seconds, or an ISO 8601 date/time (UTC unless it carries an offset).
+    """
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+@app.route('/history', methods=['GET'])
+def history():
+    """
+    Pages through past predictions of one disease type, newest first (or most probable first with
+    order_by=probability). Optional filters: since / until (epoch seconds or ISO 8601) and
+    min_probability / max_probability. Each response carries next_cursor; pass it back as cursor
+    for the next page. Requires the X-History-Token (or X-Admin-Token) header.
+    """
+    token = request.headers.get('X-History-Token')
+    if not ((HISTORY_TOKEN and token == HISTORY_TOKEN) or _admin_authorized()):
+        return jsonify({"error": "Forbidden."}), 403
+    store = history_store()
+    if store is None:
+        return jsonify({"error": "Prediction history is disabled."}), 404
+    args = request.args
+    disease_type = args.get('disease_type')
+    if disease_type not in RESULT_LABELS:
+        return jsonify({"error": "Unknown disease type."}), 400
+    try:
+        rows, next_cursor = store.query(
+            disease_type,
+            since=_parse_time(args['since']) if args.get('since') else None,
+            until=_parse_time(args['until']) if args.get('until') else None,
+            min_probability=float(args['min_probability']) if args.get('min_probability') else None,
+            max_probability=float(args['max_probability']) if args.get('max_probability') else None,
+            order_by=args.get('order_by', 'timestamp'),
+            limit=int(args.get('limit', 50)),
+            cursor=args.get('cursor') or None,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    for row in rows:
+        row["timestamp"] = datetime.fromtimestamp(row["ts"], timezone.utc).isoformat()
+    return jsonify({"results": rows, "next_cursor": next_cursor})
+
+
+# --- Model Administration ---
+def _admin_authorized():
+    return bool(ADMIN_TOKEN) and request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+
+
+@app.route('/admin/models', methods=['GET'])
+def admin_models():
+    """
+    Lists the model version currently served for each disease type in this worker.
+    """
+    if not _admin_authorized():
+        return jsonify({"error": "Forbidden."}), 403
+    return jsonify({
+        "pid": os.getpid(),
+        "models": {disease_type: model_registry.current_version(disease_type) for disease_type in RESULT_LABELS},
+        "report": model_registry.report(),
+    })
+
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Loads, validates and warms up the artifacts currently in model_artifacts/ in the background,
+    then atomically swaps them in. Only affects the worker that receives the request; set
+    MODEL_RELOAD_POLL_SECONDS to have every worker pick up new artifacts on its own.
+    """
+    if not _admin_authorized():
+        return jsonify({"error": "Forbidden."}), 403
+    disease_types = [request.args['disease_type']] if request.args.get('disease_type') else list(RESULT_LABELS)
+    if any(disease_type not in RESULT_LABELS for disease_type in disease_types):
+        return jsonify({"error": "Unknown disease type."}), 400
+    for disease_type in disease_types:
+        model_registry.reload_in_background(disease_type)
+    return jsonify({
+        "status": "reload started",
+        "current_versions": {disease_type: model_registry.current_version(disease_type) for disease_type in disease_types},
+    }), 202
+
+
+# --- Metrics Endpoint ---
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Exposes request, latency, model load and cache metrics in the Prometheus text format.
+    """
+    return Response(metrics.registry.render(), mimetype=metrics.CONTENT_TYPE.split(';')[0],
+                    content_type=metrics.CONTENT_TYPE)
+
 
+startup.record('app.py total', time.perf_counter() - _app_import_start)
 
 if __name__ == '__main__':
     # Render will set the PORT environment variable.
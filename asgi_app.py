@@ -0,0 +1,181 @@
+"""
+ASGI entry point serving the same /, /healthz, /predict and /predict/batch routes as app.py.
+
+Connections, request bodies, JSON parsing and response writing all live on the asyncio event loop,
+so idle keep-alive clients and slow uploads cost a coroutine rather than a worker. Encoding and
+model inference run on a bounded thread pool (ASGI_INFERENCE_THREADS), and at most that many
+requests are handed to it at once; the rest wait on the loop. The model registry, prediction
+cache, micro-batcher and metrics are the ones app.py sets up, and responses follow the same JSON
+contract static/script.js relies on.
+
+Usage:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 10000 --workers 2
+"""
+import asyncio
+import json
+import mimetypes
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import render_template
+
+import app as prediction_app
+import metrics
+from admission import Overloaded
+
+ASGI_INFERENCE_THREADS = int(os.environ.get("ASGI_INFERENCE_THREADS", min(8, os.cpu_count() or 1)))
+# Request bodies larger than this are rejected before they are buffered
+ASGI_MAX_BODY_BYTES = int(os.environ.get("ASGI_MAX_BODY_BYTES", 16 * 1024 * 1024))
+
+STATIC_ROOT = os.path.realpath(prediction_app.app.static_folder)
+
+_executor = ThreadPoolExecutor(max_workers=ASGI_INFERENCE_THREADS, thread_name_prefix='asgi-inference')
+_inference_slots = None  # asyncio.Semaphore, created on the running loop
+_index_html = None
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+async def _read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > ASGI_MAX_BODY_BYTES:
+            raise RequestTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+async def _send(send, status, body, content_type='application/json', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        # Same allow-all CORS policy as CORS(app) in app.py
+        'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode()),
+                    (b'access-control-allow-origin', b'*'), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_json(send, payload, status=200):
+    await _send(send, status, json.dumps(payload).encode())
+
+
+async def _run_inference(fn, *args):
+    """
+    Runs fn(*args) on the inference pool, with at most ASGI_INFERENCE_THREADS calls outstanding.
+    """
+    global _inference_slots
+    if _inference_slots is None:
+        _inference_slots = asyncio.Semaphore(ASGI_INFERENCE_THREADS)
+    async with _inference_slots:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+def _render_index():
+    with prediction_app.app.test_request_context('/'):
+        return render_template('index.html').encode()
+
+
+async def _home(send):
+    global _index_html
+    if _index_html is None:
+        _index_html = await asyncio.get_running_loop().run_in_executor(None, _render_index)
+    await _send(send, 200, _index_html, 'text/html; charset=utf-8')
+
+
+async def _static(send, relative_path):
+    path = os.path.realpath(os.path.join(STATIC_ROOT, relative_path))
+    if not path.startswith(STATIC_ROOT + os.sep) or not os.path.isfile(path):
+        await _send_json(send, {"error": "Not found."}, 404)
+        return
+
+    def read():
+        with open(path, 'rb') as f:
+            return f.read()
+
+    body = await asyncio.get_running_loop().run_in_executor(None, read)
+    await _send(send, 200, body, mimetypes.guess_type(path)[0] or 'application/octet-stream')
+
+
+async def _predict(receive, send, endpoint):
+    start = time.perf_counter()
+    batch = endpoint == 'predict_batch'
+    disease_type = 'unknown'
+    status = 400
+    metrics.IN_FLIGHT.labels(endpoint).inc()
+    try:
+        try:
+            data = json.loads(await _read_body(receive))
+        except RequestTooLarge:
+            status = 413
+            await _send_json(send, {"error": f"Request body too large: at most {ASGI_MAX_BODY_BYTES} bytes."}, status)
+            return
+        except Exception as e:
+            label = "batch prediction" if batch else "prediction"
+            await _send_json(send, {"error": f"An unexpected error occurred during {label}: {str(e)}."}, status)
+            return
+
+        disease_type = prediction_app.request_disease_type(data, batch) or 'unknown'
+        try:
+            # The admission budget starts now, so time spent queued for an inference thread counts
+            if batch:
+                result, status = await _run_inference(prediction_app.predict_batch_payload, data, start)
+            else:
+                result, status = await _run_inference(prediction_app.predict_payload, data,
+                                                      time.perf_counter() - start, start)
+        except Overloaded as e:
+            status = 503
+            await _send(send, status, json.dumps(prediction_app.overloaded_payload(e)).encode(),
+                        headers=[(b'retry-after', str(e.retry_after).encode())])
+            return
+        await _send_json(send, result, status)
+    finally:
+        metrics.IN_FLIGHT.labels(endpoint).dec()
+        metrics.REQUESTS.labels(endpoint, disease_type).inc()
+        if status >= 400:
+            metrics.ERRORS.labels(endpoint, disease_type).inc()
+        metrics.REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - start)
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                _executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    method, path = scope['method'], scope['path']
+    if method == 'OPTIONS':
+        requested = dict(scope['headers']).get(b'access-control-request-headers', b'')
+        await _send(send, 200, b'', 'text/plain', [(b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                                                   (b'access-control-allow-headers', requested)])
+    elif path == '/' and method == 'GET':
+        await _home(send)
+    elif path.startswith('/static/') and method == 'GET':
+        await _static(send, path[len('/static/'):])
+    elif path == '/healthz' and method == 'GET':
+        await _send_json(send, prediction_app.health_payload())
+    elif path == '/predict' and method == 'POST':
+        await _predict(receive, send, 'predict')
+    elif path == '/predict/batch' and method == 'POST':
+        await _predict(receive, send, 'predict_batch')
+    elif path == '/metrics' and method == 'GET':
+        await _send(send, 200, metrics.registry.render().encode(), metrics.CONTENT_TYPE)
+    else:
+        await _send_json(send, {"error": "Not found."}, 404)
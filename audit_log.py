@@ -0,0 +1,266 @@
+import itertools
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import deque
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+# Dropped records are logged at most this often (they are always counted, see on_drop)
+DROP_WARNING_SECONDS = 60.0
+
+
+class AuditLog:
+    """
+    Keeps a record of every prediction without putting any I/O on the request path.
+
+    record() appends a compact tuple (timestamp, disease type, model version, probability, the
+    encoder's canonical feature values and their field names) to a bounded in-memory buffer and
+    returns; a background thread takes up to batch_size records at a time, every flush_seconds or
+    as soon as a batch is full, and hands them to each sink. When the buffer is full the policy
+    decides: 'drop_oldest' overwrites the oldest unwritten record (a ring), 'drop_newest' discards
+    the new one, and 'block' makes the request wait up to block_ms in all for the writer to make
+    room before discarding what does not fit. Dropped records are counted and logged, never
+    silently lost. capacity should leave room for several of the largest blocks passed to
+    record_many().
+    """
+
+    def __init__(self, sinks, capacity=50000, batch_size=500, flush_seconds=1.0, policy=DROP_OLDEST, block_ms=5.0,
+                 on_flush=None, on_drop=None):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown audit policy {policy!r}: use one of {', '.join(POLICIES)}")
+        self.sinks = list(sinks)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.policy = policy
+        self.block_seconds = block_ms / 1000.0
+        self.on_flush = on_flush  # optional callback(sink_name, records, seconds, error), e.g. for metrics
+        self.on_drop = on_drop    # optional callback(count)
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._writer_pid = None
+        self._writing = 0  # records taken by the writer but not yet handed to every sink
+        self.recorded = 0
+        self.dropped = 0
+        self._last_drop_warning = None
+
+    def record(self, disease_type, model_version, probability, features, field_names):
+        """
+        Queues one prediction for the audit trail. Never raises and never touches disk or network.
+        """
+        self.record_many(disease_type, model_version, [probability], [features], field_names)
+
+    def record_many(self, disease_type, model_version, probabilities, features_list, field_names):
+        """
+        Queues a block of predictions of one model, taking the buffer lock once.
+        """
+        if self._writer_pid != os.getpid():
+            self._start_writer()
+        now = time.time()
+        # The whole block waits at most block_seconds under the block policy, not each record
+        deadline = time.monotonic() + self.block_seconds
+        dropped = 0
+        with self._lock:
+            for probability, features in zip(probabilities, features_list):
+                if len(self._buffer) >= self.capacity:
+                    if self.policy == BLOCK:
+                        self._not_full.wait_for(lambda: len(self._buffer) < self.capacity,
+                                                max(0.0, deadline - time.monotonic()))
+                    if len(self._buffer) >= self.capacity:
+                        dropped += 1
+                        if self.policy != DROP_OLDEST:
+                            continue
+                        self._buffer.popleft()
+                self._buffer.append((now, disease_type, model_version, probability, features, field_names))
+                self.recorded += 1
+            self.dropped += dropped
+            if len(self._buffer) >= self.batch_size:
+                self._not_empty.notify()
+        if dropped:
+            if self.on_drop is not None:
+                self.on_drop(dropped)
+            self._warn_dropped(dropped)
+
+    def _warn_dropped(self, dropped):
+        now = time.monotonic()
+        if self._last_drop_warning is None or now - self._last_drop_warning >= DROP_WARNING_SECONDS:
+            self._last_drop_warning = now
+            print(f"Warning: audit buffer full ({self.capacity} records), dropped {dropped} records "
+                  f"({self.dropped} since start-up) under policy {self.policy}")
+
+    def _start_writer(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._buffer.clear()
+            threading.Thread(target=self._run, daemon=True, name="audit-log-writer").start()
+            self._writer_pid = os.getpid()
+
+    def _take_batch(self, wait=True):
+        with self._lock:
+            if wait and len(self._buffer) < self.batch_size:
+                self._not_empty.wait(self.flush_seconds)
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            self._writing = len(batch)
+            self._not_full.notify_all()
+            return batch
+
+    def _write(self, batch):
+        for sink in self.sinks:
+            start = time.perf_counter()
+            error = None
+            try:
+                sink.write(batch)
+            except Exception as e:
+                error = e
+                print(f"Audit sink {sink.name} failed to write {len(batch)} records: {e}")
+            if self.on_flush is not None:
+                self.on_flush(sink.name, len(batch), time.perf_counter() - start, error)
+        with self._lock:
+            self._writing = 0
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer) + self._writing
+
+    def flush(self, timeout=5.0):
+        """
+        Waits until everything recorded so far has been handed to the sinks (or timeout passes).
+        """
+        deadline = time.monotonic() + timeout
+        while self.pending() and time.monotonic() < deadline:
+            with self._lock:
+                self._not_empty.notify()
+            time.sleep(0.01)
+        return self.pending() == 0
+
+    def close(self, timeout=5.0):
+        self.flush(timeout)
+        for sink in self.sinks:
+            sink.close()
+
+
+def record_to_dict(entry):
+    """
+    The JSON form of one audit entry; features are keyed by field name, absent fields left out.
+    """
+    timestamp, disease_type, model_version, probability, features, field_names = entry
+    return {
+        'ts': round(timestamp, 6),
+        'disease_type': disease_type,
+        'model_version': model_version,
+        'probability': probability,
+        'features': {name: value for name, value in zip(field_names, features) if value is not None},
+    }
+
+
+class SegmentFileSink:
+    """
+    Appends audit records as JSON lines to segment files in directory, one writer per process
+    (audit-<pid>-<start time>-<n>.ndjson), starting a new segment once the current one reaches
+    max_segment_bytes. Files are only ever appended to; each batch is a single write() and, with
+    fsync=True, is on disk before the next batch is taken.
+    """
+
+    name = 'file'
+
+    def __init__(self, directory, max_segment_bytes=64 * 1024 * 1024, fsync=False):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync = fsync
+        self._file = None
+        self._pid = None
+        self._segment = 0
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self._pid != os.getpid():
+            self._pid, self._started, self._segment = os.getpid(), int(time.time()), 0
+        self._segment += 1
+        path = os.path.join(self.directory, f"audit-{self._pid}-{self._started}-{self._segment:05d}.ndjson")
+        self._file = open(path, 'ab')
+
+    def write(self, batch):
+        if self._file is None or self._pid != os.getpid() or self._file.tell() >= self.max_segment_bytes:
+            self.close()
+            self._open_segment()
+        self._file.write(''.join(json.dumps(record_to_dict(entry), separators=(',', ':')) + '\n'
+                                 for entry in batch).encode())
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class FirestoreSink:
+    """
+    Writes audit records as documents in a Firestore collection through the REST API, one commit
+    per batch (at most 500 writes, Firestore's limit). Meant for the Firestore emulator
+    (firebase emulators:start --only firestore), which needs no credentials: set
+    FIRESTORE_EMULATOR_HOST=localhost:8080. Against the real service, pass an OAuth access token.
+    """
+
+    name = 'firestore'
+    MAX_WRITES_PER_COMMIT = 500
+
+    def __init__(self, host, project, collection='prediction_audit', database='(default)', token=None, timeout=10.0):
+        base = host if host.startswith('http') else f"http://{host}"
+        self.documents = f"projects/{project}/databases/{database}/documents"
+        self.commit_url = f"{base}/v1/{self.documents}:commit"
+        self.collection = collection
+        self.token = token
+        self.timeout = timeout
+        self._sequence = itertools.count()
+
+    @staticmethod
+    def _value(value):
+        if value is None:
+            return {'nullValue': None}
+        if isinstance(value, bool):
+            return {'booleanValue': value}
+        if isinstance(value, int):
+            return {'integerValue': str(value)}
+        if isinstance(value, float):
+            return {'doubleValue': value}
+        if isinstance(value, dict):
+            return {'mapValue': {'fields': {k: FirestoreSink._value(v) for k, v in value.items()}}}
+        return {'stringValue': str(value)}
+
+    def write(self, batch):
+        # Document ids sort by time and are unique across worker processes
+        pid = os.getpid()
+        for start in range(0, len(batch), self.MAX_WRITES_PER_COMMIT):
+            writes = []
+            for entry in batch[start:start + self.MAX_WRITES_PER_COMMIT]:
+                document = record_to_dict(entry)
+                doc_id = f"{int(document['ts'] * 1e6)}-{pid}-{next(self._sequence)}"
+                writes.append({'update': {'name': f"{self.documents}/{self.collection}/{doc_id}",
+                                          'fields': {k: self._value(v) for k, v in document.items()}}})
+            headers = {'Content-Type': 'application/json'}
+            if self.token:
+                headers['Authorization'] = f"Bearer {self.token}"
+            request = urllib.request.Request(self.commit_url, data=json.dumps({'writes': writes}).encode(),
+                                             headers=headers, method='POST')
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+
+    def close(self):
+        pass
@@ -0,0 +1,166 @@
+"""
+Offline batch scorer for large CSV files, using the same model_artifacts/ as app.py.
+
+The input is read in chunks of raw lines which are parsed, encoded and scored in a process pool
+(each worker loads the models once), and results are written to the output CSV in input order.
+
+Usage:
+    python batch_score.py cleveland.csv scores.csv --disease-type heart_disease --chunk-size 5000 --workers 4
+"""
+import argparse
+import csv
+import os
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from model_registry import ModelRegistry
+from record_stream import iter_csv_records
+
+OUTPUT_COLUMNS = ['row', 'probability', 'prediction', 'error']
+
+# Set in each worker process by _init_worker
+_worker_bundle = None
+
+
+def _init_worker(disease_type):
+    """
+    Loads the model for disease_type once per worker process.
+    """
+    global _worker_bundle
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    _worker_bundle = ModelRegistry().get(disease_type)
+    if _worker_bundle is None:
+        raise RuntimeError(f"Model artifacts for {disease_type} could not be loaded.")
+
+
+def _score_chunk(header_line, lines, first_row):
+    """
+    Parses, encodes and scores one chunk of CSV lines. Returns (rows, timings) where rows are
+    output tuples in input order and timings holds the seconds spent in each stage.
+    """
+    bundle = _worker_bundle
+    start = time.perf_counter()
+    canonical_inputs, row_numbers, output = [], [], {}
+    for row_number, record, error in iter_csv_records([header_line] + lines):
+        row_number += first_row
+        if error is None:
+            try:
+                canonical_inputs.append(bundle.encoder.canonicalize(record))
+                row_numbers.append(row_number)
+                continue
+            except Exception as e:
+                error = str(e)
+        output[row_number] = (row_number, '', '', error)
+    parsed = time.perf_counter()
+
+    input_block = bundle.encoder.encode_canonical_many(canonical_inputs)
+    encoded = time.perf_counter()
+
+    if len(input_block):
+        probabilities = bundle.model.predict_proba(input_block)[:, 1]
+        for row_number, probability in zip(row_numbers, probabilities):
+            output[row_number] = (row_number, f"{probability:.6f}", int(probability >= 0.5), '')
+    predicted = time.perf_counter()
+
+    timings = {'parse': parsed - start, 'encode': encoded - parsed, 'predict': predicted - encoded}
+    return [output[row_number] for row_number in sorted(output)], timings
+
+
+def _read_chunks(input_path, chunk_size):
+    """
+    Yields (header_line, lines, first_row) chunks of raw data lines from the input CSV.
+    """
+    with open(input_path, newline='') as f:
+        header_line = f.readline()
+        lines, first_row = [], 0
+        for line in f:
+            if not line.strip():
+                continue
+            lines.append(line)
+            if len(lines) >= chunk_size:
+                yield header_line, lines, first_row
+                first_row += len(lines)
+                lines = []
+        if lines:
+            yield header_line, lines, first_row
+
+
+def score_file(input_path, output_path, disease_type, chunk_size=10000, workers=None):
+    """
+    Scores every row of input_path and writes OUTPUT_COLUMNS to output_path.
+    Returns a summary dict with row counts, wall time, throughput and per-stage seconds.
+    """
+    workers = workers or os.cpu_count() or 1
+    stage_seconds = {'read': 0.0, 'parse': 0.0, 'encode': 0.0, 'predict': 0.0, 'write': 0.0}
+    rows_written, errors = 0, 0
+    start = time.perf_counter()
+
+    def write_result(writer, result):
+        nonlocal rows_written, errors
+        rows, timings = result
+        for stage, seconds in timings.items():
+            stage_seconds[stage] += seconds
+        write_start = time.perf_counter()
+        writer.writerows(rows)
+        stage_seconds['write'] += time.perf_counter() - write_start
+        rows_written += len(rows)
+        errors += sum(1 for row in rows if row[3])
+
+    with open(output_path, 'w', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(OUTPUT_COLUMNS)
+        chunks = _read_chunks(input_path, chunk_size)
+
+        if workers == 1:
+            _init_worker(disease_type)
+            while True:
+                read_start = time.perf_counter()
+                chunk = next(chunks, None)
+                stage_seconds['read'] += time.perf_counter() - read_start
+                if chunk is None:
+                    break
+                write_result(writer, _score_chunk(*chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(disease_type,)) as pool:
+                # Keep a bounded window of chunks in flight so memory does not grow with the input
+                in_flight = deque()
+                while True:
+                    read_start = time.perf_counter()
+                    chunk = next(chunks, None)
+                    stage_seconds['read'] += time.perf_counter() - read_start
+                    if chunk is not None:
+                        in_flight.append(pool.submit(_score_chunk, *chunk))
+                    if in_flight and (chunk is None or len(in_flight) >= 2 * workers):
+                        write_result(writer, in_flight.popleft().result())
+                    elif chunk is None:
+                        break
+
+    wall_seconds = time.perf_counter() - start
+    return {
+        'rows': rows_written,
+        'errors': errors,
+        'workers': workers,
+        'chunk_size': chunk_size,
+        'wall_seconds': wall_seconds,
+        'rows_per_second': rows_written / wall_seconds if wall_seconds else 0.0,
+        # parse/encode/predict are summed over workers, so they can exceed wall time
+        'stage_seconds': stage_seconds,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score a CSV file offline with the saved models.")
+    parser.add_argument('input', help="Input CSV with a header row (request field names or cleveland.csv layout)")
+    parser.add_argument('output', help="Output CSV path")
+    parser.add_argument('--disease-type', default='heart_disease', choices=['diabetes', 'heart_disease'])
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Rows per chunk sent to a worker")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    summary = score_file(args.input, args.output, args.disease_type, args.chunk_size, args.workers)
+    print(f"Scored {summary['rows']} rows ({summary['errors']} errors) with {summary['workers']} workers "
+          f"in {summary['wall_seconds']:.2f} s: {summary['rows_per_second']:.0f} rows/sec")
+    for stage, seconds in summary['stage_seconds'].items():
+        print(f"  {stage:<8} {seconds:.3f} s")
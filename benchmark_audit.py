@@ -0,0 +1,144 @@
+"""
+Checks that the prediction audit log stays off the request path.
+
+Runs single-row /predict requests through the Flask test client in interleaved rounds with the
+audit log off and on (segment files in a temporary directory, written by the background writer),
+then compares the request latency percentiles of the two and reports how many records reached
+the files and how many were dropped. --sink-delay-ms makes every batch write that much slower, to
+show that slow storage is absorbed by the buffer rather than by requests. Exits non-zero when the
+p99 with the audit log grows by more than --threshold.
+
+Usage:
+    python benchmark_audit.py
+    python benchmark_audit.py --requests 5000 --sink-delay-ms 200 --policy drop_newest
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Every request is scored, and the app's own audit log stays off; the benchmark builds its own
+os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+os.environ["AUDIT_LOG"] = "0"
+os.environ["AUDIT_SINKS"] = "file"
+os.environ["HISTORY_DB"] = ""
+os.environ.setdefault("AUDIT_LOG_DIR", tempfile.mkdtemp(prefix="audit-bench-"))
+
+import app as prediction_app  # noqa: E402
+from synthetic_payloads import heart_disease_payloads  # noqa: E402
+
+
+class SlowSink:
+    """
+    Wraps a sink so that every batch takes at least delay seconds to write.
+    """
+
+    def __init__(self, sink, delay):
+        self.sink = sink
+        self.delay = delay
+        self.name = sink.name
+
+    def write(self, batch):
+        time.sleep(self.delay)
+        self.sink.write(batch)
+
+    def close(self):
+        self.sink.close()
+
+
+def time_requests(client, bodies):
+    samples = []
+    for body in bodies:
+        start = time.perf_counter()
+        response = client.post('/predict', data=body, content_type='application/json')
+        samples.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"/predict returned {response.status_code}: {response.get_data(as_text=True)}")
+    return samples
+
+
+def _percentiles(samples):
+    p50, p95, p99 = np.percentile(np.asarray(samples) * 1000, [50, 95, 99])
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'requests': len(samples)}
+
+
+def run(requests, rounds, seed, sink_delay_ms, policy, buffer_size):
+    os.environ["AUDIT_POLICY"] = policy
+    os.environ["AUDIT_BUFFER_SIZE"] = str(buffer_size)
+    audit_log = prediction_app._build_audit_log()
+    if sink_delay_ms:
+        audit_log.sinks = [SlowSink(sink, sink_delay_ms / 1000.0) for sink in audit_log.sinks]
+
+    client = prediction_app.app.test_client()
+    bodies = [json.dumps(p) for p in heart_disease_payloads(requests, seed, form_codes=True, jitter=0.5)]
+    per_round = max(1, len(bodies) // rounds)
+    time_requests(client, bodies[:min(200, len(bodies))])  # warm up the model and the Flask stack
+
+    samples = {'off': [], 'on': []}
+    for start in range(0, len(bodies), per_round):
+        chunk = bodies[start:start + per_round]
+        # Alternate which mode goes first so drift in machine load does not favour one of them
+        order = ('off', 'on') if (start // per_round) % 2 == 0 else ('on', 'off')
+        for mode in order:
+            prediction_app.audit_log = audit_log if mode == 'on' else None
+            samples[mode].extend(time_requests(client, chunk))
+    prediction_app.audit_log = None
+
+    record_start = time.perf_counter()
+    for _ in range(10000):
+        audit_log.record('heart_disease', 'bench', 0.5, (1.0,) * 13, ['x'] * 13)
+    record_us = (time.perf_counter() - record_start) / 10000 * 1e6
+    recorded = audit_log.recorded - 10000
+    flushed = audit_log.flush(timeout=60.0)
+    audit_log.close()
+
+    directory = os.environ["AUDIT_LOG_DIR"]
+    written = 0
+    for path in glob.glob(os.path.join(directory, 'audit-*.ndjson')):
+        with open(path, 'rb') as f:
+            written += sum(1 for line in f if b'"bench"' not in line)
+    return {
+        'off': _percentiles(samples['off']),
+        'on': _percentiles(samples['on']),
+        'audit': {'recorded': recorded, 'written': written, 'dropped': audit_log.dropped,
+                  'flushed': flushed, 'record_us': record_us, 'directory': directory},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare /predict latency with the audit log off and on.")
+    parser.add_argument('--requests', type=int, default=1000, help="Requests per mode")
+    parser.add_argument('--rounds', type=int, default=10, help="Alternations between the two modes")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sink-delay-ms', type=float, default=0.0, help="Extra time every batch write takes")
+    parser.add_argument('--policy', default='drop_oldest', help="Buffer policy: drop_oldest, drop_newest or block")
+    parser.add_argument('--buffer-size', type=int, default=10000)
+    parser.add_argument('--threshold', type=float, default=0.1, help="Allowed p99 growth, as a fraction")
+    parser.add_argument('--min-delta-ms', type=float, default=0.1, help="Ignore p99 growth smaller than this")
+    parser.add_argument('--output', help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    if prediction_app.model_registry.get('heart_disease') is None:
+        sys.exit("Heart disease model artifacts not available.")
+    result = run(args.requests, args.rounds, args.seed, args.sink_delay_ms, args.policy, args.buffer_size)
+    for mode in ('off', 'on'):
+        stats = result[mode]
+        print(f"audit {mode:<3}  p50 {stats['p50_ms']:7.3f} ms  p95 {stats['p95_ms']:7.3f} ms  "
+              f"p99 {stats['p99_ms']:7.3f} ms  ({stats['requests']} requests)")
+    audit = result['audit']
+    print(f"recorded {audit['recorded']}, written {audit['written']}, dropped {audit['dropped']}; "
+          f"record() {audit['record_us']:.2f} us; segments in {audit['directory']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    grew = result['on']['p99_ms'] - result['off']['p99_ms']
+    if grew > args.min_delta_ms and result['on']['p99_ms'] > result['off']['p99_ms'] * (1 + args.threshold):
+        print(f"REGRESSION p99 grew by {grew:.3f} ms (+{grew / result['off']['p99_ms']:.0%}) with the audit log on")
+        sys.exit(1)
+    print(f"p99 with the audit log is within {args.threshold:.0%} of the p99 without it ({grew:+.3f} ms).")
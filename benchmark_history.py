@@ -0,0 +1,118 @@
+"""
+Seeded benchmark for the prediction history store behind /history.
+
+Grows a scratch SQLite database through the given sizes (millions of rows by default) with
+synthetic predictions arriving at a constant rate, so older rows are added as the table grows, and
+at each size times the queries /history serves: the newest page, "above 70% this week", a page
+twenty cursors deep and the most probable predictions. Keyset pagination over the composite
+indexes should keep every query's latency flat as the table grows; the script exits non-zero when
+a query at the largest size is more than --max-growth times slower than at the smallest.
+
+Usage:
+    python benchmark_history.py
+    python benchmark_history.py --sizes 100000 1000000 5000000 --output history_bench.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from history_store import HistoryStore
+
+DISEASE_TYPES = ['heart_disease', 'diabetes']
+DEFAULT_SIZES = [100_000, 1_000_000, 3_000_000]
+SECONDS_BETWEEN_ROWS = 5.0
+WEEK = 7 * 24 * 3600
+
+
+def seed_rows(store, start, stop, now, rng, chunk_rows=100_000):
+    """
+    Inserts rows start..stop-1; row i is SECONDS_BETWEEN_ROWS * i seconds older than now.
+    """
+    features = json.dumps({'hd_age': 54.0, 'hd_trestbps': 130.0, 'hd_chol': 246.0, 'hd_thalach': 150.0,
+                           'hd_oldpeak': 1.0, 'hd_sex': 1, 'hd_cp': 2}, separators=(',', ':'))
+    for chunk_start in range(start, stop, chunk_rows):
+        store.insert_many([
+            (now - i * SECONDS_BETWEEN_ROWS, rng.choice(DISEASE_TYPES), 'bench', rng.betavariate(2, 3), features)
+            for i in range(chunk_start, min(stop, chunk_start + chunk_rows))
+        ])
+
+
+def time_query(store, repeats, **query):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        store.query('heart_disease', **query)
+        samples.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(np.asarray(samples) * 1000, [50, 99])
+    return {'p50_ms': float(p50), 'p99_ms': float(p99)}
+
+
+def benchmark_size(store, now, repeats, page_size):
+    cursor = None
+    for _ in range(20):
+        _, cursor = store.query('heart_disease', limit=page_size, cursor=cursor)
+    queries = {
+        'newest_page': {},
+        'week_above_70': {'since': now - WEEK, 'min_probability': 0.7},
+        'page_21': {'cursor': cursor},
+        'most_probable': {'order_by': 'probability'},
+    }
+    return {name: time_query(store, repeats, limit=page_size, **query) for name, query in queries.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark /history queries as the history table grows.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Table sizes to measure at")
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', help="Database to grow (default: a temporary file, removed afterwards)")
+    parser.add_argument('--max-growth', type=float, default=3.0,
+                        help="Allowed p50 slowdown from the smallest to the largest size")
+    parser.add_argument('--min-delta-ms', type=float, default=0.2, help="Ignore slowdowns smaller than this")
+    parser.add_argument('--output', help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    scratch = None if args.db else tempfile.mkdtemp(prefix="history-bench-")
+    store = HistoryStore(args.db or os.path.join(scratch, 'history.db'))
+    rng = random.Random(args.seed)
+    now = time.time()
+    results = {}
+    try:
+        rows = store.count()
+        for size in sorted(args.sizes):
+            if size > rows:
+                start = time.perf_counter()
+                seed_rows(store, rows, size, now, rng)
+                print(f"seeded {size - rows} rows in {time.perf_counter() - start:.1f} s")
+                rows = size
+            results[size] = benchmark_size(store, now, args.repeats, args.page_size)
+            print(f"{size:>10} rows  " + "  ".join(f"{name} {stats['p50_ms']:6.3f} ms"
+                                                   for name, stats in results[size].items()))
+    finally:
+        store.close()
+        if scratch:
+            shutil.rmtree(scratch)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'page_size': args.page_size, 'repeats': args.repeats, 'results': results}, f, indent=2)
+
+    smallest, largest = results[min(results)], results[max(results)]
+    regressions = []
+    for name, stats in largest.items():
+        base = smallest[name]['p50_ms']
+        if stats['p50_ms'] > base * args.max_growth and stats['p50_ms'] - base > args.min_delta_ms:
+            regressions.append(f"{name}: {base:.3f} -> {stats['p50_ms']:.3f} ms from {min(results)} to {max(results)} rows")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+    print(f"Query latency stayed within {args.max_growth}x from {min(results)} to {max(results)} rows.")
@@ -0,0 +1,218 @@
+"""
+Stage-level latency benchmark for the prediction path, run entirely in-process.
+
+Each case times the stages of a prediction separately (JSON parse, feature encoding, scaler
+transform, predict_proba, per-field explanation and jsonify) plus the whole request through the
+Flask test client, for single rows and batches of both disease types. Heart disease inputs are
+drawn from cleveland.csv; diabetes inputs are synthesized around the diabetes scaler's fitted mean
+and variance. When both models are available, a last case compares one request per disease type
+with a single "disease_types" request scoring both.
+
+Usage:
+    python benchmark_predict.py --output bench.json
+    python benchmark_predict.py --output new.json --compare bench.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+# Measure the real prediction path, not cache hits
+os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+
+import app as prediction_app  # noqa: E402
+from synthetic_payloads import diabetes_payloads, heart_disease_payloads  # noqa: E402
+
+STAGES = ['json_parse', 'encode', 'scale', 'predict_proba', 'explain', 'jsonify', 'end_to_end']
+DEFAULT_BATCH_SIZES = [1, 100, 1000]
+
+
+def _summarize(samples, rows_per_sample):
+    samples = np.asarray(samples)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    mean = float(samples.mean())
+    return {
+        'p50_ms': p50 * 1000,
+        'p95_ms': p95 * 1000,
+        'p99_ms': p99 * 1000,
+        'mean_ms': mean * 1000,
+        'rows_per_second': rows_per_sample / mean if mean else 0.0,
+        'iterations': len(samples),
+    }
+
+
+def benchmark_case(client, bundle, payloads, iterations):
+    """
+    Times every stage of scoring `payloads` (one row or a batch) `iterations` times. 'explain' is
+    the extra cost of per-field contributions ("explain": true), skipped for non-tree models.
+    """
+    try:
+        explainer = bundle.explainer()
+    except ValueError:
+        explainer = None
+    batched = len(payloads) > 1
+    if batched:
+        body = json.dumps({'disease_type': payloads[0]['disease_type'], 'records': payloads})
+        url = '/predict/batch'
+    else:
+        body = json.dumps(payloads[0])
+        url = '/predict'
+
+    timings = {stage: [] for stage in STAGES}
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        data = json.loads(body)
+        records = data['records'] if batched else [data]
+        t1 = time.perf_counter()
+        canonical_inputs, _, _ = bundle.encoder.canonicalize_many(records)
+        block = bundle.encoder.encode_canonical_many(canonical_inputs, scale=False)
+        t2 = time.perf_counter()
+        bundle.encoder.scale_block(block)
+        t3 = time.perf_counter()
+        probabilities = bundle.model.predict_proba(block)[:, 1]
+        t4 = time.perf_counter()
+        if explainer is not None:
+            explainer.explain(block)
+        t4_explain = time.perf_counter()
+        with prediction_app.app.app_context():
+            results = [prediction_app._format_prediction(bundle.disease_type, float(p)) for p in probabilities]
+            prediction_app.jsonify({'results': results} if batched else results[0])
+        t5 = time.perf_counter()
+        response = client.post(url, data=body, content_type='application/json')
+        t6 = time.perf_counter()
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} returned {response.status_code}: {response.get_data(as_text=True)}")
+
+        for stage, seconds in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t4_explain - t4, t5 - t4_explain, t6 - t5)):
+            timings[stage].append(seconds)
+
+    if explainer is None:
+        del timings['explain']
+    return {stage: _summarize(samples, len(payloads)) for stage, samples in timings.items()}
+
+
+def benchmark_combined(client, bundles, iterations, seed=0):
+    """
+    Times one request per disease type against a single "disease_types" request carrying the
+    fields of both, which runs the models in parallel and should take about as long as the slower
+    of the two alone.
+    """
+    diabetes = diabetes_payloads(iterations, seed, bundles['diabetes'].scaler)
+    heart = heart_disease_payloads(iterations, seed, form_codes=True)
+    bodies = {'diabetes': diabetes, 'heart_disease': heart, 'combined': []}
+    for diabetes_payload, heart_payload in zip(diabetes, heart):
+        body = {key: value for key, value in heart_payload.items() if key != 'hd_age'}
+        body.update(diabetes_payload)  # 'age' is shared by both models
+        del body['disease_type']
+        body['disease_types'] = ['diabetes', 'heart_disease']
+        bodies['combined'].append(body)
+
+    timings = {case: [] for case in bodies}
+    for i in range(iterations):
+        for case, case_bodies in bodies.items():
+            body = json.dumps(case_bodies[i])
+            start = time.perf_counter()
+            response = client.post('/predict', data=body, content_type='application/json')
+            timings[case].append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"/predict ({case}) returned {response.status_code}: {response.get_data(as_text=True)}")
+    return {case: _summarize(samples, 1) for case, samples in timings.items()}
+
+
+def run_benchmarks(batch_sizes=DEFAULT_BATCH_SIZES, iterations=200, warmup=5, seed=0):
+    client = prediction_app.app.test_client()
+    results = {}
+    for disease_type in ('diabetes', 'heart_disease'):
+        bundle = prediction_app.model_registry.get(disease_type)
+        if bundle is None:
+            print(f"Skipping {disease_type}: model artifacts not available.")
+            continue
+        for batch_size in batch_sizes:
+            if disease_type == 'heart_disease':
+                payloads = heart_disease_payloads(batch_size, seed, form_codes=True)
+            else:
+                payloads = diabetes_payloads(batch_size, seed, bundle.scaler)
+            # Large batches get fewer iterations so the whole suite stays quick
+            case_iterations = max(10, iterations // max(1, batch_size // 100))
+            benchmark_case(client, bundle, payloads, warmup)
+            case = f"{disease_type}/batch_{batch_size}"
+            results[case] = benchmark_case(client, bundle, payloads, case_iterations)
+            e2e = results[case]['end_to_end']
+            explain = results[case].get('explain')
+            overhead = (f"  explain {explain['p50_ms'] / results[case]['predict_proba']['p50_ms']:5.2f}x predict_proba"
+                        if explain else '')
+            print(f"{case:<28} end-to-end p50 {e2e['p50_ms']:8.3f} ms  p99 {e2e['p99_ms']:8.3f} ms  "
+                  f"{e2e['rows_per_second']:10.0f} rows/s{overhead}")
+
+    bundles = {disease_type: prediction_app.model_registry.get(disease_type) for disease_type in ('diabetes', 'heart_disease')}
+    if all(bundles.values()):
+        benchmark_combined(client, bundles, warmup, seed)
+        results['combined/single'] = combined = benchmark_combined(client, bundles, iterations, seed)
+        slower = max(combined['diabetes']['p50_ms'], combined['heart_disease']['p50_ms'])
+        print(f"{'combined/single':<28} end-to-end p50 {combined['combined']['p50_ms']:8.3f} ms  "
+              f"p99 {combined['combined']['p99_ms']:8.3f} ms  {combined['combined']['p50_ms'] / slower:5.2f}x the slower "
+              f"model alone (diabetes {combined['diabetes']['p50_ms']:.3f} ms, "
+              f"heart disease {combined['heart_disease']['p50_ms']:.3f} ms)")
+    return results
+
+
+def compare(current, baseline, threshold, min_delta_ms=0.05):
+    """
+    Returns a list of regressions: stages whose p50 or p95 grew by more than `threshold`
+    (a fraction) relative to the baseline run, ignoring changes below min_delta_ms,
+    which are timer noise for the microsecond-scale stages.
+    """
+    regressions = []
+    for case, stages in current['results'].items():
+        for stage, stats in stages.items():
+            base = baseline['results'].get(case, {}).get(stage)
+            if not base:
+                continue
+            for metric in ('p50_ms', 'p95_ms'):
+                grew = stats[metric] - base[metric]
+                if base[metric] > 0 and stats[metric] > base[metric] * (1 + threshold) and grew > min_delta_ms:
+                    regressions.append(f"{case} {stage} {metric}: {base[metric]:.3f} -> {stats[metric]:.3f} ms "
+                                       f"(+{(stats[metric] / base[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the prediction path stage by stage.")
+    parser.add_argument('--output', default='bench_output.json', help="Where to write the JSON results")
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', help="Baseline JSON file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown before flagging, as a fraction")
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    import sklearn
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'heart_inference_engine': os.environ.get("HEART_INFERENCE_ENGINE", "sklearn"),
+            'iterations': args.iterations,
+        },
+        'results': run_benchmarks(args.batch_sizes, args.iterations, seed=args.seed),
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}.")
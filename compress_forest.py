@@ -0,0 +1,246 @@
+"""
+Shrinks a trained heart disease forest within an accuracy or ROC-AUC budget.
+
+Candidates are built from the original model by keeping only the first k trees (the trees of a
+random forest are independent draws, so any k of them form a smaller forest of the same kind)
+and by cutting every tree off at a maximum depth, turning the cut nodes into leaves that predict
+their training class distribution. Candidates are chosen by cross-validation over the training
+split the training script uses (80% of cleveland.csv, random_state=42, stratified): on each fold,
+a forest with the original's parameters is fit on the fold's training part, and it and all of its
+truncations are scored on the rest. The candidate with the fewest nodes whose mean metric stays
+within --max-drop of the untruncated forest's is chosen, then judged on the holdout (the other
+20%), which took no part in the choice. Only when it stays within --max-drop of the original model
+there too is it written out, in the same form as the input (bare forest or fused pipeline); the
+report of metric, size and latency deltas is written either way, and the script exits non-zero
+when the budget is missed.
+
+The legacy heart_disease_model.joblib was trained on a different split (it was fit before the
+cleveland.csv header fix), so some holdout rows were in its training data and its holdout scores
+are optimistic. Compare its candidates with each other rather than with other models.
+
+Usage:
+    python compress_forest.py --model model_artifacts/heart_disease_model.joblib --metric roc_auc --max-drop 0.01
+    python compress_forest.py --model model_artifacts/heart_disease_pipeline.joblib --out small_pipeline.joblib
+"""
+import argparse
+import copy
+import io
+import json
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from dataset_loader import CLEVELAND_CSV_PATH, load_cleveland
+from forest_engine import HEART_MODEL_PATH, dump_atomic, final_estimator, load_cleveland_matrix
+
+DEFAULT_TREE_COUNTS = [200, 150, 100, 75, 50, 30, 20, 10, 5]
+DEFAULT_DEPTHS = [None, 16, 12, 10, 8, 6, 4]
+METRICS = {
+    'accuracy': lambda model, X, y: accuracy_score(y, model.predict(X)),
+    'roc_auc': lambda model, X, y: roc_auc_score(y, model.predict_proba(X)[:, 1]),
+}
+
+
+def load_split(model, csv_path=CLEVELAND_CSV_PATH, test_size=0.2, random_state=42):
+    """
+    Returns (X_train, y_train, X_holdout, y_holdout), the training script's split, encoded for
+    `model`: through the pipeline's own encoder for a fused pipeline, or through the legacy
+    feature columns and scaler for a bare forest.
+    """
+    df = load_cleveland(csv_path)
+    y = (df['target'] > 0).astype(int).to_numpy()
+    if hasattr(model, 'steps'):
+        X = model[:-1].transform(df.drop(columns='target'))
+    else:
+        X = load_cleveland_matrix(csv_path)
+    X_train, X_holdout, y_train, y_holdout = train_test_split(X, y, test_size=test_size, random_state=random_state,
+                                                              stratify=y)
+    return X_train, y_train, X_holdout, y_holdout
+
+
+def truncate_tree(estimator, max_depth):
+    """
+    Cuts a fitted decision tree off at max_depth in place, compacting its node arrays so the
+    removed subtrees no longer take space. Nodes at max_depth become leaves; their stored value
+    is already the class distribution of the training samples that reached them.
+    """
+    tree = estimator.tree_
+    state = tree.__getstate__()
+    nodes, values = state['nodes'], state['values']
+    keep, depth_of, new_index = [], {0: 0}, {}
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        new_index[node] = len(keep)
+        keep.append(node)
+        left, right = nodes['left_child'][node], nodes['right_child'][node]
+        if left != -1 and depth_of[node] < max_depth:
+            depth_of[left] = depth_of[right] = depth_of[node] + 1
+            stack.extend((right, left))
+    new_nodes = nodes[keep].copy()
+    for i, node in enumerate(keep):
+        left, right = nodes['left_child'][node], nodes['right_child'][node]
+        if left != -1 and depth_of[node] < max_depth:
+            new_nodes['left_child'][i], new_nodes['right_child'][i] = new_index[left], new_index[right]
+        else:
+            new_nodes['left_child'][i] = new_nodes['right_child'][i] = -1
+            new_nodes['feature'][i], new_nodes['threshold'][i] = -2, -2.0
+    state.update(nodes=new_nodes, values=np.ascontiguousarray(values[keep]), node_count=len(keep),
+                 max_depth=min(state['max_depth'], max_depth))
+    tree.__setstate__(state)
+    return estimator
+
+
+def compress(forest, n_trees=None, max_depth=None):
+    """
+    Returns a copy of forest with only its first n_trees trees, each cut at max_depth.
+    """
+    small = copy.deepcopy(forest)
+    if n_trees is not None and n_trees < len(small.estimators_):
+        small.estimators_ = small.estimators_[:n_trees]
+        small.n_estimators = n_trees
+    if max_depth is not None:
+        for estimator in small.estimators_:
+            truncate_tree(estimator, max_depth)
+    return small
+
+
+def node_count(forest):
+    return sum(estimator.tree_.node_count for estimator in forest.estimators_)
+
+
+def artifact_bytes(model):
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.tell()
+
+
+def latency_ms(forest, X, rows, repeats):
+    """
+    Median predict_proba latency for `rows` rows (tiled from X), in milliseconds.
+    """
+    block = np.resize(X, (rows, X.shape[1]))
+    forest.predict_proba(block)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        forest.predict_proba(block)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples)) * 1000
+
+
+def describe(forest, X, y, repeats):
+    return {
+        'n_trees': len(forest.estimators_),
+        'nodes': node_count(forest),
+        'accuracy': METRICS['accuracy'](forest, X, y),
+        'roc_auc': METRICS['roc_auc'](forest, X, y),
+        'artifact_bytes': artifact_bytes(forest),
+        'latency_1_row_ms': latency_ms(forest, X, 1, repeats),
+        'latency_1000_rows_ms': latency_ms(forest, X, 1000, max(5, repeats // 10)),
+    }
+
+
+def search(forest, X, y, metric, max_drop, tree_counts=DEFAULT_TREE_COUNTS, depths=DEFAULT_DEPTHS, cv=5,
+           random_state=42):
+    """
+    Cross-validates every (tree count, depth) candidate on (X, y) and returns (best, candidates):
+    the candidate with the fewest nodes whose mean metric is at most max_drop below that of the
+    untruncated forest, and all of them. Fold forests are refit with forest's parameters; node
+    counts are those of forest's own truncations.
+    """
+    tree_counts = sorted({min(k, len(forest.estimators_)) for k in tree_counts}, reverse=True)
+    scores, baseline = {}, []
+    splitter = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+    for fit_idx, val_idx in splitter.split(X, y):
+        fold_forest = clone(forest).fit(X[fit_idx], y[fit_idx])
+        baseline.append(METRICS[metric](fold_forest, X[val_idx], y[val_idx]))
+        for n_trees in tree_counts:
+            for max_depth in depths:
+                small = compress(fold_forest, n_trees, max_depth)
+                scores.setdefault((n_trees, max_depth), []).append(METRICS[metric](small, X[val_idx], y[val_idx]))
+    baseline = float(np.mean(baseline))
+    candidates = []
+    for (n_trees, max_depth), fold_scores in scores.items():
+        score = float(np.mean(fold_scores))
+        candidates.append({'n_trees': n_trees, 'max_depth': max_depth,
+                           'nodes': node_count(compress(forest, n_trees, max_depth)),
+                           metric: score, 'cv_drop': baseline - score, 'within_budget': bool(baseline - score <= max_drop)})
+    within = [c for c in candidates if c['within_budget']]
+    best = min(within, key=lambda c: (c['nodes'], -c[metric])) if within else None
+    return best, candidates
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compress a forest within an accuracy or ROC-AUC budget.")
+    parser.add_argument('--model', default=HEART_MODEL_PATH, help="Forest or fused pipeline .joblib")
+    parser.add_argument('--out', default='model_artifacts/heart_disease_model_compressed.joblib')
+    parser.add_argument('--report', default='compress_report.json')
+    parser.add_argument('--csv', default=CLEVELAND_CSV_PATH)
+    parser.add_argument('--metric', choices=sorted(METRICS), default='roc_auc')
+    parser.add_argument('--max-drop', type=float, default=0.01,
+                        help="Largest allowed metric loss, in cross-validation and on the holdout")
+    parser.add_argument('--cv', type=int, default=5, help="Cross-validation folds over the training split")
+    parser.add_argument('--tree-counts', type=int, nargs='+', default=DEFAULT_TREE_COUNTS)
+    parser.add_argument('--depths', type=int, nargs='+', default=None,
+                        help="Depth limits to try (default: unlimited, 16, 12, 10, 8, 6, 4)")
+    parser.add_argument('--repeats', type=int, default=200, help="Timing repetitions for the single-row latency")
+    args = parser.parse_args()
+
+    # The data is a plain NumPy block, like the rows the app feeds the model
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    model = joblib.load(args.model)
+    forest = final_estimator(model)
+    X_train, y_train, X, y = load_split(model, args.csv)
+    depths = [None] + args.depths if args.depths else DEFAULT_DEPTHS
+
+    best, candidates = search(forest, X_train, y_train, args.metric, args.max_drop, args.tree_counts, depths, args.cv)
+    if best is None:
+        raise SystemExit("No candidate fits the budget in cross-validation.")
+    small = compress(forest, best['n_trees'], best['max_depth'])
+
+    # Judged on the holdout only, which the choice never saw
+    original, compressed = describe(forest, X, y, args.repeats), describe(small, X, y, args.repeats)
+    within_budget = bool(original[args.metric] - compressed[args.metric] <= args.max_drop)
+    report = {
+        'model': args.model,
+        'cv_rows': len(y_train),
+        'cv_folds': args.cv,
+        'test_rows': len(y),
+        'metric': args.metric,
+        'max_drop': args.max_drop,
+        'chosen': {'n_trees': best['n_trees'], 'max_depth': best['max_depth']},
+        'within_budget_on_test': within_budget,
+        'original': original,
+        'compressed': compressed,
+        'deltas': {key: compressed[key] - original[key] for key in original},
+        'candidates': candidates,
+    }
+
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{args.cv}-fold CV over {len(y_train)} training rows chose {best['n_trees']} trees, max depth "
+          f"{best['max_depth'] or 'unlimited'} ({args.metric} {best['cv_drop']:.4f} below the full forest). "
+          f"Holdout: {len(y)} rows.")
+    print(f"{'':<22}{'original':>12}{'compressed':>12}")
+    for key in ('n_trees', 'nodes', 'accuracy', 'roc_auc', 'artifact_bytes', 'latency_1_row_ms', 'latency_1000_rows_ms'):
+        print(f"{key:<22}{original[key]:>12.4g}{compressed[key]:>12.4g}")
+    if not within_budget:
+        print(f"FAIL: on the holdout the compressed {args.metric} is more than {args.max_drop} below the original; "
+              f"nothing written (report in {args.report})")
+        sys.exit(1)
+
+    if hasattr(model, 'steps'):
+        output = copy.copy(model)
+        output.steps = model.steps[:-1] + [(model.steps[-1][0], small)]
+    else:
+        output = small
+    dump_atomic(output, args.out)
+    print(f"Compressed model written to {args.out}, report to {args.report}")
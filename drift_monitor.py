@@ -0,0 +1,193 @@
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+DEFAULT_BINS = 10
+# Population stability index bands: below MODERATE the distribution is stable, above SIGNIFICANT it has moved
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+# Without a histogram (reference from a scaler), a mean this many reference standard deviations away is drift
+MEAN_SHIFT_SIGNIFICANT = 0.5
+_EPSILON = 1e-4
+
+
+def reference_stats(block, feature_columns, numerical_columns, bins=DEFAULT_BINS, source=None, model_sha256=None):
+    """
+    Reference statistics of an unscaled encoded block (one row per training record, laid out like
+    feature_columns): every column's mean and standard deviation, and for numerical columns the
+    share of rows in each of `bins` quantile bins (open-ended at both ends). One-hot columns are
+    'binary'; their mean is the category's frequency. model_sha256 names the model file whose
+    encoder produced the block; the statistics only describe what that model is fed.
+    """
+    block = np.asarray(block, dtype=np.float64)
+    features = {}
+    for j, column in enumerate(feature_columns):
+        values = block[:, j]
+        entry = {'mean': float(values.mean()), 'std': float(values.std())}
+        if column in numerical_columns:
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+            counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+            entry.update(kind='numerical', edges=edges.tolist(), fractions=(counts / len(values)).tolist())
+        else:
+            entry['kind'] = 'binary'
+        features[column] = entry
+    return {'rows': len(block), 'source': source, 'model_sha256': model_sha256, 'features': features}
+
+
+def reference_from_scaler(scaler, feature_columns):
+    """
+    Moments-only reference statistics from a fitted StandardScaler, for models saved without
+    reference statistics: the scaled columns' training mean and standard deviation, no histograms.
+    """
+    names = list(getattr(scaler, 'feature_names_in_', []))
+    features = {}
+    for name, mean, scale in zip(names, scaler.mean_, scaler.scale_):
+        if name in feature_columns:
+            features[name] = {'kind': 'numerical', 'mean': float(mean), 'std': float(scale)}
+    return {'rows': int(getattr(scaler, 'n_samples_seen_', 0)), 'source': 'scaler', 'features': features}
+
+
+def load_reference_stats(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _psi(observed, expected):
+    observed = np.maximum(observed, _EPSILON)
+    expected = np.maximum(expected, _EPSILON)
+    return float(np.sum((observed - expected) * np.log(observed / expected)))
+
+
+def _status(psi):
+    if psi >= PSI_SIGNIFICANT:
+        return 'significant'
+    return 'moderate' if psi >= PSI_MODERATE else 'stable'
+
+
+class DriftMonitor:
+    """
+    Streaming per-feature statistics of the rows a model scores, compared with the reference
+    statistics of its training data.
+
+    observe() folds a block of unscaled encoded rows into running moments (Welford/Chan updates of
+    count, mean and sum of squared deviations) and fixed-bin histograms over the reference bin
+    edges, so each row costs a fixed handful of array operations and memory never grows. Statistics
+    cover a tumbling window of `window` rows; when it fills, its scores become `previous` and a new
+    window starts, so drift shows up without being diluted by everything seen since start-up.
+
+    Scores per feature: the population stability index (PSI) of the histogram (numerical columns)
+    or of the category frequency (one-hot columns), plus the mean shift in reference standard
+    deviations and the ratio of standard deviations.
+    """
+
+    def __init__(self, reference, feature_columns, window=10000, min_rows=100):
+        ref = reference['features']
+        kept = [(j, column) for j, column in enumerate(feature_columns) if column in ref]
+        self.columns = [column for _, column in kept]
+        self._index = np.array([j for j, _ in kept], dtype=np.intp)
+        self._ref_mean = np.array([ref[column]['mean'] for column in self.columns])
+        self._ref_std = np.array([ref[column]['std'] for column in self.columns])
+        self._binary = np.array([ref[column].get('kind') == 'binary' for column in self.columns], dtype=bool)
+        # (position in self.columns, bin edges, reference share of rows per bin) for numerical columns
+        self._histograms = [(k, np.asarray(ref[column]['edges']), np.asarray(ref[column]['fractions']))
+                            for k, column in enumerate(self.columns) if ref[column].get('edges')]
+        self.reference_source = reference.get('source')
+        self.window = window
+        self.min_rows = min_rows
+        self.previous = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._n = 0
+        self._mean = np.zeros(len(self.columns))
+        self._m2 = np.zeros(len(self.columns))
+        self._counts = [np.zeros(len(edges) + 1) for _, edges, _ in self._histograms]
+
+    def observe(self, block):
+        """
+        Folds the rows of an unscaled (n, n_features) block into the current window.
+        """
+        if not len(self.columns) or not len(block):
+            return
+        X = block[:, self._index]
+        n_block = len(X)
+        block_mean = X.mean(axis=0)
+        block_m2 = ((X - block_mean) ** 2).sum(axis=0) if n_block > 1 else 0.0
+        bins = [np.searchsorted(edges, X[:, k], side='right') for k, edges, _ in self._histograms]
+        with self._lock:
+            n = self._n + n_block
+            delta = block_mean - self._mean
+            self._mean += delta * (n_block / n)
+            self._m2 += block_m2 + delta * delta * (self._n * n_block / n)
+            self._n = n
+            for counts, rows in zip(self._counts, bins):
+                np.add.at(counts, rows, 1)
+            if self._n >= self.window:
+                self.previous = self._scores()
+                self._reset()
+
+    def _scores(self):
+        n = self._n
+        report = {'rows': n, 'features': {}}
+        if not n:
+            return report
+        std = np.sqrt(self._m2 / n)
+        ref_std = np.where(self._ref_std > 0, self._ref_std, 1.0)
+        features = report['features']
+        for k, column in enumerate(self.columns):
+            mean = float(self._mean[k])
+            entry = {'mean': mean, 'reference_mean': float(self._ref_mean[k])}
+            if self._binary[k]:
+                p, q = mean, float(self._ref_mean[k])
+                entry['psi'] = _psi(np.array([p, 1 - p]), np.array([q, 1 - q]))
+            else:
+                entry.update(std=float(std[k]), reference_std=float(self._ref_std[k]),
+                             mean_shift=float((mean - self._ref_mean[k]) / ref_std[k]),
+                             std_ratio=float(std[k] / ref_std[k]))
+            features[column] = entry
+        for (k, _, expected), counts in zip(self._histograms, self._counts):
+            features[self.columns[k]]['psi'] = _psi(counts / n, expected)
+        for entry in features.values():
+            if 'psi' in entry:
+                entry['status'] = _status(entry['psi'])
+            else:
+                entry['status'] = 'significant' if abs(entry['mean_shift']) >= MEAN_SHIFT_SIGNIFICANT else 'stable'
+        psis = [entry['psi'] for entry in features.values() if 'psi' in entry]
+        report['max_psi'] = max(psis) if psis else None
+        report['drifted'] = sorted(column for column, entry in features.items() if entry['status'] == 'significant')
+        return report
+
+    def report(self):
+        """
+        Scores of the current window (marked insufficient below min_rows) and of the last complete one.
+        """
+        with self._lock:
+            current = self._scores()
+        current['sufficient'] = current['rows'] >= self.min_rows
+        return {
+            'reference': self.reference_source,
+            'window': self.window,
+            'current': current,
+            'previous': self.previous,
+        }
+
+
+def _round_floats(value, digits=6):
+    if isinstance(value, float):
+        return round(value, digits) if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _round_floats(item, digits) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_round_floats(item, digits) for item in value]
+    return value
+
+
+def save_reference_stats(stats, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(_round_floats(stats), f, indent=1)
+    os.replace(tmp_path, path)
@@ -0,0 +1,256 @@
+import numpy as np
+
+# --- Request Field Definitions ---
+# These mirror what the frontend (static/script.js) sends for each disease type.
+DIABETES_NUMERICAL_FEATURES = ['age', 'bmi', 'HbA1c_level', 'blood_glucose_level']
+DIABETES_BINARY_FEATURES = ['hypertension', 'heart_disease']
+
+GENDER_MAP = {
+    'Female': 'gender_Female',
+    'Male': 'gender_Male',
+    'Other': 'gender_Other'
+}
+SMOKING_HISTORY_MAP = {
+    'never': 'smoking_history_never',
+    'No Info': 'smoking_history_No Info',
+    'current': 'smoking_history_current',
+    'ever': 'smoking_history_ever',
+    'former': 'smoking_history_former',
+    'not current': 'smoking_history_not current'
+}
+
+HD_NUMERICAL_FEATURES = ['age', 'trestbps', 'chol', 'thalach', 'oldpeak']
+
+# Handle categorical features for heart disease (e.g., sex, cp, fbs, restecg, exang, slope, ca, thal)
+HD_CATEGORICAL_INPUTS = {
+    'hd_sex': {0: 'sex_0', 1: 'sex_1'},
+    'hd_cp': {0: 'cp_0', 1: 'cp_1', 2: 'cp_2', 3: 'cp_3'},
+    'hd_fbs': {0: 'fbs_0', 1: 'fbs_1'},
+    'hd_restecg': {0: 'restecg_0', 1: 'restecg_1', 2: 'restecg_2'},
+    'hd_exang': {0: 'exang_0', 1: 'exang_1'},
+    'hd_slope': {0: 'slope_0', 1: 'slope_1', 2: 'slope_2'},
+    'hd_ca': {0: 'ca_0', 1: 'ca_1', 2: 'ca_2', 3: 'ca_3', 4: 'ca_4'},
+    'hd_thal': {0: 'thal_0', 1: 'thal_1', 2: 'thal_2', 3: 'thal_3'}
+}
+
+HD_CATEGORICAL_COLUMNS = ['sex', 'cp', 'fbs', 'restecg', 'exang', 'slope', 'ca', 'thal']
+# The form codes some heart disease fields differently from cleveland.csv:
+# form value -> dataset value, for the fields where they differ
+HD_FORM_CODES = {
+    'cp': {0: 1, 1: 2, 2: 3, 3: 4},   # typical angina, atypical angina, non-anginal pain, asymptomatic
+    'slope': {0: 1, 1: 2, 2: 3},      # upsloping, flat, downsloping
+    'thal': {1: 3, 2: 6, 3: 7},       # normal, fixed defect, reversible defect (0 'Unknown' has no column)
+}
+
+
+class FeatureEncoder:
+    """
+    Maps request dicts straight into float64 NumPy rows laid out like the model's feature columns.
+
+    Everything that does not depend on the request (column positions, category lookups and the
+    fitted StandardScaler parameters) is resolved once when the encoder is built, so encoding a
+    request is a handful of dict lookups plus one fused (x - mean) / scale over the scaled columns.
+    Unmentioned columns stay at 0 before scaling, matching the original DataFrame-based code.
+    """
+
+    def __init__(self, feature_columns, numerical_inputs=(), binary_inputs=(), categorical_inputs=(), scaler=None, scaled_columns=(), key_prefix=''):
+        """
+        numerical_inputs / binary_inputs: (request_key, column) pairs converted with float() / int().
+        categorical_inputs: (request_key, {value: column}, coerce) triples; coerce is applied to the
+        raw value before lookup (None means use it as-is and ignore empty values). A fourth element
+        of False turns off the key_prefix alias for that input.
+        scaler / scaled_columns: fitted StandardScaler and the model columns it was fit on.
+        key_prefix: request keys carrying this prefix (e.g. 'hd_') are also accepted without it.
+        """
+        self.feature_columns = list(feature_columns)
+        self.n_features = len(self.feature_columns)
+        self.key_prefix = key_prefix
+        column_index = {col: i for i, col in enumerate(self.feature_columns)}
+
+        def alias_for(key):
+            return key[len(key_prefix):] if key_prefix and key.startswith(key_prefix) else None
+
+        # One slot per request field the encoder reads: (key, alias, convert, column index, category positions).
+        # Only inputs whose target column exists in the model are kept, resolved to positions.
+        self._slots = []
+        for key, col in numerical_inputs:
+            if col in column_index:
+                self._slots.append((key, alias_for(key), float, column_index[col], None))
+        for key, col in binary_inputs:
+            if col in column_index:
+                self._slots.append((key, alias_for(key), int, column_index[col], None))
+        for key, value_map, coerce, *options in categorical_inputs:
+            positions = {value: column_index[col] for value, col in value_map.items() if col in column_index}
+            alias = alias_for(key) if not options or options[0] else None
+            self._slots.append((key, alias, _category_converter(value_map, positions, coerce), None, positions))
+        self.input_keys = [slot[0] for slot in self._slots]
+
+        self._scale_index = None
+        if scaler is not None:
+            # The scaler expects column names as they were during training ('age', 'trestbps', etc.)
+            scaler_columns = list(getattr(scaler, 'feature_names_in_', scaled_columns))
+            kept = [(i, column_index[col]) for i, col in enumerate(scaler_columns) if col in column_index]
+            if kept:
+                scaler_positions = np.array([i for i, _ in kept], dtype=np.intp)
+                self._scale_index = np.array([j for _, j in kept], dtype=np.intp)
+                mean = getattr(scaler, 'mean_', None)
+                scale = getattr(scaler, 'scale_', None)
+                self._mean = np.asarray(mean, dtype=np.float64)[scaler_positions] if mean is not None else np.zeros(len(kept))
+                self._scale = np.asarray(scale, dtype=np.float64)[scaler_positions] if scale is not None else np.ones(len(kept))
+
+    def canonicalize(self, data):
+        """
+        Returns the tuple of coerced values this encoder reads from a request dict, one per input
+        field (None where absent or ignored). Two requests with the same canonical form always
+        encode to the same row, so it doubles as a cache key.
+        """
+        values = []
+        for key, alias, convert, _, _ in self._slots:
+            if key in data:
+                values.append(convert(data[key]))
+            elif alias is not None and alias in data:
+                values.append(convert(data[alias]))
+            else:
+                values.append(None)
+        return tuple(values)
+
+    def _fill(self, values, row):
+        """
+        Writes the unscaled canonical values of one request into a zeroed row.
+        """
+        for value, (_, _, _, index, positions) in zip(values, self._slots):
+            if value is None:
+                continue
+            if positions is None:
+                row[index] = value
+            else:
+                row[positions[value]] = 1.0
+
+    def scale_block(self, block):
+        """
+        Applies the StandardScaler transform in place over the scaled columns of a 2-D block.
+        """
+        if self._scale_index is not None and len(block):
+            cols = block[:, self._scale_index]
+            cols -= self._mean
+            cols /= self._scale
+            block[:, self._scale_index] = cols
+        return block
+
+    def encode(self, data, out=None):
+        """
+        Encodes and scales a single request dict. Returns a (1, n_features) float64 array.
+        Pass a preallocated `out` array of that shape to avoid the allocation.
+        """
+        return self.encode_canonical(self.canonicalize(data), out)
+
+    def encode_canonical(self, values, out=None):
+        """
+        Same as `encode`, for a request that has already been through `canonicalize`.
+        """
+        if out is None:
+            out = np.zeros((1, self.n_features), dtype=np.float64)
+        else:
+            out.fill(0.0)
+        self._fill(values, out[0])
+        return self.scale_block(out)
+
+    def canonicalize_many(self, records):
+        """
+        Canonicalizes a list of request dicts.
+        Returns (values, valid_indices, errors): the canonical tuples of the valid records (in input
+        order), those records' positions, and a list of (index, message) for the rest.
+        """
+        values, valid_indices, errors = [], [], []
+        for i, data in enumerate(records):
+            try:
+                if not isinstance(data, dict):
+                    raise ValueError("record must be a JSON object")
+                values.append(self.canonicalize(data))
+                valid_indices.append(i)
+            except Exception as e:
+                errors.append((i, str(e)))
+        return values, valid_indices, errors
+
+    def encode_canonical_many(self, values, scale=True):
+        """
+        Encodes a block of canonical value tuples into an (n, n_features) array,
+        scaled unless scale=False (then call `scale_block` on it yourself).
+        """
+        block = np.zeros((len(values), self.n_features), dtype=np.float64)
+        for row, row_values in zip(block, values):
+            self._fill(row_values, row)
+        return self.scale_block(block) if scale else block
+
+    def encode_many(self, records):
+        """
+        Encodes and scales a block of request dicts.
+        Returns (X, valid_indices, errors) where X holds one row per valid record (in input order),
+        valid_indices are those records' positions, and errors is a list of (index, message).
+        """
+        values, valid_indices, errors = self.canonicalize_many(records)
+        return self.encode_canonical_many(values), valid_indices, errors
+
+    def column_groups(self):
+        """
+        Model column positions grouped by the request field that sets them, as (name, positions)
+        pairs in input order; columns no field sets are listed on their own under their column name.
+        """
+        names = {}  # columns -> field name; fields setting the same columns share a group
+        for key, _, _, index, positions in self._slots:
+            columns = (index,) if index is not None else tuple(sorted(set(positions.values())))
+            if not columns:
+                continue
+            # Prefer the key the frontend sends ('hd_cp') over a dataset-style alias ('cp')
+            if columns not in names or (self.key_prefix and key.startswith(self.key_prefix)
+                                        and not names[columns].startswith(self.key_prefix)):
+                names[columns] = key
+        groups = [(key, list(columns)) for columns, key in names.items()]
+        covered = {i for columns in names for i in columns}
+        groups.extend((col, [i]) for i, col in enumerate(self.feature_columns) if i not in covered)
+        return groups
+
+
+def _category_converter(value_map, positions, coerce):
+    """
+    Builds the converter for a categorical input: returns the category value when it maps onto
+    a model column, None when the value is unknown or its column is not in the model.
+    """
+    if coerce is None:
+        def convert(raw):
+            return raw if raw and raw in value_map and raw in positions else None
+    else:
+        def convert(raw):
+            value = coerce(raw)
+            return value if value in positions else None
+    return convert
+
+
+def build_diabetes_encoder(feature_columns, scaler):
+    """
+    Builds the encoder for the diabetes model from its saved feature columns and scaler.
+    """
+    return FeatureEncoder(
+        feature_columns,
+        numerical_inputs=[(f, f) for f in DIABETES_NUMERICAL_FEATURES],
+        binary_inputs=[(f, f) for f in DIABETES_BINARY_FEATURES],
+        categorical_inputs=[('gender', GENDER_MAP, None), ('smoking_history', SMOKING_HISTORY_MAP, None)],
+        scaler=scaler,
+        scaled_columns=DIABETES_NUMERICAL_FEATURES,
+    )
+
+
+def build_heart_encoder(feature_columns, scaler):
+    """
+    Builds the encoder for the heart disease model from its saved feature columns and scaler.
+    The frontend sends 'hd_age', 'hd_sex' etc., which are processed to 'age', 'sex_1';
+    unprefixed keys ('age', 'sex', ...) are accepted as well, as found in cleveland.csv-style data.
+    """
+    return FeatureEncoder(
+        feature_columns,
+        numerical_inputs=[(f"hd_{f}", f) for f in HD_NUMERICAL_FEATURES],
+        categorical_inputs=[(key, value_map, int) for key, value_map in HD_CATEGORICAL_INPUTS.items()],
+        scaler=scaler,
+        scaled_columns=HD_NUMERICAL_FEATURES,
+        key_prefix='hd_',
+    )
@@ -0,0 +1,383 @@
+"""
+Flattened, array-backed inference for the scikit-learn RandomForest models.
+
+`export_forest` packs every tree of a fitted forest into a handful of contiguous NumPy arrays
+(feature index, threshold, left/right children and per-node class probabilities) and
+`FlatForest` evaluates them for one row or a whole batch at once, level by level across all trees,
+without going through scikit-learn's input validation and per-tree dispatch.
+
+Usage:
+    python forest_engine.py export   # writes model_artifacts/heart_disease_forest.joblib
+    python forest_engine.py verify   # checks parity against the original model on cleveland.csv
+"""
+import argparse
+import hashlib
+import os
+import sys
+
+import joblib
+import numpy as np
+
+HEART_MODEL_PATH = 'model_artifacts/heart_disease_model.joblib'
+HEART_SCALER_PATH = 'model_artifacts/heart_disease_scaler.joblib'
+HEART_FEATURE_COLUMNS_PATH = 'model_artifacts/heart_disease_feature_columns.joblib'
+HEART_FOREST_PATH = 'model_artifacts/heart_disease_forest.joblib'
+CLEVELAND_CSV_PATH = 'cleveland.csv'
+
+# Probabilities are averaged in a different order than scikit-learn does, so allow for rounding
+DEFAULT_TOLERANCE = 1e-9
+
+LEAF = -1
+
+
+def flatten_forest(model):
+    """
+    Packs the trees of a fitted forest (or a single fitted tree) into contiguous arrays.
+    Child indices are global offsets into the packed arrays; leaves have left == right == -1.
+    """
+    estimators = getattr(model, 'estimators_', [model])
+    features, thresholds, lefts, rights, values, roots, depths = [], [], [], [], [], [], []
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        # Leaves get feature 0 so they can be indexed safely; the threshold is never used
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, LEAF, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, LEAF, tree.children_right + offset).astype(np.int32))
+        # Normalise node values to class probabilities, exactly like DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(value / normalizer)
+        roots.append(offset)
+        depths.append(tree.max_depth)
+        offset += tree.node_count
+
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'value': np.ascontiguousarray(np.concatenate(values)),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': int(max(depths)),
+        'classes': np.asarray(model.classes_),
+        'n_features': int(model.n_features_in_),
+    }
+
+
+class FlatForest:
+    """
+    Serving-side evaluator over the arrays produced by `flatten_forest`.
+    Exposes the same predict_proba / predict / classes_ surface the app uses from scikit-learn.
+    """
+
+    def __init__(self, arrays):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.classes_ = arrays['classes']
+        self.n_features_in_ = int(arrays['n_features'])
+        self.n_estimators = len(self.roots)
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(flatten_forest(model))
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        return cls(joblib.load(path, mmap_mode=mmap_mode))
+
+    def apply(self, X):
+        """
+        Returns the global leaf index reached in every tree, shape (n_samples, n_trees).
+        """
+        # scikit-learn evaluates splits on float32 inputs; do the same so thresholds agree exactly
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        n_samples, n_features = X.shape
+        n_trees = len(self.roots)
+        X_flat = X.ravel()
+        nodes = np.tile(self.roots, n_samples)
+        row_offsets = np.repeat(np.arange(n_samples, dtype=np.intp) * n_features, n_trees)
+
+        # All (row, tree) pairs advance one level per iteration; pairs that reached a leaf are dropped
+        active = np.flatnonzero(self.left[nodes] != LEAF)
+        while active.size:
+            current = nodes[active]
+            go_left = X_flat[row_offsets[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = current
+            active = active[self.left[current] != LEAF]
+        return nodes.reshape(n_samples, n_trees)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        return self.value[leaves].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class HybridForest:
+    """
+    Uses FlatForest for small inputs, where scikit-learn's fixed per-call overhead dominates,
+    and hands large batches to the original estimator, whose compiled tree code wins there.
+    """
+
+    def __init__(self, flat, model, max_flat_rows=256):
+        self.flat = flat
+        self.model = model
+        self.max_flat_rows = max_flat_rows
+        self.classes_ = flat.classes_
+        self.n_features_in_ = flat.n_features_in_
+
+    def predict_proba(self, X):
+        if self.model is not None and len(X) > self.max_flat_rows:
+            return self.model.predict_proba(X)
+        return self.flat.predict_proba(X)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class ForestExplainer:
+    """
+    Per-feature contributions to the positive-class probability of a FlatForest (Saabas's method):
+    walking a row down a tree, every split moves the node's class probability, and the change is
+    credited to the split feature. The base value (the root probability) plus all contributions
+    equals the tree's prediction, so averaging over trees decomposes predict_proba exactly.
+
+    The path sums are precomputed once per leaf, so explaining a row is one leaf lookup per tree,
+    like predicting it, plus a gather of the leaves' contribution rows. As in HybridForest, large
+    inputs find their leaves through the scikit-learn model's compiled apply() when there is one.
+    Columns are reported in groups, e.g. all one-hot columns of a request field under that field's name.
+    """
+
+    # Below this many rows a single gather over all trees is cheaper than looping over the trees
+    MIN_ROWS_PER_TREE_LOOP = 32
+
+    def __init__(self, flat, groups, model=None, max_flat_rows=256, positive_class=1):
+        self.flat = flat
+        self.model = model
+        self.max_flat_rows = max_flat_rows
+        self.group_names = [name for name, _ in groups]
+        n_nodes, n_features = len(flat.feature), flat.n_features_in_
+        value = flat.value[:, positive_class]
+        self.base_value = float(value[flat.roots].mean())
+
+        # Parents always precede their children, so one pass per depth level fills every node's path sum
+        path = np.zeros((n_nodes, n_features))
+        frontier = np.asarray(flat.roots, dtype=np.intp)
+        while frontier.size:
+            parents = frontier[flat.left[frontier] != LEAF]
+            for children in (flat.left[parents], flat.right[parents]):
+                path[children] = path[parents]
+                path[children, flat.feature[parents]] += value[children] - value[parents]
+            frontier = np.concatenate((flat.left[parents], flat.right[parents])).astype(np.intp)
+
+        # Keep only leaf rows, already summed into groups and divided by the tree count
+        leaves = np.flatnonzero(flat.left == LEAF)
+        self._leaf_row = np.full(n_nodes, -1, dtype=np.intp)
+        self._leaf_row[leaves] = np.arange(len(leaves))
+        membership = np.zeros((n_features, len(groups)))
+        for j, (_, positions) in enumerate(groups):
+            membership[list(positions), j] = 1.0
+        self._leaf_contributions = np.ascontiguousarray(path[leaves] @ membership / len(flat.roots))
+
+    @classmethod
+    def from_model(cls, model, groups):
+        """
+        Builds an explainer for a FlatForest, a HybridForest or a fitted scikit-learn forest.
+        """
+        if isinstance(model, HybridForest):
+            return cls(model.flat, groups, model.model, model.max_flat_rows)
+        if isinstance(model, FlatForest):
+            return cls(model, groups)
+        estimator = final_estimator(model)
+        if not all(hasattr(tree, 'tree_') for tree in getattr(estimator, 'estimators_', [estimator])):
+            raise ValueError(f"explanations need a tree ensemble, not {type(estimator).__name__}")
+        return cls(FlatForest.from_model(estimator), groups, estimator)
+
+    def explain(self, X):
+        """
+        Returns an (n_samples, n_groups) array of contributions; each row sums to the row's
+        positive-class probability minus base_value.
+        """
+        if self.model is not None and len(X) > self.max_flat_rows:
+            # apply() gives node ids within each tree; the flat arrays number them globally
+            leaves = self._leaf_row[self.model.apply(X).reshape(len(X), -1) + self.flat.roots]
+        else:
+            leaves = self._leaf_row[self.flat.apply(X)]
+        if len(leaves) < self.MIN_ROWS_PER_TREE_LOOP:
+            return self._leaf_contributions[leaves].sum(axis=1)
+        # One gather per tree keeps the working set at rows x groups instead of rows x trees x groups
+        contributions = np.zeros((len(leaves), len(self.group_names)))
+        for tree_leaves in np.ascontiguousarray(leaves.T):
+            contributions += self._leaf_contributions[tree_leaves]
+        return contributions
+
+
+def final_estimator(model):
+    """
+    The classifier itself, whether model is a bare forest or a Pipeline ending in one.
+    """
+    return model.steps[-1][1] if hasattr(model, 'steps') else model
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def dump_atomic(value, path):
+    """
+    joblib.dump to a temporary file next to path, then renamed over it. Serving workers memory-map
+    artifacts (ARTIFACT_MMAP_MODE), and rewriting a mapped file in place would truncate the pages
+    under them; after the rename they keep the old inode until they reload.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_exported_forest(model_path=HEART_MODEL_PATH, forest_path=HEART_FOREST_PATH, mmap_mode=None):
+    """
+    Loads the exported arrays if they were flattened from the model currently at model_path.
+    Returns None when the export is missing or stale.
+    """
+    if not os.path.exists(forest_path):
+        return None
+    arrays = joblib.load(forest_path, mmap_mode=mmap_mode)
+    if arrays.get('source_sha256') != file_sha256(model_path):
+        return None
+    return FlatForest(arrays)
+
+
+class ScalerStats:
+    """
+    The fitted StandardScaler attributes FeatureEncoder reads, as plain arrays.
+    """
+
+    def __init__(self, mean, scale, feature_names):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.feature_names_in_ = feature_names
+
+
+def load_slim_parts(model_path=HEART_MODEL_PATH, forest_path=HEART_FOREST_PATH, scaler_path=HEART_SCALER_PATH,
+                    feature_columns_path=HEART_FEATURE_COLUMNS_PATH, mmap_mode=None):
+    """
+    Returns (FlatForest, feature_columns, ScalerStats) read from the export alone, without
+    unpickling the scikit-learn model or scaler (and so without importing scikit-learn), or None
+    when the export lacks the serving columns or any of the three source files has changed.
+    """
+    if not os.path.exists(forest_path):
+        return None
+    arrays = joblib.load(forest_path, mmap_mode=mmap_mode)
+    sources = {'source_sha256': model_path, 'scaler_sha256': scaler_path, 'feature_columns_sha256': feature_columns_path}
+    if any(key not in arrays or arrays[key] != file_sha256(path) for key, path in sources.items()):
+        return None
+    scaler = ScalerStats(arrays['scaler_mean'], arrays['scaler_scale'], arrays['scaler_columns'])
+    return FlatForest(arrays), [str(col) for col in arrays['feature_columns']], scaler
+
+
+def export_forest(model_path=HEART_MODEL_PATH, out_path=HEART_FOREST_PATH, scaler_path=HEART_SCALER_PATH,
+                  feature_columns_path=HEART_FEATURE_COLUMNS_PATH):
+    """
+    Flattens the forest stored at model_path and writes the arrays next to it (uncompressed,
+    so they can later be memory-mapped), tagged with the model file's hash. For a bare forest,
+    the feature columns and scaler statistics are copied in as well, so SLIM_RUNTIME can serve
+    from this file alone.
+    """
+    model = joblib.load(model_path)
+    arrays = flatten_forest(final_estimator(model))
+    arrays['source_sha256'] = file_sha256(model_path)
+    if not hasattr(model, 'steps') and os.path.exists(scaler_path) and os.path.exists(feature_columns_path):
+        scaler = joblib.load(scaler_path)
+        arrays['feature_columns'] = np.array(joblib.load(feature_columns_path), dtype=str)
+        arrays['scaler_columns'] = np.array(scaler.feature_names_in_, dtype=str)
+        arrays['scaler_mean'] = np.asarray(scaler.mean_, dtype=np.float64)
+        arrays['scaler_scale'] = np.asarray(scaler.scale_, dtype=np.float64)
+        arrays['scaler_sha256'] = file_sha256(scaler_path)
+        arrays['feature_columns_sha256'] = file_sha256(feature_columns_path)
+    dump_atomic(arrays, out_path)
+    print(f"Flattened {len(arrays['roots'])} trees ({len(arrays['feature'])} nodes) to {out_path}")
+    return arrays
+
+
+def load_cleveland_matrix(csv_path=CLEVELAND_CSV_PATH, feature_columns_path=HEART_FEATURE_COLUMNS_PATH, scaler_path=HEART_SCALER_PATH):
+    """
+    Rebuilds the scaled heart disease feature matrix for every usable row of cleveland.csv,
+    encoded the same way the training script does (one-hot on the raw values, then StandardScaler).
+    """
+    import pandas as pd
+
+    from dataset_loader import load_cleveland
+
+    df = load_cleveland(csv_path)
+    categorical_cols = ['sex', 'cp', 'fbs', 'restecg', 'exang', 'slope', 'ca', 'thal']
+    X_encoded = pd.get_dummies(df.drop('target', axis=1), columns=categorical_cols, drop_first=False)
+
+    feature_columns = joblib.load(feature_columns_path)
+    X_encoded = X_encoded.reindex(columns=feature_columns, fill_value=0).astype(np.float64)
+    scaler = joblib.load(scaler_path)
+    scaled_cols = list(scaler.feature_names_in_)
+    X_encoded[scaled_cols] = scaler.transform(X_encoded[scaled_cols])
+    return X_encoded.to_numpy()
+
+
+def verify_parity(model_path=HEART_MODEL_PATH, forest_path=HEART_FOREST_PATH, csv_path=CLEVELAND_CSV_PATH, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares FlatForest probabilities against the original scikit-learn model on cleveland.csv,
+    both row by row and as one batch. Returns the largest absolute difference seen.
+    """
+    model = joblib.load(model_path)
+    if hasattr(model, 'steps'):
+        # A fused pipeline encodes the raw dataset rows itself
+        from dataset_loader import load_cleveland
+        X = model[:-1].transform(load_cleveland(csv_path).drop(columns='target'))
+        model = final_estimator(model)
+    else:
+        X = load_cleveland_matrix(csv_path)
+    forest = load_exported_forest(model_path, forest_path) or FlatForest.from_model(model)
+
+    expected = model.predict_proba(X)
+    batch_diff = np.abs(forest.predict_proba(X) - expected).max()
+    row_diff = max(np.abs(forest.predict_proba(X[i:i + 1]) - expected[i:i + 1]).max() for i in range(len(X)))
+    max_diff = max(batch_diff, row_diff)
+    print(f"Checked {len(X)} rows from {csv_path}: max |flat - sklearn| = {max_diff:.3e} (tolerance {tolerance:.0e})")
+    if max_diff > tolerance:
+        raise AssertionError(f"FlatForest deviates from the original model by {max_diff:.3e}")
+    return max_diff
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export and verify the flattened heart disease forest.")
+    parser.add_argument('command', choices=['export', 'verify'])
+    parser.add_argument('--model', default=HEART_MODEL_PATH)
+    parser.add_argument('--out', default=HEART_FOREST_PATH)
+    parser.add_argument('--data', default=CLEVELAND_CSV_PATH)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_forest(args.model, args.out)
+    else:
+        try:
+            verify_parity(args.model, args.out, args.data, args.tolerance)
+        except AssertionError as e:
+            print(f"Parity check failed: {e}")
+            sys.exit(1)
+        print("Parity check passed.")
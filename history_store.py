@@ -0,0 +1,153 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+
+from audit_log import record_to_dict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    disease_type TEXT NOT NULL,
+    model_version TEXT,
+    probability REAL NOT NULL,
+    features TEXT
+);
+CREATE INDEX IF NOT EXISTS predictions_disease_ts ON predictions (disease_type, ts);
+CREATE INDEX IF NOT EXISTS predictions_disease_probability ON predictions (disease_type, probability);
+"""
+
+# order_by value accepted by query() -> the indexed column it sorts on (newest / highest first)
+ORDERS = {'timestamp': 'ts', 'probability': 'probability'}
+MAX_PAGE_SIZE = 500
+
+
+class HistoryStore:
+    """
+    Queryable history of served predictions in a local SQLite database.
+
+    Rows are filled in by the audit log (it is one of its sinks, see audit_log.py) and read back a
+    page at a time by query(). Every query filters on one disease type and sorts on timestamp or
+    probability, which the two composite indexes (disease_type, ts) and (disease_type, probability)
+    serve directly; SQLite appends the rowid to every index entry, so the (value, id) keyset used
+    for pagination is indexed too. A page therefore costs the same whether it is the first or the
+    thousandth, and however large the table grows, unlike OFFSET pagination.
+
+    The database runs in WAL mode so several worker processes can write while others read.
+    Connections are per thread and per process (sqlite3 connections must not cross either).
+    """
+
+    name = 'history'
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            local.connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            local.connection.execute('PRAGMA journal_mode=WAL')
+            local.connection.execute('PRAGMA synchronous=NORMAL')
+            local.pid = os.getpid()
+        return local.connection
+
+    def insert_many(self, rows):
+        """
+        Inserts (ts, disease_type, model_version, probability, features_json) tuples in one transaction.
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany(
+                'INSERT INTO predictions (ts, disease_type, model_version, probability, features) VALUES (?, ?, ?, ?, ?)',
+                rows)
+
+    def write(self, batch):
+        rows = []
+        for entry in batch:
+            record = record_to_dict(entry)
+            rows.append((record['ts'], record['disease_type'], record['model_version'], float(record['probability']),
+                         json.dumps(record['features'], separators=(',', ':'))))
+        self.insert_many(rows)
+
+    def query(self, disease_type, since=None, until=None, min_probability=None, max_probability=None,
+              order_by='timestamp', limit=50, cursor=None):
+        """
+        One page of predictions for disease_type, newest (or most probable) first, optionally
+        limited to since <= ts < until and min_probability <= probability <= max_probability.
+        Returns (rows, next_cursor); pass next_cursor back to get the following page, None means
+        there are no more.
+        """
+        if order_by not in ORDERS:
+            raise ValueError(f"order_by must be one of {', '.join(ORDERS)}")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        column = ORDERS[order_by]
+        clauses, params = ['disease_type = ?'], [disease_type]
+        for condition, value in (('ts >= ?', since), ('ts < ?', until),
+                                 ('probability >= ?', min_probability), ('probability <= ?', max_probability)):
+            if value is not None:
+                clauses.append(condition)
+                params.append(value)
+        if cursor is not None:
+            value, last_id = decode_cursor(cursor, order_by)
+            clauses.append(f'({column}, id) < (?, ?)')
+            params.extend((value, last_id))
+        params.append(limit + 1)
+        sql = (f'SELECT id, ts, disease_type, model_version, probability, features FROM predictions '
+               f'INDEXED BY predictions_disease_{column} '
+               f'WHERE {" AND ".join(clauses)} ORDER BY {column} DESC, id DESC LIMIT ?')
+        rows = self._connection().execute(sql, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(order_by, last[1] if column == 'ts' else last[4], last[0])
+        return [{
+            'id': row_id,
+            'ts': ts,
+            'disease_type': row_disease_type,
+            'model_version': model_version,
+            'probability': probability,
+            'features': json.loads(features) if features else {},
+        } for row_id, ts, row_disease_type, model_version, probability, features in rows], next_cursor
+
+    def count(self, disease_type=None):
+        if disease_type is None:
+            return self._connection().execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM predictions WHERE disease_type = ?', (disease_type,)).fetchone()[0]
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            connection.close()
+        self._local = threading.local()
+
+
+def encode_cursor(order_by, value, row_id):
+    """
+    The opaque keyset cursor for the row after which the next page starts.
+    """
+    return base64.urlsafe_b64encode(json.dumps([order_by, value, row_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, order_by):
+    try:
+        cursor_order, value, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        value, row_id = float(value), int(row_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+    if cursor_order != order_by:
+        raise ValueError("cursor belongs to a query with a different order_by")
+    return value, row_id
@@ -0,0 +1,370 @@
+"""
+Offline load test: starts the app locally under each worker configuration and drives /predict with
+open-loop synthetic traffic, reporting latency percentiles, error rates and the saturation point.
+
+Requests are sent on a fixed schedule (Poisson or evenly spaced arrivals) whatever the server's
+response times, so a slow server faces a growing backlog as real clients would impose, and every
+latency is measured from the request's scheduled send time rather than from when a client thread
+got to it. Bodies come from synthetic_payloads.py: heart disease rows sampled from cleveland.csv
+(in the form's codes, with jittered numerical fields so they are not all prediction cache hits)
+and diabetes records synthesized around the diabetes scaler's statistics.
+
+With --ramp, the rate steps from --rate to --max-rate and the saturation point is the highest
+step whose p99 stays within --slo-ms, whose error rate stays within --max-error-rate and whose
+completed rate keeps up with the offered rate. --min-saturation-rps turns the run into a release
+gate (exit status 1 when any configuration saturates below it). Nothing is downloaded; every
+server is started on 127.0.0.1.
+
+A --config is a server command line without the bind address and app; leading VAR=value words
+set environment variables for that server only:
+    "gunicorn -w 2"
+    "gunicorn -w 1 -k gthread --threads 8"
+    "MICROBATCH=1 gunicorn -w 1 -k gthread --threads 16"
+    "uvicorn --workers 2"                     # serves asgi_app:app
+
+Usage:
+    python load_test.py --config "gunicorn -w 2" --rate 50 --duration 20
+    python load_test.py --config "gunicorn -w 1" --config "gunicorn -w 2" --ramp --rate 20 --max-rate 400 --steps 8
+    python load_test.py --url http://127.0.0.1:10000 --rate 100 --duration 30   # an already running server
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+from measure_cold_start import wait_until_up
+from synthetic_payloads import diabetes_payloads, heart_disease_payloads
+
+DIABETES_SCALER_PATH = 'model_artifacts/diabetes_scaler.joblib'
+PERCENTILES = (50, 90, 99)
+
+
+def build_bodies(mix, n, seed, jitter):
+    """
+    n encoded /predict bodies, shuffled, with disease types in the proportions given by mix.
+    """
+    bodies = []
+    total = sum(mix.values())
+    for disease_type, weight in mix.items():
+        count = round(n * weight / total)
+        if disease_type == 'heart_disease':
+            payloads = heart_disease_payloads(count, seed, form_codes=True, jitter=jitter)
+        else:
+            scaler = None
+            if os.path.exists(DIABETES_SCALER_PATH):
+                import joblib
+                scaler = joblib.load(DIABETES_SCALER_PATH)
+            payloads = diabetes_payloads(count, seed, scaler)
+        bodies.extend((disease_type, json.dumps(payload).encode()) for payload in payloads)
+    random.Random(seed).shuffle(bodies)
+    return bodies
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+class OpenLoopClient:
+    """
+    Sends POST /predict requests at scheduled times from a pool of threads, each with its own
+    keep-alive connection, and records (scheduled time, latency, outcome) for every request.
+    """
+
+    def __init__(self, base_url, threads=256, timeout=30.0):
+        url = urllib.parse.urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.timeout = timeout
+        self._jobs = queue.Queue()
+        self._cursor = 0  # position in the body list, carried across runs so steps do not replay bodies
+        self._results = []
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._work, daemon=True, name=f"load-client-{i}") for i in range(threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def _work(self):
+        connection = None
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            scheduled, disease_type, body = job
+            picked_up = time.perf_counter()
+            for attempt in range(2):
+                reused = connection is not None
+                try:
+                    if connection is None:
+                        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                    connection.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+                    response = connection.getresponse()
+                    response.read()
+                    outcome = response.status
+                    if response.will_close:
+                        connection.close()
+                        connection = None
+                    break
+                except (OSError, http.client.HTTPException) as e:
+                    outcome = type(e).__name__
+                    if connection is not None:
+                        connection.close()
+                    connection = None
+                    # The server may have closed an idle keep-alive connection; retry once on a new one
+                    if not (reused and isinstance(e, (ConnectionError, http.client.RemoteDisconnected))):
+                        break
+            done = time.perf_counter()
+            with self._lock:
+                self._results.append((scheduled, done - scheduled, picked_up - scheduled, disease_type, outcome))
+
+    def run(self, rate, duration, bodies, arrival='poisson', seed=0):
+        """
+        Offers `rate` requests per second for `duration` seconds, cycling through bodies, then waits
+        for outstanding requests (up to the client timeout). Returns the recorded results.
+        """
+        with self._lock:
+            self._results = []
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        scheduled, sent = start, 0
+        while scheduled < start + duration:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            disease_type, body = bodies[self._cursor % len(bodies)]
+            self._jobs.put((scheduled, disease_type, body))
+            self._cursor += 1
+            sent += 1
+            scheduled += rng.expovariate(rate) if arrival == 'poisson' else 1.0 / rate
+
+        deadline = time.perf_counter() + self.timeout
+        while time.perf_counter() < deadline:
+            with self._lock:
+                if len(self._results) >= sent:
+                    break
+            time.sleep(0.05)
+        with self._lock:
+            results = list(self._results)
+        # Anything still outstanding counts as a timeout
+        results.extend((None, None, None, None, 'Timeout') for _ in range(sent - len(results)))
+        return results
+
+    def close(self):
+        for _ in self._threads:
+            self._jobs.put(None)
+
+
+def summarize(results, rate, duration):
+    """
+    Latency percentiles of successful requests, error counts and throughput for one step.
+    completed_rps spreads the successes over the time until the last one finished, so a server
+    that falls behind shows up as completing fewer requests per second than were sent.
+    """
+    ok = sorted(latency for _, latency, _, _, outcome in results if outcome == 200)
+    lags = sorted(lag for _, _, lag, _, _ in results if lag is not None)
+    errors = {}
+    for _, _, _, _, outcome in results:
+        if outcome != 200:
+            errors[str(outcome)] = errors.get(str(outcome), 0) + 1
+    scheduled = [(sent, latency) for sent, latency, _, _, outcome in results if outcome == 200]
+    span = duration
+    if scheduled:
+        span = max(duration, max(sent + latency for sent, latency in scheduled) - min(sent for sent, _ in scheduled))
+    summary = {
+        'offered_rps': rate,
+        'requests': len(results),
+        'sent_rps': len(results) / duration,
+        'completed_rps': len(ok) / span,
+        'error_rate': (len(results) - len(ok)) / len(results) if results else 0.0,
+        'errors': errors,
+        'max_ms': ok[-1] * 1000 if ok else None,
+        # How late client threads picked requests up; large values mean the client, not the server, was the bottleneck
+        'client_lag_p99_ms': percentile(lags, 99) * 1000 if lags else None,
+    }
+    for q in PERCENTILES:
+        value = percentile(ok, q)
+        summary[f'p{q}_ms'] = value * 1000 if value is not None else None
+    return summary
+
+
+def saturated(summary, slo_ms, max_error_rate):
+    """
+    The reason this step counts as past the saturation point, or None.
+    """
+    if summary['error_rate'] > max_error_rate:
+        return f"error rate {summary['error_rate']:.1%}"
+    if summary['p99_ms'] is None or summary['p99_ms'] > slo_ms:
+        return f"p99 {summary['p99_ms'] or float('inf'):.0f} ms > {slo_ms:.0f} ms"
+    if summary['completed_rps'] < 0.9 * summary['sent_rps']:
+        return f"completed {summary['completed_rps']:.0f}/s of {summary['sent_rps']:.0f}/s sent"
+    return None
+
+
+def parse_config(config):
+    """
+    Splits a --config string into (environment overrides, server name, extra arguments).
+    """
+    words = shlex.split(config)
+    env = {}
+    while words and '=' in words[0] and not words[0].startswith('-'):
+        name, value = words.pop(0).split('=', 1)
+        env[name] = value
+    if not words or words[0] not in ('gunicorn', 'uvicorn'):
+        raise ValueError(f"config must name gunicorn or uvicorn: {config!r}")
+    return env, words[0], words[1:]
+
+
+def start_server(config, port, timeout):
+    env, server, extra = parse_config(config)
+    if server == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--log-level', 'warning', *extra]
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--timeout', '0', *extra, 'app:app']
+    # Load models before accepting traffic unless the config says otherwise
+    process_env = dict(os.environ, PRELOAD_MODELS=os.environ.get("PRELOAD_MODELS", "all"), **env)
+    process = subprocess.Popen(command, env=process_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_until_up(f"http://127.0.0.1:{port}/healthz", process, time.monotonic() + timeout)
+    return process
+
+
+def probe(base_url, body, timeout):
+    """
+    Sends one /predict request and returns its status code (or the exception's name).
+    """
+    url = urllib.parse.urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+    try:
+        connection.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except (OSError, http.client.HTTPException) as e:
+        return type(e).__name__
+    finally:
+        connection.close()
+
+
+def usable_mix(base_url, mix, bodies, timeout):
+    """
+    Drops disease types the server cannot score (e.g. missing artifacts) from the mix, with a warning.
+    """
+    kept = {}
+    for disease_type, weight in mix.items():
+        outcome = probe(base_url, next(body for kind, body in bodies if kind == disease_type), timeout)
+        if outcome == 200:
+            kept[disease_type] = weight
+        else:
+            print(f"Warning: dropping {disease_type} from the mix, the server answered {outcome}")
+    return kept
+
+
+def run_config(base_url, rates, args, bodies):
+    client = OpenLoopClient(base_url, args.client_threads, args.timeout)
+    try:
+        if args.warmup:
+            client.run(rates[0], args.warmup, bodies, args.arrival, args.seed)
+        steps, saturation_rps, reason = [], None, None
+        for i, rate in enumerate(rates):
+            summary = summarize(client.run(rate, args.duration, bodies, args.arrival, args.seed + i), rate, args.duration)
+            steps.append(summary)
+            reason = saturated(summary, args.slo_ms, args.max_error_rate)
+            print(f"  {rate:8.1f}/s offered  {summary['completed_rps']:8.1f}/s ok  "
+                  + "  ".join(f"p{q} {summary[f'p{q}_ms'] or float('nan'):7.1f} ms" for q in PERCENTILES)
+                  + f"  errors {summary['error_rate']:6.2%}  client lag p99 {summary['client_lag_p99_ms'] or 0:6.1f} ms"
+                  + (f"  <- {reason}" if reason else ""))
+            if reason:
+                break
+            saturation_rps = rate
+        return {'steps': steps, 'saturation_rps': saturation_rps, 'saturated_by': reason}
+    finally:
+        client.close()
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Open-loop load test of /predict against locally started servers.")
+    parser.add_argument('--config', action='append', help="Server command line (repeatable); default 'gunicorn -w 2'")
+    parser.add_argument('--url', help="Test an already running server instead of starting one")
+    parser.add_argument('--port', type=int, default=18766)
+    parser.add_argument('--rate', type=float, default=50, help="Requests per second (the first step with --ramp)")
+    parser.add_argument('--ramp', action='store_true', help="Step the rate up to --max-rate to find the saturation point")
+    parser.add_argument('--max-rate', type=float, default=800)
+    parser.add_argument('--steps', type=int, default=8, help="Ramp steps, evenly spaced on a log scale")
+    parser.add_argument('--duration', type=float, default=15, help="Seconds per step")
+    parser.add_argument('--warmup', type=float, default=3, help="Seconds of traffic at the first rate before measuring")
+    parser.add_argument('--arrival', choices=['poisson', 'uniform'], default='poisson')
+    parser.add_argument('--mix', default='heart_disease=0.7,diabetes=0.3', help="Disease types and their weights")
+    parser.add_argument('--jitter', type=float, default=0.1, help="Noise on numerical fields, in standard deviations")
+    parser.add_argument('--payloads', type=int, default=20000, help="Distinct bodies to cycle through")
+    parser.add_argument('--slo-ms', type=float, default=200, help="p99 latency a step must stay within")
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--min-saturation-rps', type=float, help="Exit 1 if any config saturates below this rate")
+    parser.add_argument('--client-threads', type=int, default=256)
+    parser.add_argument('--timeout', type=float, default=30, help="Per-request and server start-up timeout, in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the full results as JSON")
+    args = parser.parse_args()
+
+    if args.ramp and args.steps > 1:
+        ratio = (args.max_rate / args.rate) ** (1 / (args.steps - 1))
+        rates = [round(args.rate * ratio ** i, 1) for i in range(args.steps)]
+    else:
+        rates = [args.rate]
+    mix = parse_mix(args.mix)
+    bodies = build_bodies(mix, args.payloads, args.seed, args.jitter)
+
+    configs = [None] if args.url else (args.config or ['gunicorn -w 2'])
+    report = {'rates': rates, 'mix': mix, 'slo_ms': args.slo_ms, 'max_error_rate': args.max_error_rate, 'configs': {}}
+    for config in configs:
+        process = None
+        name = config or args.url
+        print(f"{name}:")
+        try:
+            if config is not None:
+                process = start_server(config, args.port, args.timeout)
+            base_url = args.url or f"http://127.0.0.1:{args.port}"
+            kept = usable_mix(base_url, mix, bodies, args.timeout)
+            if not kept:
+                raise RuntimeError("the server could not score any disease type in the mix")
+            config_bodies = [(kind, body) for kind, body in bodies if kind in kept]
+            report['configs'][name] = run_config(base_url, rates, args, config_bodies)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+
+    print("\nSaturation point (highest step within the SLO):")
+    failed = []
+    width = max(map(len, report['configs']), default=0) + 2
+    for name, result in report['configs'].items():
+        rps = result['saturation_rps']
+        note = f" (then {result['saturated_by']})" if result['saturated_by'] else " (never saturated; raise --max-rate)"
+        print(f"  {name:<{width}}{rps if rps is not None else 'below the first step'}{' req/s' if rps else ''}{note}")
+        if args.min_saturation_rps is not None and (rps or 0) < args.min_saturation_rps:
+            failed.append(name)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if failed:
+        print(f"FAIL: below {args.min_saturation_rps} req/s: {', '.join(failed)}")
+        sys.exit(1)
@@ -0,0 +1,131 @@
+"""
+Measures cold-start latency of the prediction app: start a fresh server process, then time how long
+it takes until the home page answers and until the first prediction for each disease type comes back.
+
+Every run starts a new gunicorn (or uvicorn, for asgi_app) process, as a scale-to-zero host would,
+and polls / until it responds. The process's own /startup breakdown (import phases and
+per-artifact model load times) is printed for the last run. Exits with status 1 when the median
+time to the first prediction misses --target-ms, so it can gate a deploy.
+
+Usage:
+    python measure_cold_start.py --runs 5 --target-ms 3000
+    python measure_cold_start.py --disease-types heart_disease diabetes
+    PRELOAD_MODELS=all PRELOAD_IN_BACKGROUND=1 python measure_cold_start.py
+    python measure_cold_start.py --server uvicorn --app asgi_app:app
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+PAYLOADS = {
+    'heart_disease': {
+        'disease_type': 'heart_disease', 'hd_age': 63, 'hd_sex': 1, 'hd_cp': 3, 'hd_trestbps': 145, 'hd_chol': 233,
+        'hd_fbs': 1, 'hd_restecg': 0, 'hd_thalach': 150, 'hd_exang': 0, 'hd_oldpeak': 2.3, 'hd_slope': 0,
+        'hd_ca': 0, 'hd_thal': 1,
+    },
+    'diabetes': {
+        'disease_type': 'diabetes', 'age': 54, 'bmi': 27.3, 'HbA1c_level': 6.6, 'blood_glucose_level': 140,
+        'hypertension': 0, 'heart_disease': 0, 'gender': 'Female', 'smoking_history': 'never',
+    },
+}
+
+
+def server_command(server, app_path, port):
+    if server == 'uvicorn':
+        return [sys.executable, '-m', 'uvicorn', app_path, '--host', '127.0.0.1', '--port', str(port),
+                '--log-level', 'warning']
+    return [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', '1', '--timeout', '0',
+            app_path]
+
+
+def request(url, payload=None, timeout=60):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'} if data else {})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return response.status, response.read()
+
+
+def wait_until_up(url, process, deadline):
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode} before answering {url}")
+        try:
+            request(url, timeout=1)
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.005)
+    raise RuntimeError(f"{url} did not answer in time")
+
+
+def cold_start(args, disease_types):
+    """
+    Starts one server and returns (timings in ms since spawn, its /startup report or None).
+    """
+    base = f"http://127.0.0.1:{args.port}"
+    start = time.monotonic()
+    process = subprocess.Popen(server_command(args.server, args.app, args.port),
+                               stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+    try:
+        wait_until_up(base + '/', process, start + args.timeout)
+        timings = {'home': (time.monotonic() - start) * 1000}
+        for disease_type in disease_types:
+            try:
+                status, body = request(base + '/predict', PAYLOADS[disease_type], timeout=args.timeout)
+            except urllib.error.HTTPError as e:
+                status, body = e.code, e.read()
+            if status != 200 or 'prediction_text' not in json.loads(body):
+                raise RuntimeError(f"Unexpected {disease_type} response ({status}): {body[:200]!r}")
+            timings[f'first_{disease_type}'] = (time.monotonic() - start) * 1000
+        timings['first_prediction'] = timings[f'first_{disease_types[0]}']
+        try:
+            report = json.loads(request(base + '/startup')[1])
+        except (urllib.error.URLError, ValueError):
+            report = None  # asgi_app does not serve /startup
+        return timings, report
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time a fresh server's first page and first prediction.")
+    parser.add_argument('--server', choices=['gunicorn', 'uvicorn'], default='gunicorn')
+    parser.add_argument('--app', default=None, help="WSGI/ASGI app path (default: app:app, or asgi_app:app for uvicorn)")
+    parser.add_argument('--port', type=int, default=18765)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--disease-types', nargs='+', choices=sorted(PAYLOADS), default=['heart_disease'],
+                        help="Predicted in order after the home page; the first one sets first_prediction")
+    parser.add_argument('--target-ms', type=float, default=3000, help="Budget for the median time to the first prediction")
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds to wait for a server to come up")
+    parser.add_argument('--verbose', action='store_true', help="Show the server's log output")
+    args = parser.parse_args()
+    args.app = args.app or ('asgi_app:app' if args.server == 'uvicorn' else 'app:app')
+
+    runs, report = [], None
+    for i in range(args.runs):
+        timings, report = cold_start(args, args.disease_types)
+        runs.append(timings)
+        print(f"run {i + 1}: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in timings.items()))
+
+    print(f"\nMedian over {args.runs} cold starts of {args.server} {args.app}:")
+    for name in runs[0]:
+        print(f"  {name:<28}{statistics.median(run[name] for run in runs):>10.0f} ms")
+    if report:
+        print("\nServer-side breakdown (last run):")
+        for name, ms in report['import_ms'].items():
+            print(f"  import {name:<50}{ms:>10.1f} ms")
+        for disease_type, model in report['models'].items():
+            for path, ms in model['artifact_ms'].items():
+                print(f"  load {path:<52}{ms:>10.1f} ms")
+            print(f"  {disease_type} model total{'':<38}{model['load_ms']:>10.1f} ms")
+
+    first_prediction = statistics.median(run['first_prediction'] for run in runs)
+    if first_prediction > args.target_ms:
+        print(f"\nFAIL: first prediction after {first_prediction:.0f} ms, target {args.target_ms:.0f} ms")
+        sys.exit(1)
+    print(f"\nOK: first prediction after {first_prediction:.0f} ms, target {args.target_ms:.0f} ms")
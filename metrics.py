@@ -0,0 +1,393 @@
+"""
+Minimal Prometheus-style metrics (counters, gauges, histograms) rendered in the text exposition format.
+
+By default values live in process memory. When METRICS_MULTIPROC_DIR is set (e.g. for gunicorn with
+several workers), every process writes its values into its own memory-mapped file in that directory
+and /metrics sums them across all files, so any worker can answer a scrape for the whole server.
+Recording only touches a per-process lock around a single float update; nothing is shared between
+processes on the hot path. Empty the directory before starting the server, since counters from
+earlier runs' files would otherwise be added in.
+"""
+import bisect
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+MULTIPROC_DIR_ENV = "METRICS_MULTIPROC_DIR"
+_SLOT = struct.Struct('d')
+_MMAP_SLOTS = 16384
+
+
+class _LocalStore:
+    """
+    Sample values for this process only, kept in a dict.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def inc_many(self, keys_and_amounts):
+        with self._lock:
+            for key, amount in keys_and_amounts:
+                self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def snapshot(self):
+        with self._lock:
+            return [(os.getpid(), dict(self._values))]
+
+
+class _MmapStore:
+    """
+    Sample values for this process in <dir>/metrics_<pid>.db, a fixed array of float64 slots.
+    The key of every allocated slot is appended to <dir>/metrics_<pid>.keys as a JSON line, so
+    any process can read the values back.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.pid = os.getpid()
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._slots = {}
+        path = os.path.join(directory, f"metrics_{self.pid}.db")
+        # A reused pid finds an earlier process's files; both start over together (keys first, so
+        # a reader never maps the old slot numbers onto the new values)
+        self._keys_file = open(os.path.join(directory, f"metrics_{self.pid}.keys"), 'w')
+        with open(path, 'wb') as f:
+            f.truncate(_MMAP_SLOTS * _SLOT.size)
+        self._file = open(path, 'r+b')
+        self._mmap = mmap.mmap(self._file.fileno(), _MMAP_SLOTS * _SLOT.size)
+
+    def _slot(self, key):
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = len(self._slots)
+            if slot >= _MMAP_SLOTS:
+                raise RuntimeError(f"Metrics store full ({_MMAP_SLOTS} series)")
+            self._slots[key] = slot
+            self._keys_file.write(json.dumps([slot, list(key)]) + '\n')
+            self._keys_file.flush()
+        return slot * _SLOT.size
+
+    def inc(self, key, amount):
+        with self._lock:
+            offset = self._slot(key)
+            _SLOT.pack_into(self._mmap, offset, _SLOT.unpack_from(self._mmap, offset)[0] + amount)
+
+    def inc_many(self, keys_and_amounts):
+        with self._lock:
+            for key, amount in keys_and_amounts:
+                offset = self._slot(key)
+                _SLOT.pack_into(self._mmap, offset, _SLOT.unpack_from(self._mmap, offset)[0] + amount)
+
+    def set(self, key, value):
+        with self._lock:
+            _SLOT.pack_into(self._mmap, self._slot(key), value)
+
+    def snapshot(self):
+        """
+        Reads every process's file in the directory. Returns [(pid, {key: value})].
+        """
+        snapshots = []
+        for keys_path in glob.glob(os.path.join(self.directory, 'metrics_*.keys')):
+            pid = int(os.path.basename(keys_path)[len('metrics_'):-len('.keys')])
+            db_path = keys_path[:-len('.keys')] + '.db'
+            try:
+                with open(db_path, 'rb') as f:
+                    data = f.read()
+                with open(keys_path) as f:
+                    key_lines = f.readlines()
+            except OSError:
+                continue
+            values = {}
+            for line in key_lines:
+                try:
+                    slot, key = json.loads(line)
+                except ValueError:
+                    continue  # a line still being written
+                key = (key[0], key[1], tuple(tuple(pair) for pair in key[2]))
+                values[key] = _SLOT.unpack_from(data, slot * _SLOT.size)[0]
+            snapshots.append((pid, values))
+        return snapshots
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _Child:
+    """
+    A metric bound to one set of label values.
+    """
+
+    def __init__(self, metric, labels):
+        self._metric = metric
+        self._labels = labels
+        self._key = (metric.name, '', labels)
+
+    def inc(self, amount=1.0):
+        self._metric._registry.store().inc(self._key, amount)
+
+    def dec(self, amount=1.0):
+        self._metric._registry.store().inc(self._key, -amount)
+
+    def set(self, value):
+        self._metric._registry.store().set(self._key, value)
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class _HistogramChild(_Child):
+
+    def __init__(self, metric, labels):
+        super().__init__(metric, labels)
+        self._bucket_keys = [(metric.name, '_bucket', labels + (('le', _format_le(le)),)) for le in metric.buckets]
+        self._sum_key = (metric.name, '_sum', labels)
+        self._count_key = (metric.name, '_count', labels)
+
+    def observe(self, value):
+        # Buckets are stored non-cumulatively and accumulated at exposition time
+        bucket_key = self._bucket_keys[bisect.bisect_left(self._metric.buckets, value)]
+        self._metric._registry.store().inc_many(((bucket_key, 1.0), (self._sum_key, value), (self._count_key, 1.0)))
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+def _format_le(le):
+    return '+Inf' if le == math.inf else repr(float(le))
+
+
+class _Metric:
+    child_class = _Child
+
+    def __init__(self, registry, kind, name, documentation, labelnames=()):
+        self._registry = registry
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._children_lock = threading.Lock()
+
+    def labels(self, *labelvalues):
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._children_lock:
+                child = self._children.setdefault(
+                    labelvalues,
+                    self.child_class(self, tuple(zip(self.labelnames, (str(v) for v in labelvalues)))))
+        return child
+
+
+class Counter(_Metric):
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        super().__init__(registry, 'counter', name, documentation, labelnames)
+
+
+class Gauge(_Metric):
+    """
+    multiprocess_mode decides how values from several processes combine: 'sum', 'max', or
+    'livesum' (sum over processes that are still running, e.g. for in-flight requests).
+    """
+
+    def __init__(self, registry, name, documentation, labelnames=(), multiprocess_mode='livesum'):
+        super().__init__(registry, 'gauge', name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+
+
+class Histogram(_Metric):
+    child_class = _HistogramChild
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(registry, 'histogram', name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+
+class MetricsRegistry:
+    """
+    Declares metrics and renders them. The value store is created lazily per process, so a
+    registry created before gunicorn forks its workers still gives each worker its own file.
+    """
+
+    def __init__(self, multiproc_dir=None):
+        self.multiproc_dir = multiproc_dir if multiproc_dir is not None else os.environ.get(MULTIPROC_DIR_ENV)
+        self._metrics = {}
+        self._store = None
+        self._store_pid = None
+        self._store_lock = threading.Lock()
+
+    def store(self):
+        if self._store_pid != os.getpid():
+            with self._store_lock:
+                if self._store_pid != os.getpid():
+                    self._store = _MmapStore(self.multiproc_dir) if self.multiproc_dir else _LocalStore()
+                    self._store_pid = os.getpid()
+        return self._store
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), multiprocess_mode='livesum'):
+        return self._register(Gauge(self, name, documentation, labelnames, multiprocess_mode))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _collect(self):
+        """
+        Combines all processes' samples into {key: value} according to each metric's type.
+        """
+        combined = {}
+        for pid, values in self.store().snapshot():
+            alive = None
+            for key, value in values.items():
+                metric = self._metrics.get(key[0])
+                if metric is None:
+                    continue
+                mode = getattr(metric, 'multiprocess_mode', 'sum')
+                if mode == 'livesum':
+                    if alive is None:
+                        alive = pid == os.getpid() or _pid_alive(pid)
+                    if not alive:
+                        continue
+                if mode == 'max':
+                    combined[key] = max(combined.get(key, value), value)
+                else:
+                    combined[key] = combined.get(key, 0.0) + value
+        return combined
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        samples = self._collect()
+        by_metric = {}
+        for key, value in samples.items():
+            by_metric.setdefault(key[0], []).append((key, value))
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            entries = sorted(by_metric.get(name, []), key=lambda item: (item[0][2], item[0][1]))
+            if metric.kind != 'histogram':
+                for (_, suffix, labels), value in entries:
+                    lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+                continue
+
+            # Turn stored per-bucket counts into cumulative buckets, per label set
+            series = {}
+            for (_, suffix, labels), value in entries:
+                if suffix == '_bucket':
+                    base_labels, le = labels[:-1], labels[-1][1]
+                    series.setdefault(base_labels, {'buckets': {}})['buckets'][le] = value
+                else:
+                    series.setdefault(labels, {'buckets': {}})[suffix] = value
+            for labels, data in series.items():
+                cumulative = 0.0
+                for le in metric.buckets:
+                    cumulative += data['buckets'].get(_format_le(le), 0.0)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_le(le)),))} {_format_value(cumulative)}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(data.get('_sum', 0.0))}")
+                lines.append(f"{name}_count{_format_labels(labels)} {_format_value(data.get('_count', 0.0))}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label_value(v)}"' for k, v in labels) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# --- Application Metrics ---
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter(
+    'prediction_requests_total', 'Prediction requests received.', ['endpoint', 'disease_type'])
+ERRORS = registry.counter(
+    'prediction_errors_total', 'Prediction requests that returned an error status.', ['endpoint', 'disease_type'])
+REQUEST_LATENCY = registry.histogram(
+    'prediction_request_seconds', 'End-to-end prediction request latency.', ['endpoint'])
+STAGE_LATENCY = registry.histogram(
+    'prediction_stage_seconds', 'Latency of each prediction pipeline stage.', ['disease_type', 'stage'])
+IN_FLIGHT = registry.gauge(
+    'prediction_requests_in_flight', 'Prediction requests currently being handled.', ['endpoint'])
+MODEL_LOAD_SECONDS = registry.gauge(
+    'model_load_seconds', 'Time taken by the most recent load of each model.', ['disease_type'], multiprocess_mode='max')
+MODEL_LOADS = registry.counter(
+    'model_loads_total', 'Successful model loads and hot reloads.', ['disease_type'])
+CACHE_LOOKUPS = registry.counter(
+    'prediction_cache_lookups_total', 'Prediction cache lookups by result.', ['disease_type', 'result'])
+CACHE_ENTRIES = registry.gauge(
+    'prediction_cache_entries', 'Entries currently held in the prediction cache.')
+MICROBATCH_SIZE = registry.histogram(
+    'prediction_microbatch_size', 'Rows per micro-batch scored for concurrent /predict requests.', ['disease_type'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+AUDIT_RECORDS = registry.counter(
+    'prediction_audit_records_total', 'Audit records written or failed per sink, or dropped from a full buffer.',
+    ['sink', 'outcome'])
+AUDIT_FLUSH_SECONDS = registry.histogram(
+    'prediction_audit_flush_seconds', 'Time taken to hand one batch of audit records to a sink.', ['sink'])
+# Admission gates are disease types, and stream:<disease type> for /predict/stream uploads
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    'prediction_admission_queue_depth', 'Requests waiting for an admission slot.', ['gate'])
+ADMISSION_SHED = registry.counter(
+    'prediction_admission_shed_total', 'Requests answered 503 by admission control, by reason.', ['gate', 'reason'])
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    'prediction_admission_wait_seconds', 'Time admitted requests waited before being worked on.', ['gate'])
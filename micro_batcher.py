@@ -0,0 +1,74 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Collects single items submitted by concurrent request threads and scores them together.
+
+    A background thread takes the first queued item, then keeps collecting until it has
+    max_batch_size items or max_wait_ms has passed since that first item, calls
+    score_fn(items) once for the whole batch and resolves every caller's Future with its result.
+    Under light load a request waits at most max_wait_ms extra; under heavy load the batch fills
+    up long before that and the per-call model overhead is shared by the whole batch.
+    """
+
+    def __init__(self, score_fn, max_batch_size=32, max_wait_ms=2.0, name='micro-batcher', on_batch=None):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000.0
+        self.name = name
+        self.on_batch = on_batch  # optional callback(batch_size), e.g. for metrics
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker_pid = None
+
+    def submit(self, item):
+        """
+        Queues one item and returns a Future that resolves to its score.
+        """
+        if self._worker_pid != os.getpid():
+            self._start_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _start_worker(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            threading.Thread(target=self._run, daemon=True, name=self.name).start()
+            self._worker_pid = os.getpid()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.score_fn(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            if self.on_batch is not None:
+                self.on_batch(len(batch))
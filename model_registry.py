@@ -0,0 +1,364 @@
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+import startup
+from feature_encoder import build_diabetes_encoder, build_heart_encoder
+
+# Define paths to model artifacts
+DIABETES_MODEL_PATH = 'model_artifacts/diabetes_rf_model_smote.joblib'
+DIABETES_SCALER_PATH = 'model_artifacts/diabetes_scaler.joblib'
+DIABETES_FEATURE_COLUMNS_PATH = 'model_artifacts/feature_columns.joblib'
+
+HEART_MODEL_PATH = 'model_artifacts/heart_disease_model.joblib'
+HEART_SCALER_PATH = 'model_artifacts/heart_disease_scaler.joblib'
+HEART_FEATURE_COLUMNS_PATH = 'model_artifacts/heart_disease_feature_columns.joblib'
+HEART_FOREST_PATH = 'model_artifacts/heart_disease_forest.joblib'
+# Encoder + classifier Pipeline written by train_heart_disease_model.py; preferred when present
+HEART_PIPELINE_PATH = 'model_artifacts/heart_disease_pipeline.joblib'
+# Training-data feature statistics for drift_monitor.py, also written by train_heart_disease_model.py
+HEART_REFERENCE_STATS_PATH = 'model_artifacts/heart_disease_reference_stats.json'
+
+DISEASE_ARTIFACTS = {
+    'diabetes': {
+        'label': 'Diabetes',
+        'model': DIABETES_MODEL_PATH,
+        'scaler': DIABETES_SCALER_PATH,
+        'feature_columns': DIABETES_FEATURE_COLUMNS_PATH,
+        'build_encoder': build_diabetes_encoder,
+    },
+    'heart_disease': {
+        'label': 'Heart Disease',
+        'model': HEART_MODEL_PATH,
+        'scaler': HEART_SCALER_PATH,
+        'feature_columns': HEART_FEATURE_COLUMNS_PATH,
+        'forest': HEART_FOREST_PATH,
+        'pipeline': HEART_PIPELINE_PATH,
+        'reference_stats': HEART_REFERENCE_STATS_PATH,
+        'build_encoder': build_heart_encoder,
+    },
+}
+
+# 'sklearn' serves the heart disease forest through scikit-learn, 'flat' through forest_engine.FlatForest
+HEART_INFERENCE_ENGINE = os.environ.get("HEART_INFERENCE_ENGINE", "sklearn")
+# With the flat engine, inputs larger than this still go to scikit-learn's compiled tree code
+FLAT_ENGINE_MAX_ROWS = int(os.environ.get("FLAT_ENGINE_MAX_ROWS", 256))
+# SLIM_RUNTIME=1 serves the heart disease model from its flat export alone (see forest_engine.export_forest):
+# scikit-learn is never imported, at the price of batches above FLAT_ENGINE_MAX_ROWS also running flat
+SLIM_RUNTIME = os.environ.get("SLIM_RUNTIME", "0") == "1"
+# Memory-map large arrays read from joblib files ('r'), or set to '' to read them into private memory
+ARTIFACT_MMAP_MODE = os.environ.get("ARTIFACT_MMAP_MODE", "r") or None
+# Check model_artifacts/ for new versions every this many seconds (0 disables the watcher)
+MODEL_RELOAD_POLL_SECONDS = float(os.environ.get("MODEL_RELOAD_POLL_SECONDS", 0))
+# Rows pushed through every freshly loaded model before it is allowed to serve
+WARMUP_ROWS = 32
+
+
+def artifact_version(paths):
+    """
+    Short fingerprint of a set of artifact files, derived from their names, sizes and mtimes.
+    Changes whenever any of the files is replaced.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+def current_rss_bytes():
+    """
+    Resident set size of this process, read from /proc where available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is the peak, in kilobytes on Linux; the best we can do without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelBundle:
+    """
+    Everything needed to serve one disease type: the model, its encoder and where they came from.
+    """
+
+    def __init__(self, disease_type, version, model, scaler, feature_columns, encoder, load_seconds, rss_delta_bytes,
+                 artifact_seconds=None):
+        self.disease_type = disease_type
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.feature_columns = feature_columns
+        self.encoder = encoder
+        self.load_seconds = load_seconds
+        self.rss_delta_bytes = rss_delta_bytes
+        # Seconds spent loading each artifact file (the first load also pays for importing scikit-learn)
+        self.artifact_seconds = artifact_seconds or {}
+        self._explainer = None
+        self._explainer_lock = threading.Lock()
+
+    def explainer(self):
+        """
+        The forest_engine.ForestExplainer for this model, built on first use.
+        Raises ValueError when the model is not a tree ensemble.
+        """
+        if self._explainer is None:
+            with self._explainer_lock:
+                if self._explainer is None:
+                    from forest_engine import ForestExplainer
+                    self._explainer = ForestExplainer.from_model(self.model, self.encoder.column_groups())
+        return self._explainer
+
+
+class ModelRegistry:
+    """
+    Loads each disease's artifacts on first use, once per process, behind a per-disease lock.
+    A worker that only ever sees heart disease requests never pays for the diabetes model.
+
+    New artifact versions are loaded, validated and warmed up off to the side and then swapped in
+    with a single dict assignment. Requests hold on to the bundle they started with, so in-flight
+    requests finish on the old version.
+    """
+
+    def __init__(self, artifacts=DISEASE_ARTIFACTS, mmap_mode=ARTIFACT_MMAP_MODE, poll_seconds=MODEL_RELOAD_POLL_SECONDS):
+        self.artifacts = artifacts
+        self.mmap_mode = mmap_mode
+        self.poll_seconds = poll_seconds
+        self._bundles = {}
+        self._errors = {}
+        self._locks = {disease_type: threading.Lock() for disease_type in artifacts}
+        self._reload_locks = {disease_type: threading.Lock() for disease_type in artifacts}
+        self._load_listeners = []
+        self._watcher_lock = threading.Lock()
+        self._watcher_pid = None
+
+    def add_load_listener(self, listener):
+        """
+        Registers listener(disease_type, bundle), called after every successful (re)load.
+        """
+        self._load_listeners.append(listener)
+
+    def label(self, disease_type):
+        return self.artifacts[disease_type]['label']
+
+    def get(self, disease_type):
+        """
+        Returns the ModelBundle for disease_type, loading it on first call, or None if its
+        artifacts are missing or failed to load.
+        """
+        if self.poll_seconds and self._watcher_pid != os.getpid():
+            self._start_watcher()
+        bundle = self._bundles.get(disease_type)
+        if bundle is not None or disease_type in self._errors:
+            return bundle
+        with self._locks[disease_type]:
+            # Another thread may have finished loading while we waited for the lock
+            if disease_type not in self._bundles and disease_type not in self._errors:
+                try:
+                    bundle = self._load(disease_type)
+                    self._bundles[disease_type] = bundle
+                    for listener in self._load_listeners:
+                        listener(disease_type, bundle)
+                except FileNotFoundError as e:
+                    self._errors[disease_type] = str(e)
+                    print(f"Warning: {e}")
+                except Exception as e:
+                    self._errors[disease_type] = str(e)
+                    print(f"Error loading {self.label(disease_type)} model artifacts: {e}")
+        return self._bundles.get(disease_type)
+
+    def reload(self, disease_type):
+        """
+        Loads, validates and warms up the current artifacts for disease_type, then swaps them in.
+        Returns the new bundle, or None if loading failed (the old version keeps serving).
+        """
+        with self._reload_locks[disease_type]:
+            old = self._bundles.get(disease_type)
+            try:
+                bundle = self._load(disease_type)
+            except Exception as e:
+                print(f"Reload of {self.label(disease_type)} model failed, still serving "
+                      f"{old.version if old else 'nothing'}: {e}")
+                return None
+            self._bundles[disease_type] = bundle
+            self._errors.pop(disease_type, None)
+            for listener in self._load_listeners:
+                listener(disease_type, bundle)
+            print(f"{self.label(disease_type)} model swapped: {old.version if old else 'none'} -> {bundle.version}")
+            return bundle
+
+    def reload_in_background(self, disease_type):
+        thread = threading.Thread(target=self.reload, args=(disease_type,), daemon=True,
+                                  name=f"model-reload-{disease_type}")
+        thread.start()
+        return thread
+
+    def artifact_paths(self, disease_type):
+        spec = self.artifacts[disease_type]
+        if spec.get('pipeline') and os.path.exists(spec['pipeline']):
+            return [spec['pipeline']]
+        return [spec['model'], spec['scaler'], spec['feature_columns']]
+
+    def current_version(self, disease_type):
+        bundle = self._bundles.get(disease_type)
+        return bundle.version if bundle is not None else None
+
+    def loaded_bundles(self):
+        """
+        The bundles loaded so far in this process, without loading any.
+        """
+        return list(self._bundles.values())
+
+    def _start_watcher(self):
+        """
+        Starts the artifact watcher thread for this process (threads do not survive a fork, so
+        every gunicorn worker starts its own on first use).
+        """
+        with self._watcher_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, daemon=True, name="model-artifact-watcher").start()
+
+    def _watch(self):
+        pending, failed = {}, {}
+        while True:
+            time.sleep(self.poll_seconds)
+            for disease_type in self.artifacts:
+                # Disease types nobody asked for stay unloaded
+                if disease_type not in self._bundles and disease_type not in self._errors:
+                    continue
+                try:
+                    version = artifact_version(self.artifact_paths(disease_type))
+                except OSError:
+                    continue
+                if version == self.current_version(disease_type) or version == failed.get(disease_type):
+                    pending.pop(disease_type, None)
+                elif pending.get(disease_type) == version:
+                    # Unchanged for a whole poll interval, so the copy has finished
+                    pending.pop(disease_type)
+                    if self.reload(disease_type) is None:
+                        # Do not retry a broken version until the files change again
+                        failed[disease_type] = version
+                else:
+                    pending[disease_type] = version
+
+    def _validate(self, bundle):
+        """
+        Checks that a freshly loaded model agrees with its feature columns and produces sane
+        probabilities, running a few rows through it so first requests do not pay for warm-up.
+        """
+        n_features = getattr(bundle.model, 'n_features_in_', None)
+        if n_features is not None and n_features != len(bundle.feature_columns):
+            raise ValueError(f"model expects {n_features} features but feature columns list {len(bundle.feature_columns)}")
+        warmup_block = bundle.encoder.encode_canonical_many([bundle.encoder.canonicalize({})] * WARMUP_ROWS)
+        for block in (warmup_block[:1], warmup_block):
+            probabilities = np.asarray(bundle.model.predict_proba(block))
+            if probabilities.shape != (len(block), 2) or not np.all((probabilities >= 0) & (probabilities <= 1)):
+                raise ValueError(f"warm-up predictions look wrong (shape {probabilities.shape})")
+
+    def _load(self, disease_type):
+        spec = self.artifacts[disease_type]
+        paths = self.artifact_paths(disease_type)
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"{self.label(disease_type)} model artifacts not found. Expected at: {', '.join(paths)}")
+
+        # joblib (and, through the pickled models, scikit-learn) is only imported once a model is
+        # needed, so the app itself starts and serves non-prediction routes without paying for it
+        with startup.step('joblib'):
+            import joblib
+
+        version = artifact_version(paths)
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        artifact_seconds = {}
+
+        def timed_load(path, **kwargs):
+            load_start = time.perf_counter()
+            obj = joblib.load(path, **kwargs)
+            artifact_seconds[path] = time.perf_counter() - load_start
+            return obj
+
+        if spec.get('forest') and SLIM_RUNTIME and len(paths) > 1:
+            from forest_engine import HybridForest, load_slim_parts
+
+            parts = load_slim_parts(spec['model'], spec['forest'], spec['scaler'], spec['feature_columns'],
+                                    mmap_mode=self.mmap_mode)
+            artifact_seconds[spec['forest']] = time.perf_counter() - start
+            if parts is not None:
+                forest, feature_columns, scaler = parts
+                return self._finish_load(disease_type, version, HybridForest(forest, None), scaler, feature_columns,
+                                         spec['build_encoder'](feature_columns, scaler), start, rss_before,
+                                         artifact_seconds, 'flat forest export (slim runtime)')
+            print(f"Warning: {spec['forest']} missing, stale or without serving columns; "
+                  f"loading the full {self.label(disease_type)} artifacts.")
+
+        if len(paths) == 1:
+            # A fused pipeline: its fitted RecordEncoder carries the feature columns and scaler
+            pipeline = timed_load(paths[0], mmap_mode=self.mmap_mode)
+            record_encoder, model = pipeline.steps[0][1], pipeline.steps[-1][1]
+            scaler, feature_columns = record_encoder.scaler_, record_encoder.feature_columns_
+            encoder = record_encoder.encoder_
+        else:
+            model = timed_load(spec['model'], mmap_mode=self.mmap_mode)
+            scaler = timed_load(spec['scaler'])
+            feature_columns = timed_load(spec['feature_columns'])
+            encoder = spec['build_encoder'](feature_columns, scaler)
+
+        if spec.get('forest') and HEART_INFERENCE_ENGINE == 'flat':
+            from forest_engine import FlatForest, HybridForest, load_exported_forest
+
+            # Use the exported arrays unless they were flattened from a different model file
+            load_start = time.perf_counter()
+            forest = load_exported_forest(paths[0], spec['forest'], mmap_mode=self.mmap_mode)
+            if forest is None:
+                print(f"Warning: {spec['forest']} missing or stale, flattening the {self.label(disease_type)} model in memory.")
+                forest = FlatForest.from_model(model)
+            model = HybridForest(forest, model, max_flat_rows=FLAT_ENGINE_MAX_ROWS)
+            artifact_seconds[spec['forest']] = time.perf_counter() - load_start
+
+        loaded = 'pipeline' if len(paths) == 1 else 'Model, Scaler, and Feature Columns'
+        return self._finish_load(disease_type, version, model, scaler, feature_columns, encoder, start, rss_before,
+                                 artifact_seconds, loaded)
+
+    def _finish_load(self, disease_type, version, model, scaler, feature_columns, encoder, start, rss_before,
+                     artifact_seconds, loaded):
+        bundle = ModelBundle(disease_type, version, model, scaler, feature_columns, encoder,
+                             load_seconds=0.0, rss_delta_bytes=0, artifact_seconds=artifact_seconds)
+        self._validate(bundle)
+        bundle.load_seconds = time.perf_counter() - start
+        bundle.rss_delta_bytes = current_rss_bytes() - rss_before
+        print(f"{self.label(disease_type)} {loaded} loaded in "
+              f"{bundle.load_seconds * 1000:.1f} ms (+{bundle.rss_delta_bytes / 2**20:.1f} MiB RSS).")
+        return bundle
+
+    def preload(self, disease_types=None):
+        """
+        Eagerly loads the given disease types (all by default) and prints a load report.
+        """
+        for disease_type in disease_types or self.artifacts:
+            self.get(disease_type)
+        for line in self.report():
+            print(line)
+
+    def report(self):
+        """
+        One line per disease type with its load time and resident memory cost, or its load error.
+        """
+        lines = [f"Model load report (pid {os.getpid()}, RSS {current_rss_bytes() / 2**20:.1f} MiB):"]
+        for disease_type in self.artifacts:
+            bundle = self._bundles.get(disease_type)
+            if bundle is not None:
+                lines.append(f"  {disease_type}: version {bundle.version}, {bundle.load_seconds * 1000:.1f} ms, "
+                             f"+{bundle.rss_delta_bytes / 2**20:.1f} MiB RSS")
+            elif disease_type in self._errors:
+                lines.append(f"  {disease_type}: not available ({self._errors[disease_type]})")
+            else:
+                lines.append(f"  {disease_type}: not loaded yet")
+        return lines
@@ -0,0 +1,145 @@
+"""
+Local overload test for admission control: does goodput hold steady past saturation?
+
+Starts the app under each --config (by default one gthread worker with admission control off, then
+on), measures roughly how many requests per second it can serve, and then offers open-loop
+/predict traffic at multiples of that capacity. For every step it reports goodput (successful
+responses within --slo-ms, per second), the share shed with 503 and the latency of the successful
+responses. Without admission control, goodput collapses once the backlog grows, as every request
+waits behind all the earlier ones; with it, the excess is shed quickly and the requests that are
+admitted still finish within the SLO. Exits non-zero when a configuration with admission control
+keeps less than --min-goodput of its best goodput at the highest load.
+
+Usage:
+    python overload_test.py
+    python overload_test.py --loads 0.5 1 2 4 --duration 20 --slo-ms 500
+    python overload_test.py --config "ADMISSION_QUEUE_MS=200 uvicorn --workers 1"
+"""
+import argparse
+import http.client
+import json
+import sys
+import time
+import urllib.parse
+
+from load_test import (OpenLoopClient, build_bodies, parse_config, parse_mix, percentile, start_server,
+                       usable_mix)
+
+DEFAULT_CONFIGS = [
+    "ADMISSION_CONCURRENCY=0 gunicorn -w 1 -k gthread --threads 16",
+    "gunicorn -w 1 -k gthread --threads 16",
+]
+DEFAULT_LOADS = [0.5, 1.0, 1.5, 2.0, 3.0]
+
+
+def measure_capacity(base_url, bodies, seconds=3.0):
+    """
+    Requests per second served back to back from one connection: about the capacity of a worker
+    that has the machine to itself.
+    """
+    url = urllib.parse.urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    served, start = 0, time.perf_counter()
+    try:
+        while time.perf_counter() - start < seconds:
+            _, body = bodies[served % len(bodies)]
+            connection.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+            connection.getresponse().read()
+            served += 1
+    finally:
+        connection.close()
+    return served / (time.perf_counter() - start)
+
+
+def summarize_step(results, rate, duration, slo_ms):
+    ok = sorted(latency for _, latency, _, _, outcome in results if outcome == 200)
+    good = sum(1 for latency in ok if latency * 1000 <= slo_ms)
+    shed = sum(1 for _, _, _, _, outcome in results if outcome == 503)
+    total = len(results) or 1
+    return {
+        'offered_rps': rate,
+        'goodput_rps': good / duration,
+        'served_rps': len(ok) / duration,
+        'shed_rate': shed / total,
+        'failed_rate': (total - len(ok) - shed) / total,  # timeouts, connection errors, other statuses
+        'p50_ms': percentile(ok, 50) * 1000 if ok else None,
+        'p99_ms': percentile(ok, 99) * 1000 if ok else None,
+    }
+
+
+def run_config(base_url, rates, args, bodies):
+    client = OpenLoopClient(base_url, args.client_threads, args.timeout)
+    steps = []
+    try:
+        for i, rate in enumerate(rates):
+            step = summarize_step(client.run(rate, args.duration, bodies, 'poisson', args.seed + i),
+                                  rate, args.duration, args.slo_ms)
+            steps.append(step)
+            print(f"  {rate:7.1f}/s offered  goodput {step['goodput_rps']:7.1f}/s  served {step['served_rps']:7.1f}/s  "
+                  f"shed {step['shed_rate']:6.1%}  failed {step['failed_rate']:6.1%}  "
+                  f"p50 {step['p50_ms'] or float('nan'):8.1f} ms  p99 {step['p99_ms'] or float('nan'):8.1f} ms")
+            # Let the backlog of the previous step drain before the next one
+            time.sleep(args.cooldown)
+    finally:
+        client.close()
+    return steps
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offer /predict traffic past saturation and report goodput.")
+    parser.add_argument('--config', action='append', help="Server command line (repeatable), as for load_test.py")
+    parser.add_argument('--port', type=int, default=18767)
+    parser.add_argument('--capacity', type=float, help="Requests per second one configuration can serve "
+                                                       "(default: measured on the first configuration)")
+    parser.add_argument('--loads', type=float, nargs='+', default=DEFAULT_LOADS, help="Offered load, as multiples of capacity")
+    parser.add_argument('--duration', type=float, default=15, help="Seconds per step")
+    parser.add_argument('--cooldown', type=float, default=5, help="Idle seconds between steps")
+    parser.add_argument('--mix', default='heart_disease=0.7,diabetes=0.3', help="Disease types and their weights")
+    parser.add_argument('--payloads', type=int, default=20000)
+    parser.add_argument('--slo-ms', type=float, default=1000, help="Latency within which a response counts as goodput")
+    parser.add_argument('--min-goodput', type=float, default=0.8,
+                        help="Share of its best goodput a config with admission control must keep at the highest load")
+    parser.add_argument('--client-threads', type=int, default=512)
+    parser.add_argument('--timeout', type=float, default=10, help="Per-request and server start-up timeout, in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the full results as JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    bodies = build_bodies(mix, args.payloads, args.seed, 0.1)
+    report = {'loads': args.loads, 'slo_ms': args.slo_ms, 'configs': {}}
+    capacity = args.capacity
+    failed = []
+    for config in args.config or DEFAULT_CONFIGS:
+        print(f"{config}:")
+        process = start_server(config, args.port, args.timeout)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            kept = usable_mix(base_url, mix, bodies, args.timeout)
+            if not kept:
+                raise RuntimeError("the server could not score any disease type in the mix")
+            config_bodies = [(kind, body) for kind, body in bodies if kind in kept]
+            if capacity is None:
+                capacity = measure_capacity(base_url, config_bodies)
+                report['capacity_rps'] = capacity
+                print(f"  capacity about {capacity:.1f} req/s")
+            steps = run_config(base_url, [round(capacity * load, 1) for load in args.loads], args, config_bodies)
+            report['configs'][config] = steps
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        env, _, _ = parse_config(config)
+        best = max(step['goodput_rps'] for step in steps)
+        kept_share = steps[-1]['goodput_rps'] / best if best else 0.0
+        print(f"  goodput at {args.loads[-1]}x capacity: {kept_share:.0%} of its best")
+        if env.get('ADMISSION_CONCURRENCY', '1') != '0' and kept_share < args.min_goodput:
+            failed.append(config)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if failed:
+        print(f"FAIL: goodput fell below {args.min_goodput:.0%} of its best under overload: {', '.join(failed)}")
+        sys.exit(1)
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Bounded in-process LRU cache of positive-class probabilities, with an optional TTL.
+
+    Keys are (disease_type, model_version, canonical input) tuples, where the canonical input comes
+    from FeatureEncoder.canonicalize, so key order, numeric strings vs numbers and the 'hd_' prefix
+    do not split otherwise identical requests. Including the model version in the key means an
+    artifact change can never serve a stale probability; `discard` frees a reloaded model's old
+    entries without touching those of other disease types.
+    """
+
+    def __init__(self, max_size=4096, ttl_seconds=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds or None
+        self._entries = OrderedDict()  # key -> (probability, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get(self, key):
+        """
+        Returns the cached probability for key, or None on a miss (including expired entries).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self.ttl_seconds is not None and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, probability):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (probability, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def discard(self, disease_type, keep_version=None):
+        """
+        Drops the entries for disease_type, except those of keep_version. Returns how many were dropped.
+        """
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == disease_type and key[1] != keep_version]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,114 @@
+"""
+Reports the memory each gunicorn worker really costs, using the proportional set size (PSS) from
+/proc/<pid>/smaps_rollup (Linux 4.14+). RSS counts shared pages in full in every process; PSS
+splits them between the processes sharing them, so PSS adds up to the real total.
+
+Usage:
+    python pss_report.py --master 1234 --box-mib 512 1024 2048
+    python pss_report.py --pids 1235 1236 --json
+"""
+import argparse
+import json
+import os
+
+FIELDS = ['Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty', 'Swap']
+
+
+def read_smaps_rollup(pid):
+    """
+    Returns the smaps_rollup fields for pid, in bytes.
+    """
+    usage = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(':') in FIELDS:
+                usage[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return usage
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, so split after its closing parenthesis
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def collect(master=None, pids=()):
+    """
+    Returns one row per process (the master first, if given) with its role and memory usage.
+    """
+    rows = []
+    if master is not None:
+        rows.append({'pid': master, 'role': 'master', **read_smaps_rollup(master)})
+        pids = list(pids) + child_pids(master)
+    for pid in pids:
+        rows.append({'pid': pid, 'role': 'worker', **read_smaps_rollup(pid)})
+    return rows
+
+
+def summarize(rows, box_sizes_mib=()):
+    """
+    Totals RSS and PSS over all processes, and estimates how many workers fit in each box size.
+    A worker's marginal cost is its private memory; everything shared is paid once.
+    """
+    workers = [row for row in rows if row['role'] == 'worker']
+    total_rss = sum(row['Rss'] for row in rows)
+    total_pss = sum(row['Pss'] for row in rows)
+    private = [row['Private_Clean'] + row['Private_Dirty'] for row in workers]
+    per_worker = max(private) if private else 0
+    shared = total_pss - sum(private)
+    summary = {
+        'processes': len(rows),
+        'workers': len(workers),
+        'total_rss_bytes': total_rss,
+        'total_pss_bytes': total_pss,
+        'shared_bytes': shared,
+        'worker_private_bytes_max': per_worker,
+        'saved_vs_rss_bytes': total_rss - total_pss,
+        'workers_per_box': {},
+    }
+    for box_mib in box_sizes_mib:
+        fits = int((box_mib * 2**20 - shared) // per_worker) if per_worker else 0
+        summary['workers_per_box'][str(box_mib)] = max(0, fits)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Report per-worker proportional set size (PSS).")
+    parser.add_argument('--master', type=int, help="Gunicorn master pid; its children are reported as workers")
+    parser.add_argument('--pids', type=int, nargs='*', default=[], help="Extra worker pids to report")
+    parser.add_argument('--box-mib', type=int, nargs='*', default=[512, 1024, 2048],
+                        help="Memory sizes to estimate worker counts for")
+    parser.add_argument('--json', action='store_true', help="Print machine-readable JSON")
+    args = parser.parse_args()
+    if args.master is None and not args.pids:
+        parser.error("give --master or --pids")
+
+    rows = collect(args.master, args.pids)
+    summary = summarize(rows, args.box_mib)
+    if args.json:
+        print(json.dumps({'processes': rows, 'summary': summary}, indent=2))
+    else:
+        mib = 2**20
+        print(f"{'pid':>8} {'role':<7} {'RSS':>9} {'PSS':>9} {'shared':>9} {'private':>9}  (MiB)")
+        for row in rows:
+            shared = row['Shared_Clean'] + row['Shared_Dirty']
+            private = row['Private_Clean'] + row['Private_Dirty']
+            print(f"{row['pid']:>8} {row['role']:<7} {row['Rss'] / mib:9.1f} {row['Pss'] / mib:9.1f} "
+                  f"{shared / mib:9.1f} {private / mib:9.1f}")
+        print(f"Total RSS {summary['total_rss_bytes'] / mib:.1f} MiB, total PSS {summary['total_pss_bytes'] / mib:.1f} MiB "
+              f"({summary['saved_vs_rss_bytes'] / mib:.1f} MiB shared between processes)")
+        print(f"Shared memory paid once: {summary['shared_bytes'] / mib:.1f} MiB; "
+              f"marginal cost per worker: {summary['worker_private_bytes_max'] / mib:.1f} MiB")
+        for box_mib, fits in summary['workers_per_box'].items():
+            print(f"  {box_mib} MiB box: up to {fits} workers")
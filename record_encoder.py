@@ -0,0 +1,76 @@
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from feature_encoder import HD_CATEGORICAL_COLUMNS, HD_FORM_CODES, HD_NUMERICAL_FEATURES, FeatureEncoder
+
+
+class RecordEncoder(BaseEstimator, TransformerMixin):
+    """
+    scikit-learn transformer from raw patient records to the scaled feature block, fit at training
+    time and saved as the first step of the model's Pipeline, so serving runs exactly the encoding
+    and scaling training used.
+
+    fit() learns the one-hot columns (named like pandas.get_dummies would, e.g. 'cp_4.0') and a
+    StandardScaler for the numerical columns from a DataFrame of dataset columns. transform()
+    accepts that kind of DataFrame or a list of request dicts and goes through a FeatureEncoder.
+    Dataset-style keys ('cp') take dataset codes; key_prefix keys ('hd_cp') take the form's codes,
+    translated with form_codes.
+    """
+
+    def __init__(self, numerical_columns=tuple(HD_NUMERICAL_FEATURES), categorical_columns=tuple(HD_CATEGORICAL_COLUMNS),
+                 key_prefix='hd_', form_codes=None):
+        self.numerical_columns = numerical_columns
+        self.categorical_columns = categorical_columns
+        self.key_prefix = key_prefix
+        self.form_codes = form_codes
+
+    def fit(self, X, y=None):
+        import pandas as pd
+        from sklearn.preprocessing import StandardScaler
+
+        df = X if isinstance(X, pd.DataFrame) else pd.DataFrame(list(X))
+        numerical = list(self.numerical_columns)
+        self.categories_ = {col: sorted(float(v) for v in df[col].dropna().unique()) for col in self.categorical_columns}
+        self.feature_columns_ = numerical + [f"{col}_{value}" for col, values in self.categories_.items() for value in values]
+        self.scaler_ = StandardScaler().fit(df[numerical].astype(np.float64))
+        self.encoder_ = self._build_encoder()
+        return self
+
+    def _build_encoder(self):
+        form_codes = HD_FORM_CODES if self.form_codes is None else self.form_codes
+        categorical_inputs = []
+        for col, values in self.categories_.items():
+            columns = {value: f"{col}_{value}" for value in values}
+            categorical_inputs.append((col, columns, float))
+            if self.key_prefix:
+                codes = form_codes.get(col)
+                form_map = ({code: columns[float(value)] for code, value in codes.items() if float(value) in columns}
+                            if codes is not None else {int(value): column for value, column in columns.items()})
+                categorical_inputs.append((f"{self.key_prefix}{col}", form_map, int, False))
+        return FeatureEncoder(
+            self.feature_columns_,
+            numerical_inputs=[(f"{self.key_prefix}{col}", col) for col in self.numerical_columns],
+            categorical_inputs=categorical_inputs,
+            scaler=self.scaler_,
+            key_prefix=self.key_prefix,
+        )
+
+    def transform(self, X):
+        records = X.to_dict('records') if hasattr(X, 'to_dict') else list(X)
+        block, _, errors = self.encoder_.encode_many(records)
+        if errors:
+            index, message = errors[0]
+            raise ValueError(f"record {index}: {message}")
+        return block
+
+    def __getstate__(self):
+        # The FeatureEncoder holds closures, which do not pickle; it is rebuilt on load. The state
+        # can be the instance's own __dict__, so copy it before dropping the encoder
+        state = dict(super().__getstate__())
+        state.pop('encoder_', None)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if hasattr(self, 'categories_'):
+            self.encoder_ = self._build_encoder()
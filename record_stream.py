@@ -0,0 +1,174 @@
+import csv
+import json
+
+# Column layout of cleveland.csv, whose header row is just the positions 0..13
+CLEVELAND_COLUMNS = ['age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg', 'thalach', 'exang',
+                     'oldpeak', 'slope', 'ca', 'thal', 'target']
+
+# Read uploads in blocks of this many bytes, so memory does not depend on the upload size
+DEFAULT_READ_SIZE = 64 * 1024
+# Longest line kept, in bytes; longer ones are discarded up to the next newline and reported
+MAX_LINE_BYTES = 1024 * 1024
+LINE_TOO_LONG_ERROR = f"row is longer than {MAX_LINE_BYTES} bytes"
+# What iter_lines() decodes undecodable bytes to; rows containing it are reported as errors
+REPLACEMENT_CHARACTER = '\ufffd'
+INVALID_TEXT_ERROR = "row is not valid UTF-8 text"
+
+
+class OversizedLine(str):
+    """
+    Yielded by iter_lines() in place of a line longer than its max_line_bytes (an empty string,
+    as its bytes were discarded); the record iterators report it as a row error.
+    """
+
+
+def _decode(line, encoding):
+    return line.rstrip(b'\r').decode(encoding, errors='replace')
+
+
+def iter_lines(stream, read_size=DEFAULT_READ_SIZE, encoding='utf-8', max_line_bytes=MAX_LINE_BYTES):
+    """
+    Yields decoded text lines from a binary file-like object, reading it in fixed-size blocks.
+    Each block is scanned once and a partial line is kept as a list of pieces, so time stays
+    linear and memory bounded by max_line_bytes however long a line gets; a longer line is
+    skipped up to the next newline and yields an OversizedLine. Undecodable bytes become
+    REPLACEMENT_CHARACTER rather than raising, so one bad byte fails its row, not the whole upload
+    (a newline byte never occurs inside a UTF-8 sequence, so each line decodes on its own).
+    """
+    parts, size, skipping = [], 0, False
+    while True:
+        block = stream.read(read_size)
+        if not block:
+            break
+        start = 0
+        while True:
+            end = block.find(b'\n', start)
+            if end < 0:
+                break
+            if skipping:
+                skipping = False
+            elif size + end - start > max_line_bytes:
+                yield OversizedLine()
+            else:
+                parts.append(block[start:end])
+                yield _decode(b''.join(parts), encoding)
+            parts, size = [], 0
+            start = end + 1
+        if start < len(block) and not skipping:
+            size += len(block) - start
+            if size > max_line_bytes:
+                parts, size, skipping = [], 0, True
+                yield OversizedLine()
+            else:
+                parts.append(block[start:])
+    if parts and not skipping:
+        remainder = b''.join(parts)
+        if remainder.strip():
+            yield _decode(remainder, encoding)
+
+
+def normalize_header(header):
+    """
+    Maps a CSV header onto request keys. A header of bare positions (like cleveland.csv's
+    '0,1,...,13') is read as the Cleveland column layout; anything else is used as-is.
+    """
+    header = [name.strip() for name in header]
+    if header and all(name.isdigit() and int(name) < len(CLEVELAND_COLUMNS) for name in header):
+        return [CLEVELAND_COLUMNS[int(name)] for name in header]
+    return header
+
+
+def coerce_value(value):
+    """
+    CSV cells arrive as text; numbers are turned into floats so they encode like JSON numbers
+    ('1.0' must work for integer categories). Everything else (e.g. 'Female', '?') is kept as text.
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def iter_csv_records(lines):
+    """
+    Yields (row_number, record, error) for every data row of a CSV with a header row.
+    Exactly one of record and error is set; malformed rows (e.g. an unterminated quoted field
+    running past the field size limit) are reported as errors and reading goes on after them.
+    """
+    oversized = []
+
+    def note_oversized(lines):
+        # csv.reader sees an OversizedLine as an empty row; remember which empty rows it was
+        for line in lines:
+            if isinstance(line, OversizedLine):
+                oversized.append(line)
+            yield line
+
+    reader = csv.reader(note_oversized(lines))
+    header = None
+    row_number = 0
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            break
+        except csv.Error as e:
+            yield row_number, None, f"malformed CSV: {e}"
+            row_number += 1
+            continue
+        if not row or not any(cell.strip() for cell in row):
+            if oversized:
+                oversized.pop()
+                yield row_number, None, LINE_TOO_LONG_ERROR
+                row_number += 1
+            continue
+        if header is None:
+            header = normalize_header(row)
+            continue
+        if any(REPLACEMENT_CHARACTER in cell for cell in row):
+            yield row_number, None, INVALID_TEXT_ERROR
+        elif len(row) != len(header):
+            yield row_number, None, f"expected {len(header)} fields, got {len(row)}"
+        else:
+            yield row_number, {key: coerce_value(cell.strip()) for key, cell in zip(header, row)}, None
+        row_number += 1
+
+
+def iter_ndjson_records(lines):
+    """
+    Yields (row_number, record, error) for every non-empty line of an NDJSON stream.
+    """
+    row_number = 0
+    for line in lines:
+        if isinstance(line, OversizedLine):
+            yield row_number, None, LINE_TOO_LONG_ERROR
+            row_number += 1
+            continue
+        if not line.strip():
+            continue
+        if REPLACEMENT_CHARACTER in line:
+            yield row_number, None, INVALID_TEXT_ERROR
+            row_number += 1
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("record must be a JSON object")
+            yield row_number, record, None
+        except ValueError as e:
+            yield row_number, None, str(e)
+        row_number += 1
+
+
+def iter_chunks(items, chunk_size):
+    """
+    Groups an iterable into lists of at most chunk_size items.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,91 @@
+"""
+Startup timing for the prediction app.
+
+Records how long each import phase of app.py took, when the process started (from /proc, so the
+interpreter's own start-up and the server's boot are included), and when the first prediction was
+answered. Heavy libraries (joblib, scikit-learn, pandas) are only imported once a model is needed;
+report() says which of them this process has paid for so far. Served by /startup in app.py.
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Modules kept off the import path of app.py; listed in the report so a regression shows up
+DEFERRED_MODULES = ('joblib', 'sklearn', 'pandas', 'scipy')
+
+_steps = {}  # name -> seconds, in the order they were first recorded
+_lock = threading.Lock()
+_first_prediction = None  # (wall-clock time, seconds since process start)
+
+
+def process_start_time():
+    """
+    Wall-clock time this process was started, or None where /proc is not available.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # The command name (field 2) may contain spaces; start time is field 22, in clock ticks since boot
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return boot_time + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+PROCESS_START = process_start_time() or time.time()
+
+
+def record(name, seconds):
+    """
+    Records one startup step; only the first measurement of a name is kept.
+    """
+    with _lock:
+        _steps.setdefault(name, seconds)
+
+
+@contextmanager
+def step(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def seconds_since_start():
+    return time.time() - PROCESS_START
+
+
+def mark_first_prediction():
+    global _first_prediction
+    if _first_prediction is None:
+        with _lock:
+            if _first_prediction is None:
+                _first_prediction = (time.time(), seconds_since_start())
+
+
+def report(bundles=()):
+    """
+    Startup breakdown: import steps, per-artifact load times of the given ModelBundles, which
+    deferred modules have been imported, and the time from process start to the first prediction.
+    """
+    with _lock:
+        steps = {name: round(seconds * 1000, 2) for name, seconds in _steps.items()}
+    return {
+        "pid": os.getpid(),
+        "uptime_seconds": round(seconds_since_start(), 3),
+        "import_ms": steps,
+        "deferred_modules_loaded": {name: name in sys.modules for name in DEFERRED_MODULES},
+        "models": {
+            bundle.disease_type: {
+                "version": bundle.version,
+                "load_ms": round(bundle.load_seconds * 1000, 2),
+                "artifact_ms": {path: round(seconds * 1000, 2) for path, seconds in bundle.artifact_seconds.items()},
+            }
+            for bundle in bundles
+        },
+        "first_prediction_after_ms": round(_first_prediction[1] * 1000, 2) if _first_prediction else None,
+    }
@@ -0,0 +1,88 @@
+"""
+Synthetic /predict request bodies for benchmarks and load tests, built offline.
+
+Heart disease payloads are whole rows sampled from cleveland.csv, so feature combinations follow
+the real joint distribution; optional jitter perturbs the numerical fields so repeated draws do
+not all hit the prediction cache. Diabetes payloads are synthesized around the diabetes scaler's
+fitted mean and standard deviation, with categorical fields drawn uniformly.
+"""
+import random
+
+from feature_encoder import HD_FORM_CODES
+from record_stream import CLEVELAND_COLUMNS, iter_csv_records, iter_lines
+
+# Numerical heart disease fields and the number of decimals the form sends them with
+HD_NUMERICAL_PRECISION = {'age': 0, 'trestbps': 0, 'chol': 0, 'thalach': 0, 'oldpeak': 1}
+# cleveland.csv code -> form code, for the fields the form codes differently
+HD_DATASET_TO_FORM = {col: {dataset: form for form, dataset in codes.items()} for col, codes in HD_FORM_CODES.items()}
+
+
+def cleveland_rows(csv_path='cleveland.csv'):
+    """
+    The complete rows of cleveland.csv, as dicts of floats.
+    """
+    with open(csv_path, 'rb') as f:
+        rows = [record for _, record, error in iter_csv_records(iter_lines(f)) if error is None]
+    return [row for row in rows if all(isinstance(row[col], float) for col in CLEVELAND_COLUMNS[:-1])]
+
+
+def heart_disease_payloads(n, seed=0, csv_path='cleveland.csv', form_codes=False, jitter=0.0):
+    """
+    Samples n /predict payloads (hd_-prefixed, as sent by static/script.js) from cleveland.csv rows.
+    form_codes=True sends fields the way the form does (integers, with categorical fields in the
+    form's codes: cp 0-3, thal 1-3, ...) rather than as the dataset's float values. jitter adds
+    Gaussian noise of that many standard deviations to the numerical fields, clipped to the range
+    seen in the data.
+    """
+    rows = cleveland_rows(csv_path)
+    rng = random.Random(seed)
+    spread = {}
+    for col in HD_NUMERICAL_PRECISION:
+        values = [row[col] for row in rows]
+        mean = sum(values) / len(values)
+        std = (sum((v - mean) ** 2 for v in values) / len(values)) ** 0.5
+        spread[col] = (std, min(values), max(values))
+
+    payloads = []
+    for _ in range(n):
+        row = rng.choice(rows)
+        payload = {}
+        for col in CLEVELAND_COLUMNS[:-1]:
+            value = row[col]
+            if col in HD_NUMERICAL_PRECISION:
+                if jitter:
+                    std, low, high = spread[col]
+                    value = round(min(high, max(low, rng.gauss(value, jitter * std))), HD_NUMERICAL_PRECISION[col])
+                if form_codes and HD_NUMERICAL_PRECISION[col] == 0:
+                    value = int(value)
+            elif form_codes:
+                value = HD_DATASET_TO_FORM.get(col, {}).get(int(value), int(value))
+            payload[f"hd_{col}"] = value
+        payload['disease_type'] = 'heart_disease'
+        payloads.append(payload)
+    return payloads
+
+
+def diabetes_payloads(n, seed=0, scaler=None):
+    """
+    Synthesizes n diabetes /predict payloads. Numerical fields are drawn around the scaler's fitted
+    mean and standard deviation when available, categorical fields uniformly.
+    """
+    rng = random.Random(seed)
+    mean = {'age': 42.0, 'bmi': 27.3, 'HbA1c_level': 5.5, 'blood_glucose_level': 138.0}
+    std = {'age': 22.0, 'bmi': 6.6, 'HbA1c_level': 1.1, 'blood_glucose_level': 40.0}
+    if scaler is not None and hasattr(scaler, 'feature_names_in_'):
+        for name, m, s in zip(scaler.feature_names_in_, scaler.mean_, scaler.scale_):
+            mean[name], std[name] = float(m), float(s)
+    payloads = []
+    for _ in range(n):
+        payload = {name: round(max(0.0, rng.gauss(mean[name], std[name])), 1) for name in mean}
+        payload.update({
+            'disease_type': 'diabetes',
+            'hypertension': rng.randint(0, 1),
+            'heart_disease': rng.randint(0, 1),
+            'gender': rng.choice(['Female', 'Male', 'Other']),
+            'smoking_history': rng.choice(['never', 'No Info', 'current', 'ever', 'former', 'not current']),
+        })
+        payloads.append(payload)
+    return payloads
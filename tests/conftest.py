@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def repo_root():
+    """
+    Runs the tests from the repository root, which artifact and dataset paths are relative to.
+    """
+    os.chdir(ROOT)
+    return ROOT
+
+
+@pytest.fixture(scope='session')
+def app_module(repo_root):
+    """
+    The Flask app module, imported from the repository root with the audit log and the
+    history database off so tests leave no files behind.
+    """
+    os.environ.setdefault("AUDIT_LOG", "0")
+    os.environ.setdefault("HISTORY_DB", "")
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,21 @@
+import pytest
+
+from admission import DISABLED_RETRY_AFTER, AdmissionController, Overloaded
+
+
+def test_zero_limit_sheds_with_fixed_retry_after():
+    controller = AdmissionController(4, 250, limits={'diabetes': 0})
+    with pytest.raises(Overloaded) as excinfo:
+        controller.acquire('diabetes')
+    assert excinfo.value.reason == 'disabled'
+    assert excinfo.value.retry_after == DISABLED_RETRY_AFTER
+    controller.release('heart_disease', controller.acquire('heart_disease'))
+
+
+def test_full_gate_sheds_without_touching_other_keys():
+    controller = AdmissionController(1, 250, max_queue=0)
+    taken = controller.acquire('stream:heart_disease')
+    with pytest.raises(Overloaded):
+        controller.acquire('stream:heart_disease')
+    controller.release('heart_disease', controller.acquire('heart_disease'))
+    controller.release('stream:heart_disease', taken)
@@ -0,0 +1,77 @@
+import json
+
+
+HEART_RECORD = {'hd_age': 63, 'hd_sex': 1, 'hd_cp': 3, 'hd_trestbps': 145, 'hd_chol': 233, 'hd_fbs': 1,
+                'hd_restecg': 0, 'hd_thalach': 150, 'hd_exang': 0, 'hd_oldpeak': 2.3, 'hd_slope': 0,
+                'hd_ca': 0, 'hd_thal': 1}
+
+
+def test_open_streams_do_not_take_prediction_slots(app_module, client):
+    admission, gate = app_module.admission, f"{app_module.STREAM_GATE_PREFIX}heart_disease"
+    # Uploads still being read hold every slot of the stream gate
+    held = [admission.acquire(gate) for _ in range(app_module.STREAM_CONCURRENCY)]
+    try:
+        shed = client.post('/predict/stream?disease_type=heart_disease&format=ndjson', data=b'')
+        assert shed.status_code == 503
+        assert 'Retry-After' in shed.headers
+        assert client.post('/predict', json={'disease_type': 'heart_disease', **HEART_RECORD}).status_code == 200
+    finally:
+        for taken in held:
+            admission.release(gate, taken)
+    with client.post('/predict/stream?disease_type=heart_disease&format=ndjson', data=b'') as response:
+        assert response.status_code == 200
+
+
+def test_stream_reports_bad_bytes_and_malformed_csv_per_row(client):
+    header = ','.join(key for key in HEART_RECORD) + '\n'
+    good = ','.join(str(value) for value in HEART_RECORD.values()) + '\n'
+    body = (header + good).encode() + good.replace('63', '6\xff3').encode('latin-1') + \
+        b'"' + b'x' * 200000 + b'\n' + good.encode()
+    with client.post('/predict/stream?disease_type=heart_disease&format=csv', data=body) as response:
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.status_code == 200
+    assert 'probability' in lines[0] and 'probability' in lines[-2]
+    assert [line['row'] for line in lines if 'error' in line] == [1, 2]
+    assert lines[-1]['summary']['rows'] == 4 and lines[-1]['summary']['errors'] == 2
+    assert 'error' not in lines[-1]['summary']
+
+
+def test_stream_reports_bad_bytes_in_ndjson_per_row(client):
+    good = json.dumps(HEART_RECORD).encode() + b'\n'
+    body = good + b'{"hd_age": "\xff"}\n' + b'[1, 2]\n' + good
+    with client.post('/predict/stream?disease_type=heart_disease&format=ndjson', data=body) as response:
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['row'] for line in lines if 'error' in line] == [1, 2]
+    assert lines[-1]['summary'] == {**lines[-1]['summary'], 'rows': 4, 'scored': 2, 'errors': 2}
+
+
+def test_replaying_the_training_csv_shows_no_drift(app_module, client):
+    app_module._drift_monitors.pop('heart_disease', None)
+    with open('cleveland.csv', 'rb') as f:
+        with client.post('/predict/stream?disease_type=heart_disease&format=csv', data=f.read()) as response:
+            assert response.status_code == 200
+    report = client.get('/drift?disease_type=heart_disease').get_json()['disease_types']['heart_disease']
+    assert report['current']['sufficient']
+    assert report['current']['drifted'] == []
+
+
+def test_stream_skips_an_oversized_line_and_scores_the_rest(client):
+    from record_stream import LINE_TOO_LONG_ERROR, MAX_LINE_BYTES
+
+    good = json.dumps(HEART_RECORD).encode() + b'\n'
+    body = good + b'{"hd_age": "' + b'9' * (2 * MAX_LINE_BYTES) + b'"}\n' + good + good
+    with client.post('/predict/stream?disease_type=heart_disease&format=ndjson', data=body) as response:
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[1] == {'row': 1, 'error': LINE_TOO_LONG_ERROR}
+    assert all('probability' in line for line in lines[2:4])
+    assert lines[-1]['summary']['scored'] == 3
+
+
+def test_drift_monitor_sees_each_scored_row_once(app_module, client):
+    app_module._drift_monitors.pop('heart_disease', None)
+    records = [HEART_RECORD, {**HEART_RECORD, 'hd_age': 64}, HEART_RECORD]
+    for _ in range(2):  # the second pass is answered from the prediction cache
+        response = client.post('/predict/batch', json={'disease_type': 'heart_disease', 'records': records})
+        assert response.status_code == 200
+    report = client.get('/drift?disease_type=heart_disease').get_json()['disease_types']['heart_disease']
+    assert report['current']['rows'] == 6
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from audit_log import AuditLog
+
+
+class BlockedSink:
+    name = 'blocked'
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.written = 0
+
+    def write(self, batch):
+        self.release.wait(5)
+        self.written += len(batch)
+
+    def close(self):
+        pass
+
+
+def test_two_full_batches_fit_while_the_writer_is_stuck(app_module, monkeypatch):
+    # The app's own buffer sizing, with the stuck sink in place of its file and history sinks
+    monkeypatch.setattr(app_module, 'AUDIT_SINKS', [])
+    sink = BlockedSink()
+    audit_log = app_module._build_audit_log()
+    audit_log.sinks = [sink]
+    for _ in range(2):
+        audit_log.record_many('heart_disease', 'v1', [0.5] * app_module.MAX_BATCH_SIZE,
+                              [(1.0,)] * app_module.MAX_BATCH_SIZE, ('hd_age',))
+    sink.release.set()
+    assert audit_log.flush()
+    assert audit_log.dropped == 0
+    assert sink.written == 2 * app_module.MAX_BATCH_SIZE
+
+
+def test_drops_are_counted_and_reported():
+    sink, reported = BlockedSink(), []
+    audit_log = AuditLog([sink], capacity=10, batch_size=10, on_drop=reported.append)
+    audit_log.record_many('heart_disease', 'v1', [0.5] * 25, [(1.0,)] * 25, ('hd_age',))
+    sink.release.set()
+    assert audit_log.dropped == sum(reported) > 0
+
+
+def test_block_policy_waits_once_per_block():
+    sink = BlockedSink()
+    audit_log = AuditLog([sink], capacity=10, batch_size=10, policy='block', block_ms=50)
+    audit_log.record_many('heart_disease', 'v1', [0.5] * 10, [(1.0,)] * 10, ('hd_age',))
+    start = time.monotonic()
+    audit_log.record_many('heart_disease', 'v1', [0.5] * 200, [(1.0,)] * 200, ('hd_age',))
+    assert time.monotonic() - start < 1.0
+    sink.release.set()
@@ -0,0 +1,44 @@
+import joblib
+import numpy as np
+import pytest
+
+from forest_engine import (DEFAULT_TOLERANCE, HEART_MODEL_PATH, FlatForest, HybridForest, final_estimator,
+                           load_cleveland_matrix, load_exported_forest)
+
+
+@pytest.fixture(scope='module')
+def heart_model(repo_root):
+    model = joblib.load(HEART_MODEL_PATH)
+    assert not hasattr(model, 'steps'), "expected the legacy model, which takes the encoded matrix"
+    return final_estimator(model), load_cleveland_matrix()
+
+
+def _flat_forests(model):
+    forests = [FlatForest.from_model(model)]
+    exported = load_exported_forest()
+    if exported is not None:
+        forests.append(exported)
+    return forests
+
+
+def _max_row_diff(forest, X, expected):
+    return max(np.abs(forest.predict_proba(X[i:i + 1]) - expected[i:i + 1]).max() for i in range(len(X)))
+
+
+def test_flat_forest_matches_sklearn_on_cleveland(heart_model):
+    model, X = heart_model
+    expected = model.predict_proba(X)
+    for forest in _flat_forests(model):
+        assert np.abs(forest.predict_proba(X) - expected).max() <= DEFAULT_TOLERANCE
+        assert _max_row_diff(forest, X, expected) <= DEFAULT_TOLERANCE
+
+
+def test_hybrid_forest_matches_sklearn_on_both_paths(heart_model):
+    model, X = heart_model
+    expected = model.predict_proba(X)
+    # Batches above max_flat_rows go to the sklearn model, single rows to the flat forest
+    forest = HybridForest(FlatForest.from_model(model), model, max_flat_rows=len(X) - 1)
+    assert np.abs(forest.predict_proba(X) - expected).max() <= DEFAULT_TOLERANCE
+    assert _max_row_diff(forest, X, expected) <= DEFAULT_TOLERANCE
+    flat_only = HybridForest(FlatForest.from_model(model), None)
+    assert np.abs(flat_only.predict_proba(X) - expected).max() <= DEFAULT_TOLERANCE
@@ -0,0 +1,14 @@
+import json
+import os
+
+from metrics import _MmapStore
+
+
+def test_reused_pid_starts_both_files_over(tmp_path):
+    # Files a dead process with this pid left behind, with a series in slot 0
+    with open(tmp_path / f"metrics_{os.getpid()}.keys", 'w') as f:
+        f.write(json.dumps([0, ['stale_total', 'counter', []]]) + '\n')
+    store = _MmapStore(str(tmp_path))
+    store.inc(('requests_total', 'counter', ()), 2)
+    [(pid, values)] = store.snapshot()
+    assert values == {('requests_total', 'counter', ()): 2.0}
@@ -0,0 +1,15 @@
+from prediction_cache import PredictionCache
+
+
+def test_discard_keeps_other_disease_types_and_the_current_version():
+    cache = PredictionCache(max_size=10)
+    cache.put(('heart_disease', 'v1', (63,)), 0.7)
+    cache.put(('heart_disease', 'v2', (63,)), 0.6)
+    cache.put(('diabetes', 'v1', (5,)), 0.2)
+    assert cache.discard('heart_disease', 'v2') == 1
+    assert cache.get(('heart_disease', 'v1', (63,))) is None
+    assert cache.get(('heart_disease', 'v2', (63,))) == 0.6
+    assert cache.get(('diabetes', 'v1', (5,))) == 0.2
+    # Loading a disease type for the first time drops nothing
+    assert cache.discard('breast_cancer', 'v1') == 0
+    assert len(cache) == 2
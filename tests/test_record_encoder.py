@@ -0,0 +1,15 @@
+import pickle
+
+import pandas as pd
+
+from record_encoder import RecordEncoder
+
+
+def test_pickling_keeps_the_fitted_encoder():
+    records = pd.DataFrame({'age': [40.0, 60.0], 'sex': [0.0, 1.0], 'cp': [1.0, 4.0], 'trestbps': [120.0, 140.0],
+                            'chol': [200.0, 260.0], 'fbs': [0.0, 1.0], 'restecg': [0.0, 2.0], 'thalach': [150.0, 120.0],
+                            'exang': [0.0, 1.0], 'oldpeak': [0.0, 2.0], 'slope': [1.0, 2.0], 'ca': [0.0, 1.0],
+                            'thal': [3.0, 7.0]})
+    encoder = RecordEncoder().fit(records)
+    restored = pickle.loads(pickle.dumps(encoder))
+    assert (encoder.transform(records) == restored.transform(records)).all()
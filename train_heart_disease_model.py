@@ -1,102 +1,55 @@
-{
- "cells": [
-  {
-   "cell_type": "code",
-   "execution_count": 7,
-   "id": "ffd68137-7b45-4718-b6f6-1257e4aeedf7",
-   "metadata": {},
-   "outputs": [
-    {
-     "name": "stdout",
-     "output_type": "stream",
-     "text": [
-      "Jupyter Notebook's current working directory: C:\\Users\\Gourav Rajput\\Diabetes_Prediction_Project\n",
-      "Attempting to load heart disease dataset from: C:\\Users\\Gourav Rajput\\Diabetes_Prediction_Project\\cleveland.csv\n",
-      "Dataset loaded successfully from 'cleveland.csv'.\n",
-      "\n",
-      "Starting data preprocessing...\n",
-      "Dataframe has 298 rows after cleaning.\n",
-      "Feature columns saved to model_artifacts\\heart_disease_feature_columns.joblib\n",
-      "Scaler saved to model_artifacts\\heart_disease_scaler.joblib\n",
-      "\n",
-      "Training RandomForestClassifier model...\n",
-      "Model training complete.\n",
-      "Model Accuracy on Test Set: 0.88\n",
-      "Heart disease model saved to model_artifacts\\heart_disease_model.joblib\n",
-      "\n",
-      "Heart disease model training and saving process complete!\n",
-      "You can now find the model artifacts in the 'model_artifacts' folder.\n",
-      "Next, we will update app.py and script.js to use this new model.\n"
-     ]
-    }
-   ],
-   "source": [
-    "import pandas as pd\n",
-    "import numpy as np\n",
-    "from sklearn.model_selection import train_test_split\n",
-    "from sklearn.preprocessing import StandardScaler\n",
-    "from sklearn.ensemble import RandomForestClassifier\n",
-    "from sklearn.metrics import accuracy_score\n",
-    "import joblib\n",
-    "import os\n",
-    "import sys # Import sys to potentially exit gracefully if needed later\n",
-    "\n",
-    "# --- Configuration ---\n",
-    "# Path where the model artifacts will be saved\n",
-    "MODEL_ARTIFACTS_DIR = 'model_artifacts'\n",import pandas as pd
+"""
+Trains the heart disease RandomForestClassifier on the local cleveland.csv (read through
+dataset_loader's cache) and saves it to model_artifacts/heart_disease_pipeline.joblib as a single
+Pipeline of record_encoder.RecordEncoder (one-hot encoding and scaling) and the classifier, along
+with the training split's feature statistics (heart_disease_reference_stats.json), which the
+serving drift monitor compares incoming requests against.
+
+Hyperparameters are chosen by successive halving over the notebook's param_grid. n_estimators is
+the budget: every candidate is first scored with the fewest trees, only the best third is grown
+(with warm_start, so existing trees are kept) to the next size, and so on. The cross-validation
+folds are split and scaled once and shared by every candidate. Those folds only decide who
+survives each rung: a validation split held out of the training set before the folds are made
+picks the final parameters among each budget's best candidate. --compare-grid also runs the
+exhaustive GridSearchCV on the same folds (refitting the scaler for each of its 1080 fits) and
+reports both wall times and whether the picks agree.
+
+Usage:
+    python train_heart_disease_model.py
+    python train_heart_disease_model.py --search halving --compare-grid --n-jobs 4
+    python train_heart_disease_model.py --search none
+"""
+import argparse
+import math
+import os
+import time
+
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score
-import joblib
-import os
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import GridSearchCV, ParameterGrid, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from dataset_loader import CLEVELAND_CSV_PATH, load_cleveland
+from drift_monitor import reference_stats, save_reference_stats
+from forest_engine import dump_atomic, file_sha256
+from record_encoder import RecordEncoder
 
 # --- Configuration ---
 # Path where the model artifacts will be saved
 MODEL_ARTIFACTS_DIR = 'model_artifacts'
-HEART_MODEL_PATH = os.path.join(MODEL_ARTIFACTS_DIR, 'heart_disease_model.joblib')
-HEART_SCALER_PATH = os.path.join(MODEL_ARTIFACTS_DIR, 'heart_disease_scaler.joblib')
-HEART_FEATURE_COLUMNS_PATH = os.path.join(MODEL_ARTIFACTS_DIR, 'heart_disease_feature_columns.joblib')
-
-# Ensure the model_artifacts directory exists
-os.makedirs(MODEL_ARTIFACTS_DIR, exist_ok=True)
-
-# --- 1. Load Dataset ---
-# Using a common Kaggle dataset (Cleveland Heart Disease Data)
-# You might need to download this manually if direct URL fetch fails,
-# or adjust the path if you place it in your project folder.
-# For simplicity, we'll try to fetch it.
-# A more robust way might be to prompt the user to download it.
-print("Attempting to load heart disease dataset...")
-try:
-    # This dataset is commonly found as 'heart.csv' or similar.
-    # It's often distributed in Kaggle datasets.
-    # For a direct download example, you might need to find a raw CSV link.
-    # Let's assume you have a 'heart.csv' file in your project directory
-    # or can get one easily. If not, this step needs adjustment.
-    # For now, let's use a public raw CSV link that is sometimes available.
-    # If this specific URL fails, you'd need to download 'cleveland.csv' and place it.
-    df = pd.read_csv('https://raw.githubusercontent.com/datasets/heart-disease/main/data/cleveland.csv')
-    print("Dataset loaded successfully.")
-except Exception as e:
-    print(f"Error loading dataset from URL. Please download 'cleveland.csv' (or 'heart.csv') "
-          f"and place it in your project directory, then update the path in the script. Error: {e}")
-    # Fallback if download fails:
-    try:
-        df = pd.read_csv('cleveland.csv') # Assumes user downloaded it
-        print("Dataset loaded from local 'cleveland.csv'.")
-    except FileNotFoundError:
-        print("Error: 'cleveland.csv' not found locally either. Please ensure the dataset file is present.")
-        exit() # Exit if dataset isn't found
-
-
-# --- 2. Preprocessing ---
-# Based on typical Cleveland heart disease dataset columns
+HEART_PIPELINE_FILENAME = 'heart_disease_pipeline.joblib'
+# Training-data feature statistics the serving drift monitor (drift_monitor.py) compares against
+HEART_REFERENCE_STATS_FILENAME = 'heart_disease_reference_stats.json'
+
 # Column names often mean:
 # age: age
 # sex: sex (1 = male; 0 = female)
-# cp: chest pain type (0, 1, 2, 3)
+# cp: chest pain type (1, 2, 3, 4)
 # trestbps: resting blood pressure
 # chol: serum cholestoral in mg/dl
 # fbs: fasting blood sugar > 120 mg/dl (1 = true; 0 = false)
@@ -107,521 +60,363 @@ except Exception as e:
 # slope: the slope of the peak exercise ST segment
 # ca: number of major vessels (0-3) colored by flourosopy
 # thal: thal (3 = normal; 6 = fixed defect; 7 = reversible defect)
-# target: diagnosis of heart disease (0 = no, 1 = yes)
-
-# Rename target column to a standard 'target' if it's named 'num' or similar
-if 'num' in df.columns:
-    df.rename(columns={'num': 'target'}, inplace=True)
-
-# Replace '?' with NaN for missing values
-df = df.replace('?', np.nan)
-
-# Convert all columns to numeric where possible, coercing errors to NaN
-for col in df.columns:
-    df[col] = pd.to_numeric(df[col], errors='coerce')
-
-# Drop rows with any missing values
-df.dropna(inplace=True)
-
-# Define features (X) and target (y)
-X = df.drop('target', axis=1)
-y = df['target']
-
-# Ensure target is binary (0 or 1 for presence of heart disease)
-# Some datasets use 0=no, 1,2,3,4=yes. We convert 1,2,3,4 to 1.
-y = y.apply(lambda x: 1 if x > 0 else 0)
-
-
-# One-hot encode categorical features (cp, restecg, slope, ca, thal)
-# These are typically treated as categorical
-categorical_cols = ['sex', 'cp', 'fbs', 'restecg', 'exang', 'slope', 'ca', 'thal']
-# Filter out columns that don't exist in X to prevent errors if dataset varies
-categorical_cols = [col for col in categorical_cols if col in X.columns]
-
-X_encoded = pd.get_dummies(X, columns=categorical_cols, drop_first=False) # drop_first=False to keep all categories for consistent features
-
-# Identify numerical features for scaling
-numerical_cols = ['age', 'trestbps', 'chol', 'thalach', 'oldpeak']
-numerical_cols = [col for col in numerical_cols if col in X_encoded.columns] # Ensure they exist
-
-# Save the list of feature columns AFTER encoding and before splitting
-heart_disease_feature_columns = X_encoded.columns.tolist()
-joblib.dump(heart_disease_feature_columns, HEART_FEATURE_COLUMNS_PATH)
-print(f"Feature columns saved to {HEART_FEATURE_COLUMNS_PATH}")
-
-# Split data into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(X_encoded, y, test_size=0.2, random_state=42, stratify=y)
-
-# Scale numerical features
-scaler = StandardScaler()
-X_train[numerical_cols] = scaler.fit_transform(X_train[numerical_cols])
-X_test[numerical_cols] = scaler.transform(X_test[numerical_cols])
-joblib.dump(scaler, HEART_SCALER_PATH)
-print(f"Scaler saved to {HEART_SCALER_PATH}")
-
-# --- 3. Train Model ---
-print("Training RandomForestClassifier model...")
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
-print("Model training complete.")
-
-# --- 4. Evaluate Model (Optional) ---
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Model Accuracy on Test Set: {accuracy:.2f}")
-
-# --- 5. Save Model ---
-joblib.dump(model, HEART_MODEL_PATH)
-print(f"Heart disease model saved to {HEART_MODEL_PATH}")
-
-print("\nHeart disease model training and saving process complete!")
-print("You can now find the model artifacts in the 'model_artifacts' folder.")
-print("Next, we will update app.py and script.js to use this new model.")
-
-    "HEART_MODEL_PATH = os.path.join(MODEL_ARTIFACTS_DIR, 'heart_disease_model.joblib')\n",
-    "HEART_SCALER_PATH = os.path.join(MODEL_ARTIFACTS_DIR, 'heart_disease_scaler.joblib')\n",
-    "HEART_FEATURE_COLUMNS_PATH = os.path.join(MODEL_ARTIFACTS_DIR, 'heart_disease_feature_columns.joblib')\n",
-    "\n",
-    "# Ensure the model_artifacts directory exists\n",
-    "os.makedirs(MODEL_ARTIFACTS_DIR, exist_ok=True)\n",
-    "\n",
-    "# --- 1. Load Dataset ---\n",
-    "project_root = os.getcwd() # Get the current working directory of the Jupyter Notebook\n",
-    "cleveland_csv_path = os.path.join(project_root, 'cleveland.csv')\n",
-    "\n",
-    "print(f\"Jupyter Notebook's current working directory: {project_root}\")\n",
-    "print(f\"Attempting to load heart disease dataset from: {cleveland_csv_path}\")\n",
-    "\n",
-    "df = None # Initialize df to None\n",
-    "\n",
-    "try:\n",
-    "    column_names = [\n",
-    "        'age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg', 'thalach', 'exang',\n",
-    "        'oldpeak', 'slope', 'ca', 'thal', 'target'\n",
-    "    ]\n",
-    "    df = pd.read_csv(cleveland_csv_path, header=None, names=column_names)\n",
-    "    print(\"Dataset loaded successfully from 'cleveland.csv'.\")\n",
-    "except FileNotFoundError:\n",
-    "    current_dir = os.getcwd()\n",
-    "    attempted_path = os.path.join(current_dir, 'cleveland.csv')\n",
-    "    print(f\"ERROR: 'cleveland.csv' not found at the expected path: {cleveland_csv_path}\")\n",
-    "    print(\"Please ensure you have downloaded the 'processed.cleveland.data' file from \")\n",
-    "    print(\"https://archive.ics.uci.edu/dataset/45/heart+disease \")\n",
-    "    print(\"and saved it as 'cleveland.csv' directly in your project directory (where your app.py is).\")\n",
-    "except Exception as e:\n",
-    "    print(f\"An unexpected error occurred while loading the dataset: {e}\")\n",
-    "\n",
-    "\n",
-    "# --- 2. Preprocessing ---\n",
-    "if df is not None:\n",
-    "    print(\"\\nStarting data preprocessing...\")\n",
-    "    # Replace '?' with NaN for missing values\n",
-    "    df = df.replace('?', np.nan)\n",
-    "\n",
-    "    # Convert all columns to numeric where possible, coercing errors to NaN\n",
-    "    # This loop ensures all columns that should be numeric are converted.\n",
-    "    for col in df.columns:\n",
-    "        df[col] = pd.to_numeric(df[col], errors='coerce')\n",
-    "\n",
-    "    # Drop rows with any missing values (NaNs introduced by 'coerce' or original '?')\n",
-    "    df.dropna(inplace=True)\n",
-    "\n",
-    "    # After dropping rows, check if the DataFrame is still empty\n",
-    "    if df.empty:\n",
-    "        print(\"ERROR: DataFrame is empty after dropping rows with missing values. Check data quality.\")\n",
-    "        # We can stop here gracefully if df is empty to prevent further errors\n",
-    "        df = None # Set df to None so subsequent steps are skipped\n",
-    "    else:\n",
-    "        print(f\"Dataframe has {len(df)} rows after cleaning.\")\n",
-    "\n",
-    "    if df is not None: # Re-check if df is not None after the empty check\n",
-    "        # Define features (X) and target (y)\n",
-    "        X = df.drop('target', axis=1)\n",
-    "        y = df['target']\n",
-    "\n",
-    "        # Ensure target is binary (0 or 1 for presence of heart disease)\n",
-    "        # Some datasets use 0=no, 1,2,3,4=yes. We convert 1,2,3,4 to 1.\n",
-    "        y = y.apply(lambda x: 1 if x > 0 else 0)\n",
-    "\n",
-    "\n",
-    "        # One-hot encode categorical features (cp, restecg, slope, ca, thal)\n",
-    "        # These are typically treated as categorical. 'sex' and 'fbs' are binary but good to include in get_dummies.\n",
-    "        categorical_cols = ['sex', 'cp', 'fbs', 'restecg', 'exang', 'slope', 'ca', 'thal']\n",
-    "        # Filter out columns that don't exist in X to prevent errors if dataset varies\n",
-    "        categorical_cols = [col for col in categorical_cols if col in X.columns]\n",
-    "\n",
-    "        X_encoded = pd.get_dummies(X, columns=categorical_cols, drop_first=False) # drop_first=False to keep all categories for consistent features\n",
-    "\n",
-    "        # Identify numerical features for scaling\n",
-    "        numerical_cols = ['age', 'trestbps', 'chol', 'thalach', 'oldpeak']\n",
-    "        numerical_cols = [col for col in numerical_cols if col in X_encoded.columns] # Ensure they exist\n",
-    "\n",
-    "        # Save the list of feature columns AFTER encoding and before splitting\n",
-    "        heart_disease_feature_columns = X_encoded.columns.tolist()\n",
-    "        joblib.dump(heart_disease_feature_columns, HEART_FEATURE_COLUMNS_PATH)\n",
-    "        print(f\"Feature columns saved to {HEART_FEATURE_COLUMNS_PATH}\")\n",
-    "\n",
-    "        # Split data into training and testing sets\n",
-    "        X_train, X_test, y_train, y_test = train_test_split(X_encoded, y, test_size=0.2, random_state=42, stratify=y)\n",
-    "\n",
-    "        # Scale numerical features\n",
-    "        scaler = StandardScaler()\n",
-    "        X_train[numerical_cols] = scaler.fit_transform(X_train[numerical_cols])\n",
-    "        X_test[numerical_cols] = scaler.transform(X_test[numerical_cols])\n",
-    "        joblib.dump(scaler, HEART_SCALER_PATH)\n",
-    "        print(f\"Scaler saved to {HEART_SCALER_PATH}\")\n",
-    "\n",
-    "        # --- 3. Train Model ---\n",
-    "        print(\"\\nTraining RandomForestClassifier model...\")\n",
-    "        model = RandomForestClassifier(n_estimators=100, random_state=42)\n",
-    "        model.fit(X_train, y_train)\n",
-    "        print(\"Model training complete.\")\n",
-    "\n",
-    "        # --- 4. Evaluate Model (Optional) ---\n",
-    "        y_pred = model.predict(X_test)\n",
-    "        accuracy = accuracy_score(y_test, y_pred)\n",
-    "        print(f\"Model Accuracy on Test Set: {accuracy:.2f}\")\n",
-    "\n",
-    "        # --- 5. Save Model ---\n",
-    "        joblib.dump(model, HEART_MODEL_PATH)\n",
-    "        print(f\"Heart disease model saved to {HEART_MODEL_PATH}\")\n",
-    "\n",
-    "        print(\"\\nHeart disease model training and saving process complete!\")\n",
-    "        print(\"You can now find the model artifacts in the 'model_artifacts' folder.\")\n",
-    "        print(\"Next, we will update app.py and script.js to use this new model.\")\n",
-    "    else:\n",
-    "        print(\"\\nSkipping model training and saving due to empty dataset.\")\n",
-    "else:\n",
-    "    print(\"\\nDataset was not loaded. Skipping model training and saving.\")\n"
-   ]
-  },
-  {
-   "cell_type": "code",
-   "execution_count": 9,
-   "id": "5e9360dc-aaaf-40fa-91ea-50225c54a7d4",
-   "metadata": {},
-   "outputs": [
-    {
-     "name": "stdout",
-     "output_type": "stream",
-     "text": [
-      "Imports, Configuration, and Directory Check Complete.\n"
-     ]
-    }
-   ],
-   "source": [
-    "import pandas as pd\n",
-    "import numpy as np\n",
-    "from sklearn.model_selection import train_test_split, GridSearchCV # Added GridSearchCV\n",
-    "from sklearn.preprocessing import StandardScaler\n",
-    "from sklearn.ensemble import RandomForestClassifier\n",
-    "from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, confusion_matrix # Added more metrics\n",
-    "import joblib\n",
-    "import os\n",
-    "import sys\n",
-    "\n",
-    "# --- Configuration ---\n",
-    "# Path where the model artifacts will be saved\n",
-    "MODEL_ARTIFACTS_DIR = 'model_artifacts'\n",
-    "HEART_MODEL_PATH = os.path.join(MODEL_ARTIFACTS_DIR, 'heart_disease_model.joblib')\n",
-    "HEART_SCALER_PATH = os.path.join(MODEL_ARTIFACTS_DIR, 'heart_disease_scaler.joblib')\n",
-    "HEART_FEATURE_COLUMNS_PATH = os.path.join(MODEL_ARTIFACTS_DIR, 'heart_disease_feature_columns.joblib')\n",
-    "\n",
-    "# Ensure the model_artifacts directory exists\n",
-    "os.makedirs(MODEL_ARTIFACTS_DIR, exist_ok=True)\n",
-    "\n",
-    "print(\"Imports, Configuration, and Directory Check Complete.\")"
-   ]
-  },
-  {
-   "cell_type": "code",
-   "execution_count": 10,
-   "id": "ffe9b939-7e8d-430d-bd9d-23040985d48b",
-   "metadata": {},
-   "outputs": [
-    {
-     "name": "stdout",
-     "output_type": "stream",
-     "text": [
-      "Jupyter Notebook's current working directory: C:\\Users\\Gourav Rajput\\Diabetes_Prediction_Project\n",
-      "Attempting to load heart disease dataset from: C:\\Users\\Gourav Rajput\\Diabetes_Prediction_Project\\cleveland.csv\n",
-      "Dataset loaded successfully from 'cleveland.csv'.\n"
-     ]
-    }
-   ],
-   "source": [
-    "print(f\"Jupyter Notebook's current working directory: {os.getcwd()}\")\n",
-    "print(f\"Attempting to load heart disease dataset from: {os.path.join(os.getcwd(), 'cleveland.csv')}\")\n",
-    "\n",
-    "df = None # Initialize df to None\n",
-    "\n",
-    "try:\n",
-    "    column_names = [\n",
-    "        'age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg', 'thalach', 'exang',\n",
-    "        'oldpeak', 'slope', 'ca', 'thal', 'target'\n",
-    "    ]\n",
-    "    df = pd.read_csv('cleveland.csv', header=None, names=column_names)\n",
-    "    print(\"Dataset loaded successfully from 'cleveland.csv'.\")\n",
-    "except FileNotFoundError:\n",
-    "    print(f\"ERROR: 'cleveland.csv' not found at the expected path: {os.path.join(os.getcwd(), 'cleveland.csv')}\")\n",
-    "    print(\"Please ensure you have downloaded the 'processed.cleveland.data' file from \")\n",
-    "    print(\"[https://archive.ics.uci.edu/dataset/45/heart+disease](https://archive.ics.uci.edu/dataset/45/heart+disease) \")\n",
-    "    print(\"and saved it as 'cleveland.csv' directly in your project directory (where your app.py is).\")\n",
-    "except Exception as e:\n",
-    "    print(f\"An unexpected error occurred while loading the dataset: {e}\")\n",
-    "\n",
-    "if df is None:\n",
-    "    sys.exit(\"Dataset loading failed. Exiting script.\")"
-   ]
-  },
-  {
-   "cell_type": "code",
-   "execution_count": 11,
-   "id": "8cbcc227-428f-47f2-8ed9-fd9478bcdcb8",
-   "metadata": {},
-   "outputs": [
-    {
-     "name": "stdout",
-     "output_type": "stream",
-     "text": [
-      "\n",
-      "Starting data preprocessing...\n",
-      "Dataframe has 298 rows after cleaning.\n",
-      "Data preprocessing complete.\n"
-     ]
-    }
-   ],
-   "source": [
-    "print(\"\\nStarting data preprocessing...\")\n",
-    "if df is not None:\n",
-    "    # Replace '?' with NaN for missing values\n",
-    "    df = df.replace('?', np.nan)\n",
-    "\n",
-    "    # Convert all columns to numeric where possible, coercing errors to NaN\n",
-    "    for col in df.columns:\n",
-    "        df[col] = pd.to_numeric(df[col], errors='coerce')\n",
-    "\n",
-    "    # Drop rows with any missing values (NaNs introduced by 'coerce' or original '?')\n",
-    "    df.dropna(inplace=True)\n",
-    "\n",
-    "    # After dropping rows, check if the DataFrame is still empty\n",
-    "    if df.empty:\n",
-    "        print(\"ERROR: DataFrame is empty after dropping rows with missing values. Check data quality.\")\n",
-    "        sys.exit(\"Empty DataFrame after cleaning. Exiting script.\") # Exit if df is empty\n",
-    "\n",
-    "    print(f\"Dataframe has {len(df)} rows after cleaning.\")\n",
-    "\n",
-    "    # Define features (X) and target (y)\n",
-    "    X = df.drop('target', axis=1)\n",
-    "    y = df['target']\n",
-    "\n",
-    "    # Ensure target is binary (0 or 1 for presence of heart disease)\n",
-    "    y = y.apply(lambda x: 1 if x > 0 else 0)\n",
-    "\n",
-    "    # One-hot encode categorical features\n",
-    "    categorical_cols = ['sex', 'cp', 'fbs', 'restecg', 'exang', 'slope', 'ca', 'thal']\n",
-    "    categorical_cols = [col for col in categorical_cols if col in X.columns]\n",
-    "\n",
-    "    X_encoded = pd.get_dummies(X, columns=categorical_cols, drop_first=False)\n",
-    "\n",
-    "    # Identify numerical features for scaling\n",
-    "    numerical_cols = ['age', 'trestbps', 'chol', 'thalach', 'oldpeak']\n",
-    "    numerical_cols = [col for col in numerical_cols if col in X_encoded.columns]\n",
-    "\n",
-    "    print(\"Data preprocessing complete.\")\n",
-    "else:\n",
-    "    sys.exit(\"Preprocessing skipped as dataset was not loaded.\")"
-   ]
-  },
-  {
-   "cell_type": "code",
-   "execution_count": 12,
-   "id": "a701fa73-f619-4c93-957c-f53fdd2c257c",
-   "metadata": {},
-   "outputs": [
-    {
-     "name": "stdout",
-     "output_type": "stream",
-     "text": [
-      "Feature columns saved to model_artifacts\\heart_disease_feature_columns.joblib\n",
-      "Data split into training (238 samples) and testing (60 samples) sets.\n"
-     ]
-    }
-   ],
-   "source": [
-    "# Save the list of feature columns AFTER encoding and before splitting\n",
-    "heart_disease_feature_columns = X_encoded.columns.tolist()\n",
-    "joblib.dump(heart_disease_feature_columns, HEART_FEATURE_COLUMNS_PATH)\n",
-    "print(f\"Feature columns saved to {HEART_FEATURE_COLUMNS_PATH}\")\n",
-    "\n",
-    "# Split data into training and testing sets\n",
-    "X_train, X_test, y_train, y_test = train_test_split(X_encoded, y, test_size=0.2, random_state=42, stratify=y)\n",
-    "print(f\"Data split into training ({len(X_train)} samples) and testing ({len(X_test)} samples) sets.\")"
-   ]
-  },
-  {
-   "cell_type": "code",
-   "execution_count": 13,
-   "id": "15f8ab0b-3422-4146-aaca-ba7ace883f44",
-   "metadata": {},
-   "outputs": [
-    {
-     "name": "stdout",
-     "output_type": "stream",
-     "text": [
-      "Scaler saved to model_artifacts\\heart_disease_scaler.joblib\n",
-      "Numerical features scaled.\n"
-     ]
-    }
-   ],
-   "source": [
-    "scaler = StandardScaler()\n",
-    "X_train[numerical_cols] = scaler.fit_transform(X_train[numerical_cols])\n",
-    "X_test[numerical_cols] = scaler.transform(X_test[numerical_cols])\n",
-    "joblib.dump(scaler, HEART_SCALER_PATH)\n",
-    "print(f\"Scaler saved to {HEART_SCALER_PATH}\")\n",
-    "print(\"Numerical features scaled.\")"
-   ]
-  },
-  {
-   "cell_type": "code",
-   "execution_count": 15,
-   "id": "2b703a97-6060-475c-8ebe-2dd2308f6ed8",
-   "metadata": {},
-   "outputs": [
-    {
-     "name": "stdout",
-     "output_type": "stream",
-     "text": [
-      "\n",
-      "Starting Hyperparameter Tuning for RandomForestClassifier...\n",
-      "Fitting 5 folds for each of 216 candidates, totalling 1080 fits\n",
-      "\n",
-      "Hyperparameter tuning complete!\n",
-      "Best parameters found: {'criterion': 'gini', 'max_depth': None, 'min_samples_leaf': 1, 'min_samples_split': 2, 'n_estimators': 200}\n",
-      "Best cross-validation accuracy: 0.82\n"
-     ]
-    }
-   ],
-   "source": [
-    "print(\"\\nStarting Hyperparameter Tuning for RandomForestClassifier...\")\n",
-    "\n",
-    "# Define the parameter grid to search\n",
-    "param_grid = {\n",
-    "    'n_estimators': [50, 100, 200], # Number of trees in the forest\n",
-    "    'max_depth': [None, 10, 20, 30], # Maximum depth of the tree\n",
-    "    'min_samples_split': [2, 5, 10], # Minimum number of samples required to split an internal node\n",
-    "    'min_samples_leaf': [1, 2, 4], # Minimum number of samples required to be at a leaf node\n",
-    "    'criterion': ['gini', 'entropy'] # Function to measure the quality of a split\n",
-    "}\n",
-    "\n",
-    "# Initialize GridSearchCV\n",
-    "# cv=5 means 5-fold cross-validation\n",
-    "# n_jobs=-1 uses all available CPU cores\n",
-    "# verbose=2 provides detailed output during the search\n",
-    "grid_search = GridSearchCV(estimator=RandomForestClassifier(random_state=42),\n",
-    "                           param_grid=param_grid,\n",
-    "                           cv=5,\n",
-    "                           n_jobs=-1,\n",
-    "                           verbose=2,\n",
-    "                           scoring='accuracy') # We are optimizing for accuracy\n",
-    "\n",
-    "# Perform the grid search on the training data\n",
-    "grid_search.fit(X_train, y_train)\n",
-    "\n",
-    "# Get the best estimator (model) found by GridSearchCV\n",
-    "best_model = grid_search.best_estimator_\n",
-    "\n",
-    "print(\"\\nHyperparameter tuning complete!\")\n",
-    "print(f\"Best parameters found: {grid_search.best_params_}\")\n",
-    "print(f\"Best cross-validation accuracy: {grid_search.best_score_:.2f}\")\n"
-   ]
-  },
-  {
-   "cell_type": "code",
-   "execution_count": 16,
-   "id": "ea793cda-84d7-4e68-94f7-29a2484cd06b",
-   "metadata": {},
-   "outputs": [
-    {
-     "name": "stdout",
-     "output_type": "stream",
-     "text": [
-      "\n",
-      "Evaluating the best model on the test set...\n",
-      "Best Model Test Accuracy: 0.85\n",
-      "Best Model Test Precision: 0.85\n",
-      "Best Model Test Recall: 0.82\n",
-      "Best Model Test F1-Score: 0.84\n",
-      "Best Model Test ROC AUC Score: 0.94\n",
-      "Confusion Matrix:\n",
-      " [[28  4]\n",
-      " [ 5 23]]\n",
-      "\n",
-      "Best heart disease model saved to model_artifacts\\heart_disease_model.joblib\n",
-      "\n",
-      "Heart disease model training and saving process complete!\n",
-      "You can now find the best model artifacts in the 'model_artifacts' folder.\n",
-      "Next, we will update app.py and script.js to integrate heart disease prediction.\n"
-     ]
-    }
-   ],
-   "source": [
-    "print(\"\\nEvaluating the best model on the test set...\")\n",
-    "y_pred_best = best_model.predict(X_test)\n",
-    "accuracy_best = accuracy_score(y_test, y_pred_best)\n",
-    "precision_best = precision_score(y_test, y_pred_best)\n",
-    "recall_best = recall_score(y_test, y_pred_best)\n",
-    "f1_best = f1_score(y_test, y_pred_best)\n",
-    "roc_auc_best = roc_auc_score(y_test, best_model.predict_proba(X_test)[:, 1])\n",
-    "conf_matrix_best = confusion_matrix(y_test, y_pred_best)\n",
-    "\n",
-    "\n",
-    "print(f\"Best Model Test Accuracy: {accuracy_best:.2f}\")\n",
-    "print(f\"Best Model Test Precision: {precision_best:.2f}\")\n",
-    "print(f\"Best Model Test Recall: {recall_best:.2f}\")\n",
-    "print(f\"Best Model Test F1-Score: {f1_best:.2f}\")\n",
-    "print(f\"Best Model Test ROC AUC Score: {roc_auc_best:.2f}\")\n",
-    "print(\"Confusion Matrix:\\n\", conf_matrix_best)\n",
-    "\n",
-    "\n",
-    "# --- Save the Best Model ---\n",
-    "joblib.dump(best_model, HEART_MODEL_PATH)\n",
-    "print(f\"\\nBest heart disease model saved to {HEART_MODEL_PATH}\")\n",
-    "\n",
-    "print(\"\\nHeart disease model training and saving process complete!\")\n",
-    "print(\"You can now find the best model artifacts in the 'model_artifacts' folder.\")\n",
-    "print(\"Next, we will update app.py and script.js to integrate heart disease prediction.\")"
-   ]
-  },
-  {
-   "cell_type": "code",
-   "execution_count": null,
-   "id": "dcfebe79-4e9d-4991-bae0-8e1bb08476d3",
-   "metadata": {},
-   "outputs": [],
-   "source": []
-  }
- ],
- "metadata": {
-  "kernelspec": {
-   "display_name": "Python 3 (ipykernel)",
-   "language": "python",
-   "name": "python3"
-  },
-  "language_info": {
-   "codemirror_mode": {
-    "name": "ipython",
-    "version": 3
-   },
-   "file_extension": ".py",
-   "mimetype": "text/x-python",
-   "name": "python",
-   "nbconvert_exporter": "python",
-   "pygments_lexer": "ipython3",
-   "version": "3.10.0"
-  }
- },
- "nbformat": 4,
- "nbformat_minor": 5
+# target: diagnosis of heart disease (0 = no, 1..4 = yes)
+CATEGORICAL_COLS = ['sex', 'cp', 'fbs', 'restecg', 'exang', 'slope', 'ca', 'thal']
+NUMERICAL_COLS = ['age', 'trestbps', 'chol', 'thalach', 'oldpeak']
+
+# Same grid as the notebook's GridSearchCV (216 candidates)
+PARAM_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [None, 10, 20, 30],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4],
+    'criterion': ['gini', 'entropy'],
 }
+# Parameters used by --search none
+DEFAULT_PARAMS = {'n_estimators': 200, 'max_depth': None, 'min_samples_split': 2, 'min_samples_leaf': 1, 'criterion': 'gini'}
+
+
+# --- 1./2. Load Dataset and Preprocess ---
+def preprocess(df):
+    """
+    One-hot encodes the cleaned frame from dataset_loader. Returns (X_encoded, y).
+    """
+    print(f"Dataframe has {len(df)} rows after cleaning.")
+    X = df.drop('target', axis=1)
+    # The dataset uses 0=no, 1,2,3,4=yes. We convert 1,2,3,4 to 1.
+    y = (df['target'] > 0).astype(int)
+
+    categorical_cols = [col for col in CATEGORICAL_COLS if col in X.columns]
+    X_encoded = pd.get_dummies(X, columns=categorical_cols, drop_first=False)
+    return X_encoded, y
+
+
+# --- 3. Hyperparameter Search ---
+def make_folds(X_train, y_train, numerical_cols, n_splits=5, random_state=42):
+    """
+    Splits the training set into stratified folds once and scales each fold's numerical columns
+    with a scaler fit on that fold's training part. Returns (splits, fold_matrices) where
+    fold_matrices holds (X_fit, y_fit, X_val, y_val) NumPy arrays shared by every candidate.
+    """
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    splits = list(splitter.split(X_train, y_train))
+    positions = [X_train.columns.get_loc(col) for col in numerical_cols]
+    X = X_train.to_numpy(dtype=np.float64)
+    y = y_train.to_numpy()
+    fold_matrices = []
+    for fit_idx, val_idx in splits:
+        X_fit, X_val = X[fit_idx].copy(), X[val_idx].copy()
+        scaler = StandardScaler().fit(X_fit[:, positions])
+        X_fit[:, positions] = scaler.transform(X_fit[:, positions])
+        X_val[:, positions] = scaler.transform(X_val[:, positions])
+        fold_matrices.append((X_fit, y[fit_idx], X_val, y[val_idx]))
+    return splits, fold_matrices
+
+
+def make_validation(X_fit, y_fit, X_val, y_val, numerical_cols):
+    """
+    (X_fit, y_fit, X_val, y_val) NumPy arrays for the validation split, scaled like a fold.
+    """
+    positions = [X_fit.columns.get_loc(col) for col in numerical_cols]
+    X_fit, X_val = X_fit.to_numpy(dtype=np.float64), X_val.to_numpy(dtype=np.float64)
+    scaler = StandardScaler().fit(X_fit[:, positions])
+    X_fit[:, positions] = scaler.transform(X_fit[:, positions])
+    X_val[:, positions] = scaler.transform(X_val[:, positions])
+    return X_fit, y_fit.to_numpy(), X_val, y_val.to_numpy()
+
+
+def _grow_and_score(model, params, n_estimators, fold, random_state):
+    """
+    Grows model (or a new forest for params) to n_estimators trees on one fold and returns
+    (model, validation accuracy). warm_start keeps the trees fit at earlier rungs, and gives the
+    same forest as fitting n_estimators trees from scratch with the same random_state.
+    """
+    X_fit, y_fit, X_val, y_val = fold
+    if model is None:
+        model = RandomForestClassifier(random_state=random_state, warm_start=True, **params)
+    model.set_params(n_estimators=n_estimators)
+    model.fit(X_fit, y_fit)
+    return model, accuracy_score(y_val, model.predict(X_val))
+
+
+def successive_halving_search(fold_matrices, param_grid=PARAM_GRID, factor=3, n_jobs=-1, random_state=42, verbose=True,
+                              validation=None):
+    """
+    Successive halving over param_grid with n_estimators as the budget. Returns a dict with the
+    best parameters, their mean CV accuracy, every (parameters, score) evaluated and the
+    number of trees fit.
+
+    The folds decide which candidates survive each rung. With a validation split (from
+    make_validation), the final pick is made on it instead, among the best candidate of every
+    budget, so the rows that eliminated candidates do not also judge the winner; its accuracy
+    there is returned as validation_score. Ties are broken the way GridSearchCV breaks them
+    (first candidate in ParameterGrid order), so on the same folds both searches rank shared
+    candidates identically.
+    """
+    budgets = sorted(param_grid['n_estimators'])
+    grid = {key: values for key, values in param_grid.items() if key != 'n_estimators'}
+    configs = list(ParameterGrid(grid))
+    models = {(c, f): None for c in range(len(configs)) for f in range(len(fold_matrices))}
+    alive = list(range(len(configs)))
+    evaluated = []  # (grid_index, params, mean_score)
+    trees_fit = 0
+
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for rung, n_estimators in enumerate(budgets):
+            tasks = [(c, f) for c in alive for f in range(len(fold_matrices))]
+            results = parallel(delayed(_grow_and_score)(models[task], configs[task[0]], n_estimators,
+                                                        fold_matrices[task[1]], random_state) for task in tasks)
+            trees_fit += len(tasks) * (n_estimators - (budgets[rung - 1] if rung else 0))
+            scores = {}
+            for (c, f), (model, score) in zip(tasks, results):
+                models[(c, f)] = model
+                scores.setdefault(c, []).append(score)
+
+            ranked = []
+            for c in alive:
+                mean_score = float(np.mean(scores[c]))
+                # ParameterGrid varies the alphabetically last key (n_estimators) fastest
+                grid_index = c * len(budgets) + rung
+                evaluated.append((grid_index, dict(configs[c], n_estimators=n_estimators), mean_score))
+                ranked.append((-mean_score, c))
+            ranked.sort()
+            keep = max(1, math.ceil(len(alive) / factor))
+            if verbose:
+                print(f"  rung {rung}: {len(alive)} candidates x {len(fold_matrices)} folds at {n_estimators} trees, "
+                      f"best {-ranked[0][0]:.4f}, keeping {min(keep, len(alive))}")
+            alive = sorted(c for _, c in ranked[:keep])
+            # Drop the forests of eliminated candidates
+            for c, f in list(models):
+                if c not in alive:
+                    del models[(c, f)]
+
+    evaluated.sort(key=lambda item: (-item[2], item[0]))
+    _, best_params, best_score = evaluated[0]
+    result = {'best_params': best_params, 'best_score': best_score, 'cv_best_params': best_params,
+              'evaluated': evaluated, 'trees_fit': trees_fit}
+    if validation is not None:
+        pick = pick_on_validation(evaluated, validation, n_jobs, random_state)
+        if verbose:
+            print(f"  validation: best of {pick['finalists']} budgets is {pick['best_params']['n_estimators']} trees, "
+                  f"accuracy {pick['validation_score']:.4f}")
+        result.update(best_params=pick['best_params'], best_score=pick['best_score'],
+                      validation_score=pick['validation_score'], trees_fit=trees_fit + pick['trees_fit'])
+    return result
+
+
+def pick_on_validation(evaluated, validation, n_jobs=-1, random_state=42):
+    """
+    The final pick shared by both searches: among the best-scoring candidate of every budget in
+    evaluated ((grid_index, params, mean CV score) items), the one most accurate on the validation
+    split. Returns its parameters, CV and validation scores, the number of finalists and the
+    number of trees fit to score them.
+    """
+    finalists = {}
+    for grid_index, params, mean_score in sorted(evaluated, key=lambda item: (-item[2], item[0])):
+        finalists.setdefault(params['n_estimators'], (grid_index, params, mean_score))
+    finalists = sorted(finalists.values(), key=lambda item: item[0])
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(_grow_and_score)(None, {k: v for k, v in params.items() if k != 'n_estimators'},
+                                 params['n_estimators'], validation, random_state)
+        for _, params, _ in finalists)
+    # max() keeps the first of equal scores, i.e. the earliest in ParameterGrid order
+    (_, best_params, best_score), (_, validation_score) = max(zip(finalists, scores), key=lambda item: item[1][1])
+    return {'best_params': best_params, 'best_score': best_score, 'validation_score': validation_score,
+            'finalists': len(finalists), 'trees_fit': sum(params['n_estimators'] for _, params, _ in finalists)}
+
+
+class ScaleColumns(BaseEstimator, TransformerMixin):
+    """
+    StandardScaler applied to the columns at `positions` only, leaving column order unchanged.
+    """
+
+    def __init__(self, positions):
+        self.positions = positions
+
+    def fit(self, X, y=None):
+        self.scaler_ = StandardScaler().fit(np.asarray(X)[:, self.positions])
+        return self
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X[:, self.positions] = self.scaler_.transform(X[:, self.positions])
+        return X
+
+
+def grid_search(X_train, y_train, splits, numerical_cols, param_grid=PARAM_GRID, n_jobs=-1, random_state=42):
+    """
+    Exhaustive GridSearchCV on the same folds, for comparison. Scaling sits inside the pipeline, so
+    like the halving search each fold is scaled on its own training part, but here the scaler is
+    refit for every one of the candidate x fold fits.
+    """
+    positions = [X_train.columns.get_loc(col) for col in numerical_cols]
+    pipeline = Pipeline([('scale', ScaleColumns(positions)), ('model', RandomForestClassifier(random_state=random_state))])
+    search = GridSearchCV(pipeline, param_grid={f"model__{key}": values for key, values in param_grid.items()},
+                          cv=splits, n_jobs=n_jobs, scoring='accuracy')
+    search.fit(X_train.to_numpy(dtype=np.float64), y_train.to_numpy())
+    return search
+
+
+def model_params(pipeline_params):
+    """
+    Classifier parameters from grid_search's pipeline parameters ('model__max_depth' -> 'max_depth').
+    """
+    return {key[len('model__'):]: value for key, value in pipeline_params.items()}
+
+
+def grid_evaluated(search):
+    """
+    GridSearchCV's results as (grid_index, params, mean CV score) items, like the halving search's.
+    """
+    results = search.cv_results_
+    return [(i, model_params(p), float(score)) for i, (p, score) in
+            enumerate(zip(results['params'], results['mean_test_score']))]
+
+
+def compare_with_grid(halving, search, grid_pick=None):
+    """
+    Whether both searches agree, by each selection rule: the best CV score alone (cv_best), and
+    the final pick on the validation split (validation_pick, when grid_pick from
+    pick_on_validation is given); plus where the halving pick ranks in the exhaustive grid and
+    how far its CV score is from the grid's best.
+    """
+    results = search.cv_results_
+    params = [model_params(p) for p in results['params']]
+    index = params.index(halving['best_params'])
+    comparison = {
+        'same_cv_best': halving['cv_best_params'] == model_params(search.best_params_),
+        'grid_rank_of_pick': int(results['rank_test_score'][index]),
+        'score_gap': float(search.best_score_ - results['mean_test_score'][index]),
+    }
+    if grid_pick is not None:
+        comparison['same_validation_pick'] = halving['best_params'] == grid_pick['best_params']
+    return comparison
+
+
+def training_reference_stats(record_encoder, records, numerical_cols, source, model_sha256):
+    """
+    Reference statistics of the training records as the served model sees them: encoded by the
+    fitted RecordEncoder's FeatureEncoder, before scaling, and tagged with the hash of the saved
+    pipeline so they are only used with it.
+    """
+    encoder = record_encoder.encoder_
+    canonical, _, errors = encoder.canonicalize_many(records.to_dict('records'))
+    if errors:
+        raise ValueError(f"record {errors[0][0]}: {errors[0][1]}")
+    block = encoder.encode_canonical_many(canonical, scale=False)
+    return reference_stats(block, encoder.feature_columns, numerical_cols, source=source, model_sha256=model_sha256)
+
+
+# --- Evaluation ---
+def evaluate(model, X_test, y_test):
+    """
+    Prints the notebook's test-set metrics for a fitted model or pipeline.
+    """
+    y_pred = model.predict(X_test)
+    print(f"Model Test Accuracy: {accuracy_score(y_test, y_pred):.2f}")
+    print(f"Model Test Precision: {precision_score(y_test, y_pred):.2f}")
+    print(f"Model Test Recall: {recall_score(y_test, y_pred):.2f}")
+    print(f"Model Test F1-Score: {f1_score(y_test, y_pred):.2f}")
+    print(f"Model Test ROC AUC Score: {roc_auc_score(y_test, model.predict_proba(X_test)[:, 1]):.2f}")
+    print("Confusion Matrix:\n", confusion_matrix(y_test, y_pred))
+
+
+def main(args):
+    os.makedirs(args.artifacts_dir, exist_ok=True)
+    start = time.perf_counter()
+    df = load_cleveland(args.csv, use_cache=not args.no_cache, refresh=args.refresh_cache)
+    print(f"Dataset loaded from '{args.csv}' in {(time.perf_counter() - start) * 1000:.1f} ms.")
+    X_encoded, y = preprocess(df)
+    numerical_cols = [col for col in NUMERICAL_COLS if col in X_encoded.columns]
+    records = df.drop('target', axis=1)
+
+    X_train, _, records_train, records_test, y_train, y_test = train_test_split(
+        X_encoded, records, y, test_size=0.2, random_state=42, stratify=y)
+    print(f"Data split into training ({len(X_train)} samples) and testing ({len(y_test)} samples) sets.")
+
+    params = dict(DEFAULT_PARAMS)
+    if args.search != 'none':
+        # Folds for the rung decisions and a separate validation split for the final pick
+        X_search, X_valid, y_search, y_valid = train_test_split(
+            X_train, y_train, test_size=args.validation_share, random_state=args.random_state, stratify=y_train)
+        splits, fold_matrices = make_folds(X_search, y_search, numerical_cols, args.cv, args.random_state)
+        validation = make_validation(X_search, y_search, X_valid, y_valid, numerical_cols)
+
+        halving = search = None
+        if args.search == 'halving':
+            print(f"\nSuccessive halving over {len(ParameterGrid(PARAM_GRID))} candidates (factor {args.factor})...")
+            start = time.perf_counter()
+            halving = successive_halving_search(fold_matrices, PARAM_GRID, args.factor, args.n_jobs, args.random_state,
+                                                validation=validation)
+            halving_seconds = time.perf_counter() - start
+            params = halving['best_params']
+            print(f"Successive halving finished in {halving_seconds:.1f} s ({halving['trees_fit']} trees fit).")
+            print(f"Best parameters found: {params}")
+            print(f"Its cross-validation accuracy: {halving['best_score']:.4f}, "
+                  f"validation accuracy: {halving['validation_score']:.4f}")
+
+        if args.search == 'grid' or args.compare_grid:
+            print(f"\nExhaustive GridSearchCV over {len(ParameterGrid(PARAM_GRID))} candidates x {args.cv} folds...")
+            start = time.perf_counter()
+            search = grid_search(X_search, y_search, splits, numerical_cols, PARAM_GRID, args.n_jobs, args.random_state)
+            grid_seconds = time.perf_counter() - start
+            print(f"GridSearchCV finished in {grid_seconds:.1f} s.")
+            print(f"Best cross-validation parameters: {model_params(search.best_params_)} "
+                  f"(accuracy {search.best_score_:.4f})")
+            # Final pick by the same rule as the halving search, so the two are comparable
+            grid_pick = pick_on_validation(grid_evaluated(search), validation, args.n_jobs, args.random_state)
+            print(f"Picked on the validation split: {grid_pick['best_params']} "
+                  f"(validation accuracy {grid_pick['validation_score']:.4f})")
+            if halving is None:
+                params = grid_pick['best_params']
+
+        if halving is not None and search is not None:
+            comparison = compare_with_grid(halving, search, grid_pick)
+            print(f"\nSuccessive halving took {halving_seconds:.1f} s vs {grid_seconds:.1f} s for the grid "
+                  f"({grid_seconds / halving_seconds:.1f}x faster).")
+            print(f"Same pick as the grid: {comparison['same_validation_pick']} on the validation split, "
+                  f"{comparison['same_cv_best']} by CV score alone; "
+                  f"the halving pick ranks #{comparison['grid_rank_of_pick']} in the grid, "
+                  f"{comparison['score_gap']:.4f} below its best CV accuracy.")
+
+    # --- 4. Train the Pipeline ---
+    # Encoding, scaling and the classifier are fit together and saved as one artifact, which
+    # model_registry serves as-is, so serving cannot drift from what training did
+    print(f"\nTraining encoder + RandomForestClassifier pipeline with {params}...")
+    pipeline = Pipeline([
+        ('encode', RecordEncoder()),
+        ('model', RandomForestClassifier(random_state=args.random_state, **params)),
+    ])
+    pipeline.fit(records_train, y_train)
+    print(f"Pipeline training complete ({len(pipeline.named_steps['encode'].feature_columns_)} features).")
+    evaluate(pipeline, records_test, y_test)
+
+    # --- 5. Save Pipeline ---
+    pipeline_path = os.path.join(args.artifacts_dir, HEART_PIPELINE_FILENAME)
+    dump_atomic(pipeline, pipeline_path)
+    print(f"Heart disease pipeline saved to {pipeline_path}")
+    reference_path = os.path.join(args.artifacts_dir, HEART_REFERENCE_STATS_FILENAME)
+    save_reference_stats(training_reference_stats(pipeline.named_steps['encode'], records_train, numerical_cols,
+                                                  f"{os.path.basename(args.csv)} training split",
+                                                  file_sha256(pipeline_path)), reference_path)
+    print(f"Reference feature statistics saved to {reference_path}")
+    print("\nHeart disease model training and saving process complete!")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the heart disease model and save its artifacts.")
+    parser.add_argument('--csv', default=CLEVELAND_CSV_PATH, help="Local Cleveland CSV")
+    parser.add_argument('--no-cache', action='store_true', help="Parse the CSV instead of using the dataset cache")
+    parser.add_argument('--refresh-cache', action='store_true', help="Re-parse the CSV and rewrite the dataset cache")
+    parser.add_argument('--artifacts-dir', default=MODEL_ARTIFACTS_DIR)
+    parser.add_argument('--search', choices=['halving', 'grid', 'none'], default='halving',
+                        help="Hyperparameter search strategy (none trains DEFAULT_PARAMS)")
+    parser.add_argument('--compare-grid', action='store_true',
+                        help="Also run the exhaustive GridSearchCV and report time and agreement")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Parallel fits (-1: all cores)")
+    parser.add_argument('--cv', type=int, default=5, help="Cross-validation folds")
+    parser.add_argument('--factor', type=int, default=3, help="Keep 1/factor of the candidates at each rung")
+    parser.add_argument('--validation-share', type=float, default=0.2,
+                        help="Share of the training set held out of the folds to pick the final parameters")
+    parser.add_argument('--random-state', type=int, default=42)
+    main(parser.parse_args())